@@ -2,17 +2,55 @@
 API endpoints for DataPilot
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-import shutil
+import asyncio
 import uuid
 import json
 import logging
+import time
+from urllib.parse import quote
 
-from app.api.models import AskRequest, AskResponse, Dataset
+from app.api.models import AskRequest, AskResponse, Dataset, IngestJob
+from app.core.concurrency import llm_slot, run_db, run_ingest
 from app.core.database import get_connection, get_session, engine
-from app.services.ai_service import generate_sql
-from app.services.ingestion import ingest_file
+from app.core.metrics import RESULT_BYTES, RESULT_ROWS, span
+from app.core.query_guard import QueryAborted, QueryCancelled, QueryGuard, cancel_on_disconnect, use_guard
+from app.services.ai_service import SQLGenerationError, agenerate_sql, astream_sql, get_llm
+from app.services.catalog import delete_profile, get_profile, refresh_profile, value_hints
+from app.services.invalidation import invalidate_table
+from app.services.jobs import JobQueueFull, get_jobs
+from app.services.query_history import get_few_shot_index, record_ask, schedule_warm
+from app.services.generator_cache import get_generator_cache
+from rag.models import batch_stats
+from app.services.result_cache import get_result_cache
+from app.services.result_governor import (
+    CHART_MAX_POINTS,
+    MAX_RESULT_ROWS,
+    apply_budget,
+    count_sql,
+    downsample_sql,
+    limited_sql,
+)
+from app.services.result_stream import (
+    ARROW_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    ResultStream,
+    StreamsBusy,
+    arrow_available,
+    decode_page_token,
+    encode_page_token,
+    negotiate_format,
+    paged_sql,
+)
+from app.services.rollups import get_rollups, schedule_advise
+from app.services.slow_queries import slow_queries, timed_execute
+from app.services.sql_validator import SQLValidationError
+from app.services.sql_cache import get_sql_cache
+from app.services.sql_templates import get_template_cache
+from app.services.value_index import drop_value_index, match_hints, match_values, refresh_value_index
+from app.services.ingestion import SchemaMismatch, append_file, detect_format, drop_relation, ingest_file
 from sqlmodel import Session, select
 
 logger = logging.getLogger(__name__)
@@ -22,6 +60,8 @@ router = APIRouter()
 UPLOAD_DIR = Path("data/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
 
 # ==================================================
 # LIST DATASETS
@@ -46,6 +86,38 @@ def list_datasets():
         return results
 
 
+# ==================================================
+# CACHE STATS
+# ==================================================
+@router.get("/cache/stats")
+def cache_stats():
+    return {
+        "sql": get_sql_cache().stats(),
+        "sql_templates": get_template_cache().stats(),
+        "results": get_result_cache().stats(),
+        "generators": get_generator_cache().stats(),
+        "rollups": get_rollups().stats(),
+        "model_batches": batch_stats(),
+    }
+
+
+# ==================================================
+# LLM BACKENDS
+# ==================================================
+@router.get("/llm/stats")
+def llm_stats():
+    """Per-backend requests, retries, rate limiting, hedging and latency vs SLO."""
+    return get_llm().stats()
+
+
+# ==================================================
+# SLOW QUERIES
+# ==================================================
+@router.get("/slow-queries")
+def list_slow_queries():
+    return slow_queries()
+
+
 # ==================================================
 # DELETE DATASET
 # ==================================================
@@ -58,108 +130,636 @@ def delete_dataset(dataset_id: str):
 
         # Drop from DuckDB
         try:
-            conn = get_connection()
-            conn.execute(f"DROP TABLE IF EXISTS {dataset.table_name_duckdb}")
-            conn.close()
+            with get_connection() as conn:
+                drop_relation(conn, dataset.table_name_duckdb)
+                drop_value_index(conn, dataset.table_name_duckdb)
         except Exception as e:
             logger.warning(f"Failed to drop DuckDB table: {e}")
 
+        invalidate_table(dataset.table_name_duckdb)
+        delete_profile(dataset.table_name_duckdb)
+
         session.delete(dataset)
         session.commit()
         return {"message": "Dataset deleted"}
 
 
 # ==================================================
-# UPLOAD (CSV + Excel + Clean columns)
+# UPLOAD (CSV + Excel + Parquet + JSON + Clean columns)
 # ==================================================
-@router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-
-    filename = file.filename.lower()
-
-    if not filename.endswith((".csv", ".xlsx", ".xls")):
-        raise HTTPException(400, "Only CSV or Excel supported")
+def _save_upload(file: UploadFile, file_path: Path) -> int:
+    """Stream the request body to disk in fixed-size chunks."""
+    written = 0
+    with open(file_path, "wb") as buffer:
+        while chunk := file.file.read(UPLOAD_CHUNK_BYTES):
+            buffer.write(chunk)
+            written += len(chunk)
+    return written
 
-    file_id = uuid.uuid4().hex[:8]
-    file_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
 
-    # save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+def _ingest_job(job: IngestJob, params: dict, progress) -> dict:
+    """Ingest a saved upload (runs on the job queue, see services/jobs.py)."""
+    table_name = job.dataset_id
+    try:
+        result = ingest_file(
+            Path(job.file_path), table_name=table_name,
+            external=params.get("external", False), progress=progress,
+        )
+    except BaseException:
+        # Excel is appended chunk by chunk; do not leave half a table behind
+        try:
+            with get_connection() as conn:
+                drop_relation(conn, table_name)
+        except Exception as e:
+            logger.warning(f"Failed to drop partial table {table_name}: {e}")
+        raise
+    invalidate_table(result["table_name"])
 
-    # Delegate to ingestion service
-    result = ingest_file(file_path, table_name=f"dataset_{file_id}")
+    # Profile + index values once now so /ask never has to scan the table for context
+    refresh_profile(result["table_name"])
+    refresh_value_index(result["table_name"], result["schema"])
 
-    # Persist dataset metadata to SQLite
+    # Persist dataset metadata to SQLite (merge: a resumed job may have got this far)
     with Session(engine) as session:
         ds = Dataset(
             id=result["dataset_id"],
-            filename=file.filename,
+            filename=job.filename,
             table_name_duckdb=result["table_name"],
             schema_info=json.dumps(result["schema"]),
             row_count=result["row_count"],
         )
-        session.add(ds)
+        session.merge(ds)
         session.commit()
 
+    # Pre-generate and run the questions most asked of earlier uploads of this file
+    schedule_warm(result["table_name"], _load_context, _run_query)
+
     return result
 
 
+get_jobs().register("upload", _ingest_job)
+
+
+@router.post("/upload", status_code=202)
+async def upload_file(file: UploadFile = File(...), external: bool = Form(False)):
+
+    fmt = detect_format(file.filename)
+
+    if fmt is None:
+        raise HTTPException(
+            400,
+            "Supported files: CSV, Excel, Parquet, JSON/NDJSON (optionally .gz/.zst)"
+        )
+    if external and fmt != "parquet":
+        raise HTTPException(400, "External mode is only supported for Parquet")
+
+    jobs = get_jobs()
+    if jobs.full():
+        raise HTTPException(503, "Too many uploads waiting, retry later")
+
+    file_id = uuid.uuid4().hex[:8]
+    file_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
+    await run_ingest(_save_upload, file, file_path)
+
+    try:
+        job = jobs.submit("upload", file.filename, file_path, f"dataset_{file_id}", {"external": external})
+    except JobQueueFull as e:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(503, str(e))
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "dataset_id": job.dataset_id,
+        "status_url": f"/api/jobs/{job.id}",
+    }
+
+
+# ==================================================
+# INGESTION JOBS
+# ==================================================
+@router.get("/jobs")
+def list_jobs(limit: int = 50):
+    return get_jobs().recent(limit)
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = get_jobs().cancel(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+# ==================================================
+# APPEND / UPSERT INTO A DATASET
+# ==================================================
+def _append_upload(dataset: Dataset, file: UploadFile, key: list[str] | None, widen: bool) -> dict:
+    """Blocking part of an append: save, merge into the table, refresh metadata."""
+    file_path = UPLOAD_DIR / f"{dataset.id}_append_{uuid.uuid4().hex[:8]}_{file.filename}"
+    _save_upload(file, file_path)
+
+    try:
+        result = append_file(file_path, dataset.table_name_duckdb, key=key, widen=widen)
+    finally:
+        file_path.unlink(missing_ok=True)
+
+    # only this table's caches; the value index was updated by append_file
+    invalidate_table(result["table_name"])
+    refresh_profile(result["table_name"])
+
+    with Session(engine) as session:
+        ds = session.get(Dataset, dataset.id)
+        if ds:
+            ds.schema_info = json.dumps(result["schema"])
+            ds.row_count = result["row_count"]
+            session.add(ds)
+            session.commit()
+
+    return result
+
+
+@router.post("/datasets/{dataset_id}/append")
+async def append_dataset(
+    dataset_id: str,
+    file: UploadFile = File(...),
+    mode: str = Form("append"),
+    key: str | None = Form(None),
+    widen: bool = Form(False),
+):
+    """
+    Add the rows of a file to an existing dataset.
+
+    mode=append inserts every row; mode=upsert updates rows whose key
+    (comma-separated column names) matches and inserts the rest.
+    widen=true allows new columns and wider column types.
+    """
+    if mode not in ("append", "upsert"):
+        raise HTTPException(400, "mode must be 'append' or 'upsert'")
+    keys = [k.strip() for k in (key or "").split(",") if k.strip()]
+    if mode == "upsert" and not keys:
+        raise HTTPException(400, "Upsert needs a key column")
+
+    if detect_format(file.filename) is None:
+        raise HTTPException(
+            400,
+            "Supported files: CSV, Excel, Parquet, JSON/NDJSON (optionally .gz/.zst)"
+        )
+
+    with Session(engine) as session:
+        dataset = session.get(Dataset, dataset_id)
+    if not dataset:
+        raise HTTPException(404, "Dataset not found")
+
+    try:
+        return await run_ingest(
+            _append_upload, dataset, file, keys if mode == "upsert" else None, widen
+        )
+    except SchemaMismatch as e:
+        raise HTTPException(409, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
 # ==================================================
 # ✅ ASK (AI → SQL → DuckDB)
 # ==================================================
-@router.post("/ask", response_model=AskResponse)
-async def ask_question(request: AskRequest):
+def _load_context(dataset_id: str, question: str) -> tuple[list[dict], list[dict], list[str]]:
+    """
+    Schema and sample rows from the catalog, plus value hints: values
+    the question mentions (from the value index) first, then the
+    profile's per-column summaries.
+    """
+    profile = get_profile(dataset_id)
 
-    conn = get_connection()
+    with span("values"), get_connection() as conn:
+        matched = match_values(conn, dataset_id, question)
 
+    hints = match_hints(matched) + value_hints(profile)
+    return profile["schema"], profile["sample_rows"], hints
+
+
+def _cached_fetch(conn, sql: str, dataset_id: str, prepared: tuple[str, list] | None = None):
+    results = get_result_cache()
+    key = results.key(sql, {dataset_id})
+
+    df = results.get(key)
+    if df is None:
+        df = timed_execute(conn, sql, dataset_id, prepared)
+        results.put(key, df)
+    return df
+
+
+def _run_query(sql_query: str, dataset_id: str, chart: bool = False) -> dict:
+    """
+    Execute under the result governor, through the result cache.
+    Returns the (possibly truncated) rows plus an optional chart series.
+    """
+    fallback = False
+    # aggregates a rollup covers read the rollup; SQL from a learned
+    # template runs as a prepared statement
+    prepared = None
+    original_sql = sql_query
+    rolled_up = get_rollups().rewrite(sql_query, dataset_id)
+    if rolled_up:
+        sql_query = rolled_up
+    else:
+        prepared = get_template_cache().prepared(sql_query)
+        if prepared is not None:
+            prepared = (limited_sql(prepared[0]), prepared[1])
+
+    with get_connection() as conn:
+        try:
+            try:
+                df = _cached_fetch(conn, limited_sql(sql_query), dataset_id, prepared)
+            except QueryAborted:
+                raise
+            except Exception as e:
+                if rolled_up is None:
+                    raise
+                # a rollup that no longer fits must never cost the answer
+                logger.warning(f"Rollup query failed, using {dataset_id}: {e}")
+                sql_query = original_sql
+                df = _cached_fetch(conn, limited_sql(sql_query), dataset_id)
+        except QueryAborted:
+            raise
+        except Exception:
+            # 🔥 fallback if AI makes bad SQL
+            sql_query = f"SELECT * FROM {dataset_id} LIMIT 5"
+            df = conn.execute(sql_query).fetchdf()
+            fallback = True
+
+        total_rows = len(df)
+        if total_rows > MAX_RESULT_ROWS:
+            total_rows = int(_cached_fetch(conn, count_sql(sql_query), dataset_id).iloc[0, 0])
+
+        df, truncated = apply_budget(df)
+        RESULT_ROWS.observe(len(df))
+        RESULT_BYTES.observe(int(df.memory_usage(index=False, deep=True).sum()))
+
+        chart_df, downsampled = None, None
+        if chart and total_rows > CHART_MAX_POINTS:
+            columns = [
+                (r[0], r[1])
+                for r in conn.execute(f"DESCRIBE {sql_query.strip().rstrip(';')}").fetchall()
+            ]
+            chart_sql, downsampled = downsample_sql(sql_query, columns)
+            if chart_sql:
+                chart_df = _cached_fetch(conn, chart_sql, dataset_id)
+
+    return {
+        "df": df,
+        "total_rows": total_rows,
+        "truncated": truncated,
+        "chart_df": chart_df,
+        "downsampled": downsampled,
+        "fallback": fallback,
+    }
+
+
+def _open_stream(sql_query: str, dataset_id: str, offset: int, limit: int | None) -> tuple[ResultStream, bool]:
+    """
+    Returns the stream and whether it fell back to a preview query.
+    At most MAX_RESULT_ROWS rows are streamed; stream.truncated tells
+    whether that cut the result short.
+    """
+    sql_query = get_rollups().rewrite(sql_query, dataset_id) or sql_query
+    overflow_sql = None
+    if limit is None or limit > MAX_RESULT_ROWS:
+        limit = MAX_RESULT_ROWS
+        overflow_sql = paged_sql(sql_query, offset + limit, 1)
     try:
-        # -----------------------
-        # Get schema for AI
-        # -----------------------
-        schema_rows = conn.execute(f"DESCRIBE {request.dataset_id}").fetchall()
-        schema = [{"column": r[0], "type": r[1]} for r in schema_rows]
+        return ResultStream(paged_sql(sql_query, offset, limit), overflow_sql), False
+    except (QueryAborted, StreamsBusy):
+        raise
+    except Exception:
+        # 🔥 fallback if AI makes bad SQL
+        return ResultStream(f"SELECT * FROM {dataset_id} LIMIT 5"), True
 
-        # -----------------------
-        # Get sample data for prompt context
-        # -----------------------
-        sample_rows = conn.execute(
-            f"SELECT * FROM {request.dataset_id} LIMIT 3"
-        ).fetchdf().to_dict(orient="records")
 
+async def _guarded(http_request: Request, fn, *args):
+    """
+    run_db(fn, *args) under a QueryGuard: queries time out, are rejected
+    if too expensive, and are interrupted if the client disconnects.
+    """
+    guard = QueryGuard()
+    try:
+        with use_guard(guard):
+            return await cancel_on_disconnect(http_request, guard, run_db(fn, *args))
+    except QueryCancelled as e:
+        if e.reason == "timeout":
+            raise HTTPException(504, str(e))
+        raise HTTPException(499, str(e))  # nobody is listening any more
+    except QueryAborted as e:
+        raise HTTPException(400, str(e))
+    except StreamsBusy as e:
+        raise HTTPException(503, str(e))
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """
+    Closes its body once the response ends. Starlette leaves a body the
+    client stopped reading to the garbage collector, and until then it
+    holds a pooled cursor.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+async def _record(request: AskRequest, sql_query: str, answer: str, started: float,
+                  row_count: int | None, success: bool):
+    """Store the question in the query history; never fails the request."""
+    try:
+        await asyncio.to_thread(
+            record_ask,
+            request.dataset_id, request.question, sql_query, answer,
+            (time.perf_counter() - started) * 1000, row_count, success,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to record query history: {e}")
+        return
+    if success:
+        # repeated aggregate patterns may be worth a rollup
+        schedule_advise(request.dataset_id)
+
+
+@router.post("/ask", response_model=AskResponse)
+async def ask_question(request: AskRequest, http_request: Request):
+
+    try:
+        fmt = negotiate_format(request.format, http_request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(406, "Arrow responses need pyarrow installed on the server")
+
+    offset, limit = request.offset, request.limit
+    message = "success"
+    started = time.perf_counter()
+    # only fresh questions go into the history, not follow-up pages
+    record = not request.page_token
+
+    if request.page_token:
         # -----------------------
-        # Generate SQL
+        # Next page: reuse the SQL from the token
         # -----------------------
-        sql_query = generate_sql(
-            question=request.question,
-            schema=schema,
-            table_name=request.dataset_id,
-            sample_data=sample_rows
-        )
+        try:
+            token = decode_page_token(request.page_token)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if token["dataset_id"] != request.dataset_id:
+            raise HTTPException(400, "Page token belongs to another dataset")
+        sql_query, offset, limit = token["sql"], token["offset"], token["limit"]
 
-        # Safety: SELECT only
-        if not sql_query.strip().lower().startswith("select"):
-            raise HTTPException(400, "Only SELECT queries allowed")
+    else:
+        # DuckDB work runs in the db thread pool and the LLM call is awaited,
+        # so a slow generation neither blocks the event loop nor holds a
+        # pooled cursor.
+        with span("context"):
+            schema, sample_rows, hints = await run_db(_load_context, request.dataset_id, request.question)
+        with span("examples"):
+            examples = await asyncio.to_thread(
+                get_few_shot_index().examples, request.dataset_id, request.question
+            )
 
         # -----------------------
-        # Execute safely
+        # Generate + validate SQL (parsed and bound, not run; one repair on error)
         # -----------------------
         try:
-            df = conn.execute(sql_query).fetchdf()
-        except Exception:
+            async with llm_slot():
+                with span("generate"):
+                    sql_query = await agenerate_sql(
+                        question=request.question,
+                        schema=schema,
+                        table_name=request.dataset_id,
+                        sample_data=sample_rows,
+                        value_hints=hints,
+                        examples=examples,
+                    )
+        except SQLValidationError as e:
+            await _record(request, e.sql or "", str(e), started, None, False)
+            # Safety: read-only queries only
+            if e.read_only:
+                raise HTTPException(400, str(e))
             # 🔥 fallback if AI makes bad SQL
-            df = conn.execute(
-                f"SELECT * FROM {request.dataset_id} LIMIT 5"
-            ).fetchdf()
+            sql_query = f"SELECT * FROM {request.dataset_id} LIMIT 5"
+            message = f"Could not generate valid SQL, showing a preview instead: {str(e).splitlines()[0]}"
+            record = False
+        except SQLGenerationError as e:
+            await _record(request, "", str(e), started, None, False)
+            sql_query = f"SELECT * FROM {request.dataset_id} LIMIT 5"
+            message = f"Could not generate SQL, showing a preview instead: {str(e).splitlines()[0]}"
+            record = False
 
-        data = df.to_dict(orient="records")
-
-        return AskResponse(
-            answer=f"I found {len(data)} result(s).",
-            sql_query=sql_query,
-            data=data,
-            message="success"
+    # -----------------------
+    # Streamed formats: rows go out a DuckDB chunk at a time
+    # -----------------------
+    if fmt != "json":
+        stream, fallback = await _guarded(
+            http_request, _open_stream, sql_query, request.dataset_id, offset, limit
+        )
+        if record:
+            # row count is unknown until the stream is consumed
+            await _record(request, sql_query, "", started, None, not fallback)
+        if fmt == "ndjson":
+            header = {"sql_query": sql_query, "message": message, "offset": offset, "truncated": stream.truncated}
+            return _ClosingStreamingResponse(stream.body(stream.ndjson(header)), media_type=NDJSON_MEDIA_TYPE)
+        return _ClosingStreamingResponse(
+            stream.body(stream.arrow()),
+            media_type=ARROW_MEDIA_TYPE,
+            headers={
+                "X-SQL-Query": quote(sql_query),
+                "X-Result-Truncated": str(stream.truncated).lower(),
+            },
         )
 
-    finally:
-        conn.close()
+    # -----------------------
+    # Execute safely
+    # -----------------------
+    with span("execute"):
+        result = await _guarded(http_request, _run_query, sql_query, request.dataset_id, request.chart)
+    df = result["df"]
+
+    end = len(df) if limit is None else min(offset + limit, len(df))
+    with span("serialize"):
+        data = df.iloc[offset:end].to_dict(orient="records")
+
+    next_page_token = None
+    if end < len(df):
+        next_page_token = encode_page_token(request.dataset_id, sql_query, end, limit)
+
+    if result["fallback"] and message == "success":
+        message = "The generated SQL failed to run, showing a preview instead"
+
+    total_rows = result["total_rows"]
+    answer = f"I found {total_rows} result(s)."
+    if result["truncated"]:
+        answer += f" Showing the first {len(df)}."
+
+    chart_data = None
+    if result["chart_df"] is not None:
+        chart_data = result["chart_df"].to_dict(orient="records")
+
+    if record:
+        await _record(request, sql_query, answer, started, total_rows, not result["fallback"])
+
+    return AskResponse(
+        answer=answer,
+        sql_query=sql_query,
+        data=data,
+        message=message,
+        total_rows=total_rows,
+        offset=offset,
+        next_page_token=next_page_token,
+        truncated=result["truncated"],
+        chart_data=chart_data,
+        downsampled=result["downsampled"],
+    )
+
+
+# ==================================================
+# ASK, streamed as server-sent events
+# ==================================================
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def _sse(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: AskRequest, http_request: Request):
+    """
+    /ask as server-sent events, each sent as soon as its stage is done:
+
+        schema      {"docs"}                      retrieved schema
+        token       {"text"}                      SQL as the LLM writes it
+        sql         {"sql", "cached": true}       SQL cache hit (no schema/token events)
+        validation  {"valid", "sql", "repairs"}   or {"valid": false, "sql", "error", "fallback"}
+                                                  when a preview query is shown instead
+        rows        {"offset", "rows"}            one DuckDB chunk at a time
+        done        {"answer", "row_count", "truncated"}
+        error       {"status", "detail"}
+
+    offset / limit select a window of rows; page tokens are not used
+    since every row is streamed.
+    """
+    if request.page_token:
+        raise HTTPException(400, "Page tokens are not supported by /ask/stream")
+
+    dataset_id, question = request.dataset_id, request.question
+
+    async def events():
+        started = time.perf_counter()
+        guard = QueryGuard()
+        stream = None
+        finished = False
+        # only asks answered with generated SQL go into the history
+        record = True
+        try:
+            with span("context"):
+                schema, sample_rows, hints = await run_db(_load_context, dataset_id, question)
+            with span("examples"):
+                examples = await asyncio.to_thread(get_few_shot_index().examples, dataset_id, question)
+
+            # -----------------------
+            # Generate + validate SQL, streaming tokens
+            # -----------------------
+            try:
+                async with llm_slot():
+                    async for kind, value in astream_sql(
+                        question=question,
+                        schema=schema,
+                        table_name=dataset_id,
+                        sample_data=sample_rows,
+                        value_hints=hints,
+                        examples=examples,
+                    ):
+                        if kind == "schema":
+                            yield _sse("schema", {"docs": value})
+                        elif kind == "token":
+                            yield _sse("token", {"text": value})
+                        elif kind == "cached":
+                            yield _sse("sql", {"sql": value, "cached": True})
+                        else:
+                            sql_query, repairs = value
+                yield _sse("validation", {"valid": True, "sql": sql_query, "repairs": repairs})
+            except SQLValidationError as e:
+                await _record(request, e.sql or "", str(e), started, None, False)
+                if e.read_only:
+                    finished = True
+                    yield _sse("error", {"status": 400, "detail": str(e)})
+                    return
+                # 🔥 fallback if AI makes bad SQL
+                sql_query = f"SELECT * FROM {dataset_id} LIMIT 5"
+                record = False
+                yield _sse("validation", {
+                    "valid": False, "sql": e.sql, "error": str(e).splitlines()[0], "fallback": sql_query,
+                })
+            except SQLGenerationError as e:
+                await _record(request, "", str(e), started, None, False)
+                sql_query = f"SELECT * FROM {dataset_id} LIMIT 5"
+                record = False
+                yield _sse("validation", {
+                    "valid": False, "sql": None, "error": str(e).splitlines()[0], "fallback": sql_query,
+                })
+
+            # -----------------------
+            # Execute, then stream rows a DuckDB chunk at a time; the
+            # stream's cursor stays with the guard until it is closed,
+            # so the timeout and a disconnect also stop the chunk loop
+            # -----------------------
+            with use_guard(guard):
+                with span("execute"):
+                    stream, fallback = await run_db(
+                        _open_stream, sql_query, dataset_id, request.offset, request.limit
+                    )
+
+            row_count = 0
+            while (df := await run_db(stream.next_chunk)) is not None:
+                rows = df.to_json(orient="records", date_format="iso")
+                yield f'event: rows\ndata: {{"offset": {request.offset + row_count}, "rows": {rows}}}\n\n'.encode()
+                row_count += len(df)
+
+            answer = f"I found {row_count} result(s)."
+            if stream.truncated:
+                answer = f"Showing the first {row_count} result(s)."
+            finished = True
+            yield _sse("done", {"answer": answer, "row_count": row_count, "truncated": stream.truncated})
+            if record:
+                await _record(request, sql_query, answer, started, row_count, not fallback)
+
+        except QueryCancelled as e:
+            finished = True
+            yield _sse("error", {"status": 504 if e.reason == "timeout" else 499, "detail": str(e)})
+        except QueryAborted as e:
+            finished = True
+            yield _sse("error", {"status": 400, "detail": str(e)})
+        except StreamsBusy as e:
+            finished = True
+            yield _sse("error", {"status": 503, "detail": str(e)})
+        finally:
+            if not finished:
+                # client went away mid-stream (or an unexpected error):
+                # interrupt the fetch in flight before releasing the cursor
+                guard.cancel("disconnect")
+            if stream is not None:
+                stream.close()
+
+    return _ClosingStreamingResponse(
+        events(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -17,11 +17,55 @@ class Dataset(SQLModel, table=True):
 
 class QueryHistory(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    dataset_id: str = Field(foreign_key="dataset.id")
+    dataset_id: str = Field(foreign_key="dataset.id", index=True)
     question: str
     sql_query: str
     answer: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    latency_ms: Optional[float] = None
+    row_count: Optional[int] = None
+    success: bool = True  # False when the generated SQL failed and the fallback ran
+    # lets a re-upload of the same file reuse this history
+    filename: Optional[str] = Field(default=None, index=True)
+    schema_fingerprint: Optional[str] = None
+
+class SQLCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True)  # hash of (dataset, schema fingerprint, question)
+    dataset_id: str = Field(index=True)
+    schema_fingerprint: str
+    question: str  # normalized
+    sql_query: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class DatasetProfile(SQLModel, table=True):
+    dataset_id: str = Field(primary_key=True)
+    profile_json: str  # schema, sample rows and per-column stats (see services/catalog.py)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Rollup(SQLModel, table=True):
+    name: str = Field(primary_key=True)  # DuckDB table holding the rollup
+    dataset_id: str = Field(index=True)
+    spec_json: str  # dims, measures and base columns (see services/rollups.py)
+    row_count: int
+    base_row_count: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IngestJob(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    kind: str  # "upload" (see services/jobs.py)
+    status: str = Field(index=True)  # queued | running | succeeded | failed | cancelled
+    filename: str
+    file_path: str  # saved upload the job ingests
+    dataset_id: str
+    params_json: str = "{}"
+    bytes_total: int = 0
+    bytes_processed: int = 0
+    rows_processed: int = 0
+    error: Optional[str] = None
+    result_json: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 # Pydantic models for API responses (inheriting from SQLModel where possible or separate)
 class UploadResponse(SQLModel):
@@ -34,9 +78,20 @@ class UploadResponse(SQLModel):
 class AskRequest(SQLModel):
     dataset_id: str
     question: str
+    format: Optional[str] = None  # "json" | "ndjson" | "arrow"; else negotiated via Accept
+    offset: int = Field(default=0, ge=0)
+    limit: Optional[int] = Field(default=None, ge=1)  # rows per page; None = everything
+    page_token: Optional[str] = None  # from a previous response; skips SQL generation
+    chart: bool = False  # also return a downsampled series sized for a chart
 
 class AskResponse(SQLModel):
     answer: str
     sql_query: str
     data: List[Dict[str, Any]]
     message: str
+    total_rows: Optional[int] = None  # true row count, even when truncated
+    offset: int = 0
+    next_page_token: Optional[str] = None
+    truncated: bool = False
+    chart_data: Optional[List[Dict[str, Any]]] = None
+    downsampled: Optional[str] = None  # "minmax" | "top_n" | "histogram"
@@ -0,0 +1,60 @@
+"""
+Concurrency model for the async API handlers.
+
+Blocking work never runs on the event loop:
+- DuckDB queries go to a bounded "db" thread pool
+- file saving + appends go to a separate, smaller "ingest" pool so
+  big uploads cannot starve query traffic (upload ingestion itself
+  runs on the job queue in services/jobs.py)
+- LLM calls are async, capped by a semaphore
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from app.core.database import POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+DB_WORKERS = int(os.environ.get("DB_WORKERS", str(POOL_SIZE)))
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "16"))
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="duckdb")
+_ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+# semaphores are bound to the running loop, so create them lazily
+_llm_semaphore: asyncio.Semaphore | None = None
+
+
+async def _run_in(executor: ThreadPoolExecutor, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(executor, call)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run blocking DuckDB work in the db thread pool."""
+    return await _run_in(_db_executor, fn, *args, **kwargs)
+
+
+async def run_ingest(fn, *args, **kwargs):
+    """Run blocking file / ingestion work in the ingest thread pool."""
+    return await _run_in(_ingest_executor, fn, *args, **kwargs)
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Limit the number of in-flight LLM calls."""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    async with _llm_semaphore:
+        yield
+
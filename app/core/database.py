@@ -1,11 +1,24 @@
 from sqlmodel import SQLModel, create_engine, Session
+from contextlib import contextmanager
 from pathlib import Path
+import logging
+import os
+import queue
+import threading
+import time
 import duckdb
 
+from app.core.query_guard import guarded_fetchdf
+
+logger = logging.getLogger(__name__)
+
 # ========================================
 # SQLite (for metadata persistence)
 # ========================================
-DB_PATH = Path(__file__).parent.parent.parent / "datapilot.db"
+DB_PATH = Path(os.environ.get(
+    "DATAPILOT_DB_PATH",
+    Path(__file__).parent.parent.parent / "datapilot.db",
+))
 sqlite_url = f"sqlite:///{DB_PATH}"
 
 # Create engine
@@ -14,6 +27,31 @@ engine = create_engine(sqlite_url, connect_args={"check_same_thread": False})
 def create_db_and_tables():
     """Create the database and tables."""
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+
+def _add_missing_columns():
+    """
+    create_all() never alters existing tables, so add columns introduced
+    after a database was created (all such columns are nullable or
+    have a default).
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+                logger.info(f"Migrating SQLite: {ddl}")
+                conn.execute(text(ddl))
 
 def get_session():
     """Dependency to provide a database session."""
@@ -23,18 +61,189 @@ def get_session():
 # ========================================
 # DuckDB (for CSV data / OLAP queries)
 # ========================================
-DUCKDB_PATH = Path(__file__).parent.parent.parent / "data" / "datapilot.duckdb"
+DUCKDB_PATH = Path(os.environ.get(
+    "DUCKDB_PATH",
+    Path(__file__).parent.parent.parent / "data" / "datapilot.duckdb",
+))
 DUCKDB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+POOL_SIZE = int(os.environ.get("DUCKDB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("DUCKDB_POOL_TIMEOUT", "30"))
+# database-wide caps (DuckDB has no per-cursor memory or thread limits);
+# leave headroom so one heavy query cannot take the whole box
+DUCKDB_MEMORY_LIMIT = os.environ.get("DUCKDB_MEMORY_LIMIT", "")  # e.g. "4GB"
+DUCKDB_THREADS = os.environ.get("DUCKDB_THREADS", "")
+
+
+class DuckDBPool:
+    """
+    One long-lived DuckDB database handle per process plus a bounded
+    pool of cursors (`conn.cursor()`), one borrowed per thread at a time.
+
+    Cursors share the database instance (catalog, buffer pool, WAL), so
+    borrowing one is cheap and concurrent readers run side by side.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+
+        self._conn = duckdb.connect(path)
+        if DUCKDB_MEMORY_LIMIT:
+            self._conn.execute(f"SET memory_limit = '{DUCKDB_MEMORY_LIMIT}'")
+        if DUCKDB_THREADS:
+            self._conn.execute(f"SET threads = {int(DUCKDB_THREADS)}")
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+
+    # -------------------------------------------------------
+
+    def _new_cursor(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self._conn.cursor()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, cur):
+        with self._lock:
+            self._created -= 1
+            self._stats["discarded"] += 1
+        try:
+            cur.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Borrow a cursor, creating one if the pool is not full yet."""
+        if self._closed:
+            raise RuntimeError("DuckDB pool is closed")
+
+        try:
+            cur = self._idle.get_nowait()
+        except queue.Empty:
+            cur = self._new_cursor()
+            if cur is None:
+                start = time.perf_counter()
+                with self._lock:
+                    self._stats["waits"] += 1
+                try:
+                    cur = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"No DuckDB cursor available after {self.timeout}s "
+                        f"(pool size {self.size})"
+                    )
+                finally:
+                    with self._lock:
+                        self._stats["wait_seconds"] += time.perf_counter() - start
+
+        with self._lock:
+            self._stats["acquired"] += 1
+        return cur
+
+    def release(self, cur, broken: bool = False):
+        """Return a cursor to the pool (or drop it if it failed)."""
+        if broken or self._closed:
+            self._discard(cur)
+            return
+        self._idle.put(cur)
+
+    @contextmanager
+    def cursor(self):
+        cur = self.acquire()
+        broken = False
+        try:
+            yield cur
+        except duckdb.ConnectionException:
+            broken = True
+            raise
+        finally:
+            self.release(cur, broken=broken)
+
+    # -------------------------------------------------------
+
+    def health_check(self) -> bool:
+        """Run a trivial query through the pool."""
+        try:
+            with self.cursor() as cur:
+                return cur.execute("SELECT 1").fetchone()[0] == 1
+        except Exception as e:
+            logger.warning(f"DuckDB health check failed: {e}")
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["created"] = self._created
+        stats["size"] = self.size
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["created"] - stats["idle"]
+        return stats
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._conn.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> DuckDBPool:
+    """Lazily open the process-wide DuckDB pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                logger.info(f"Opening DuckDB pool ({POOL_SIZE} cursors) on {DUCKDB_PATH}")
+                _pool = DuckDBPool(str(DUCKDB_PATH))
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
 def get_connection():
-    """Get a DuckDB connection for OLAP queries."""
-    return duckdb.connect(str(DUCKDB_PATH))
+    """
+    Borrow a pooled DuckDB cursor for OLAP queries.
+
+    Usage:
+        with get_connection() as conn:
+            conn.execute(...)
+    """
+    return get_pool().cursor()
 
 def execute_query(sql: str) -> list[dict]:
-    """Execute a SQL query and return results as list of dicts."""
-    conn = get_connection()
-    try:
-        result = conn.execute(sql).fetchdf()
+    """Execute a SQL query (under the query guard) and return results as list of dicts."""
+    with get_connection() as conn:
+        result = guarded_fetchdf(conn, sql)
         return result.to_dict(orient='records')
-    finally:
-        conn.close()
@@ -0,0 +1,244 @@
+"""
+In-process metrics for the ask pipeline, rendered in Prometheus text format.
+
+- counters and histograms with labels (no prometheus_client dependency)
+- span("stage") times a block, observes datapilot_stage_seconds{stage}
+  and, inside an HTTP request, records it for the Server-Timing header
+
+Spans recorded in worker threads (run_db, asyncio.to_thread) land in
+the same request because both copy the caller's context.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+_registry = {}  # name -> metric
+_registry_lock = threading.Lock()
+
+# (stage, seconds) spans for the current HTTP request, if any
+_request_spans: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "request_spans", default=None
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# ======================================
+# Metric types
+# ======================================
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+
+        lines = []
+        for key, series in items:
+            for bound, n in zip(self.buckets, series):
+                le = f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {n}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def _get_or_create(cls, name: str, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        return metric
+
+
+def counter(name: str, help: str, labels: tuple = ()) -> Counter:
+    return _get_or_create(Counter, name, help, labels)
+
+
+def histogram(name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help, labels, buckets)
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+
+    lines = []
+    for m in metrics:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m.samples())
+    return "\n".join(lines) + "\n"
+
+
+# ======================================
+# Pipeline metrics
+# ======================================
+STAGE_SECONDS = histogram(
+    "datapilot_stage_seconds", "Time spent per ask pipeline stage", ("stage",)
+)
+HTTP_SECONDS = histogram(
+    "datapilot_http_request_seconds", "HTTP request latency", ("method", "route", "status")
+)
+LLM_TOKENS = counter(
+    "datapilot_llm_tokens_total", "LLM tokens used", ("kind",)
+)
+LLM_SECONDS = histogram(
+    "datapilot_llm_request_seconds", "LLM request latency per backend", ("backend",)
+)
+LLM_REQUESTS = counter(
+    "datapilot_llm_requests_total", "LLM requests per backend by outcome", ("backend", "outcome")
+)
+PROMPT_TOKENS = histogram(
+    "datapilot_prompt_tokens", "SQL prompt tokens before and after column pruning", ("stage",),
+    buckets=SIZE_BUCKETS,
+)
+PROMPT_COLUMNS_PRUNED = histogram(
+    "datapilot_prompt_columns_pruned", "Columns dropped from over-budget prompts", buckets=SIZE_BUCKETS
+)
+RESULT_ROWS = histogram(
+    "datapilot_result_rows", "Rows returned by /ask", buckets=SIZE_BUCKETS
+)
+RESULT_BYTES = histogram(
+    "datapilot_result_bytes", "In-memory size of /ask results", buckets=SIZE_BUCKETS
+)
+SLOW_QUERIES = counter(
+    "datapilot_slow_queries_total", "Queries slower than SLOW_QUERY_MS"
+)
+QUERIES_ABORTED = counter(
+    "datapilot_queries_aborted_total", "Queries stopped by the query guard", ("reason",)
+)
+SQL_TEMPLATE_LOOKUPS = counter(
+    "datapilot_sql_template_lookups_total", "Questions matched against learned SQL templates", ("outcome",)
+)
+SQL_TEMPLATE_SAVED = counter(
+    "datapilot_sql_template_saved_seconds_total", "Estimated LLM time saved by SQL template hits"
+)
+PREPARED_STATEMENTS = counter(
+    "datapilot_prepared_statements_total", "Template executions by prepared-statement outcome", ("outcome",)
+)
+ROLLUP_QUERIES = counter(
+    "datapilot_rollup_queries_total", "Aggregate queries answered from a rollup or the base table", ("outcome",)
+)
+INGEST_JOBS = counter(
+    "datapilot_ingest_jobs_total", "Background ingestion jobs by outcome", ("outcome",)
+)
+INGEST_JOB_SECONDS = histogram(
+    "datapilot_ingest_job_seconds", "Background ingestion job run time",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+SQL_VALIDATIONS = counter(
+    "datapilot_sql_validations_total", "Generated SQL by validation outcome", ("outcome",)
+)
+SQL_REPAIRS = histogram(
+    "datapilot_sql_repair_attempts", "LLM repair calls per generated query", buckets=(0, 1, 2, 3)
+)
+
+
+# ======================================
+# Spans
+# ======================================
+def start_request() -> list:
+    """Begin collecting spans for the current request."""
+    spans = []
+    _request_spans.set(spans)
+    return spans
+
+
+def record_span(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start)
+
+
+def server_timing(spans: list) -> str:
+    """
+    Format spans as a Server-Timing header value.
+
+    Example: "context;dur=1.2, llm;dur=840.5, execute;dur=12.0"
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans)
+
+
+def record_tokens(usage):
+    """Count tokens from an OpenAI-style usage object (may be missing)."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if prompt:
+        LLM_TOKENS.inc(prompt, kind="prompt")
+    if completion:
+        LLM_TOKENS.inc(completion, kind="completion")
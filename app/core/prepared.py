@@ -0,0 +1,117 @@
+"""
+Per-cursor DuckDB prepared statements.
+
+Prepared statements belong to the cursor that prepared them, so each
+pooled cursor keeps its own LRU of statement names (derived from the
+template text). A template is prepared the first time it runs on a
+cursor; later runs only EXECUTE it with new values, skipping parsing
+and planning.
+
+The Python API can not bind parameters to EXECUTE, so values are sent
+as SQL literals.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import duckdb
+
+from app.core.metrics import PREPARED_STATEMENTS
+
+logger = logging.getLogger(__name__)
+
+PREPARED_PER_CONNECTION = int(os.environ.get("PREPARED_PER_CONNECTION", "64"))
+
+_statements = weakref.WeakKeyDictionary()  # cursor -> OrderedDict(name -> None)
+_unpreparable = set()  # templates DuckDB refused to prepare (e.g. untyped parameters)
+_lock = threading.Lock()
+
+
+def sql_literal(value) -> str:
+    """
+    A value as a DuckDB literal.
+
+    Examples:
+      "O'Brien" -> 'O''Brien'
+      10        -> 10
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def statement_name(template: str) -> str:
+    return "dp_" + hashlib.sha1(template.encode()).hexdigest()[:16]
+
+
+def _names(conn) -> OrderedDict:
+    with _lock:
+        names = _statements.get(conn)
+        if names is None:
+            names = _statements[conn] = OrderedDict()
+        return names
+
+
+def preparable(template: str) -> bool:
+    return template not in _unpreparable
+
+
+def is_prepared(conn, template: str) -> bool:
+    return statement_name(template) in _names(conn)
+
+
+def forget(conn, template: str):
+    """Drop a statement that failed (e.g. its table was replaced)."""
+    name = statement_name(template)
+    names = _names(conn)
+    if names.pop(name, False) is not False:
+        try:
+            conn.execute(f"DEALLOCATE {name}")
+        except Exception:
+            pass
+
+
+def execute_prepared(conn, template: str, params: list):
+    """
+    Run template ($1, $2, ... placeholders) with params on conn,
+    preparing it first if this cursor has not seen it. Returns the
+    executed relation, like conn.execute().
+
+    Cursors are used by one thread at a time (see DuckDBPool), so the
+    per-cursor LRU needs no lock of its own.
+    """
+    name = statement_name(template)
+    names = _names(conn)
+
+    if name in names:
+        names.move_to_end(name)
+        PREPARED_STATEMENTS.inc(outcome="reused")
+    else:
+        try:
+            conn.execute(f"PREPARE {name} AS {template}")
+        except duckdb.InterruptException:
+            raise
+        except duckdb.Error:
+            with _lock:
+                if len(_unpreparable) < 10_000:
+                    _unpreparable.add(template)
+            raise
+        names[name] = None
+        PREPARED_STATEMENTS.inc(outcome="prepared")
+        while len(names) > PREPARED_PER_CONNECTION:
+            old, _ = names.popitem(last=False)
+            try:
+                conn.execute(f"DEALLOCATE {old}")
+            except Exception as e:
+                logger.warning(f"Failed to deallocate {old}: {e}")
+
+    args = ", ".join(sql_literal(p) for p in params)
+    return conn.execute(f"EXECUTE {name}({args})" if params else f"EXECUTE {name}")
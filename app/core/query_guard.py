@@ -0,0 +1,240 @@
+"""
+Execution guard for generated queries.
+
+- cost check: EXPLAIN (FORMAT JSON) estimates the rows each operator
+  handles; queries over QUERY_MAX_ESTIMATED_ROWS are rejected before
+  they run (nested-loop joins and cross products count left x right)
+- wall-clock timeout: a timer interrupts the cursor after
+  QUERY_TIMEOUT_SECONDS; for a streamed result the clock runs from
+  opening it until the last row is fetched
+- cancellation: the request's QueryGuard interrupts its running cursor
+  when the client disconnects
+
+Interrupting only stops the query on that cursor; other requests on
+other pooled cursors keep running. Memory and thread caps are set for
+the whole database when the pool opens (see core/database.py), since
+DuckDB does not support them per cursor.
+
+The guard for the current request lives in a ContextVar, so queries run
+through run_db() pick it up without passing it around.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import duckdb
+
+from app.core.metrics import PREPARED_STATEMENTS, QUERIES_ABORTED
+from app.core.prepared import execute_prepared, forget, is_prepared, preparable
+
+logger = logging.getLogger(__name__)
+
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", "30"))
+QUERY_MAX_ESTIMATED_ROWS = int(float(os.environ.get("QUERY_MAX_ESTIMATED_ROWS", "1e9")))  # 0 disables
+DISCONNECT_POLL_SECONDS = 0.25
+
+# operators that compare every left row with every right row
+_QUADRATIC = {"CROSS_PRODUCT", "BLOCKWISE_NL_JOIN", "NESTED_LOOP_JOIN"}
+
+
+class QueryAborted(RuntimeError):
+    """Base class: the guard stopped a query."""
+
+
+class QueryTooExpensive(QueryAborted):
+    pass
+
+
+class QueryCancelled(QueryAborted):
+    """Interrupted; reason is "timeout" or "disconnect"."""
+
+    def __init__(self, reason: str):
+        super().__init__(
+            "Query timed out" if reason == "timeout" else "Query cancelled: client disconnected"
+        )
+        self.reason = reason
+
+
+# ======================================
+# Cost estimate
+# ======================================
+def _estimate(node: dict) -> tuple[int, int]:
+    """(estimated output rows, largest row count any operator in the subtree handles)."""
+    children = [_estimate(c) for c in node.get("children", [])]
+    peak = max((p for _, p in children), default=0)
+
+    rows = node.get("extra_info", {}).get("Estimated Cardinality")
+    if node.get("name", "").strip() in _QUADRATIC and len(children) == 2:
+        work = children[0][0] * children[1][0]
+        rows = int(rows) if rows else work
+    elif rows:
+        rows = work = int(rows)
+    else:
+        rows = work = max((r for r, _ in children), default=0)
+
+    return rows, max(peak, work)
+
+
+def estimate_rows(conn, sql: str) -> int:
+    """Largest number of rows any operator of the plan is expected to handle."""
+    rows = conn.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()
+    plan = json.loads(rows[0][-1])
+    return max((_estimate(node)[1] for node in plan), default=0)
+
+
+def check_cost(conn, sql: str, max_rows: int = QUERY_MAX_ESTIMATED_ROWS):
+    """Raise QueryTooExpensive if the plan is estimated to touch too many rows."""
+    if not max_rows:
+        return
+    try:
+        estimate = estimate_rows(conn, sql)
+    except Exception as e:
+        # the query itself will fail with a better error
+        logger.debug(f"Cost estimate failed: {e}")
+        return
+    if estimate > max_rows:
+        QUERIES_ABORTED.inc(reason="cost")
+        raise QueryTooExpensive(
+            f"Query too expensive: about {estimate:,} rows estimated (limit {max_rows:,})"
+        )
+
+
+# ======================================
+# Timeout + cancellation
+# ======================================
+class QueryGuard:
+    """Tracks the cursors one request is running queries on, so they can be interrupted."""
+
+    def __init__(self, timeout: float = QUERY_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self.cancelled = None  # reason, once cancelled
+        self._cursors = {}  # cursor -> its timeout timer
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = "disconnect"):
+        with self._lock:
+            if self.cancelled is None:
+                self.cancelled = reason
+            cursors = list(self._cursors)
+        for cur in cursors:
+            try:
+                cur.interrupt()
+            except Exception as e:
+                logger.warning(f"Failed to interrupt query: {e}")
+
+    def track(self, cur) -> threading.Event:
+        """
+        Register cur until untrack(cur): cancel() interrupts it, and so
+        does a timer once the timeout has passed. Returns an event that
+        is set if the timer fired.
+        """
+        if self.cancelled:
+            raise QueryCancelled(self.cancelled)
+
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            try:
+                cur.interrupt()
+            except Exception:
+                pass
+
+        timer = threading.Timer(self.timeout, on_timeout) if self.timeout else None
+        with self._lock:
+            self._cursors[cur] = timer
+        if timer:
+            timer.daemon = True
+            timer.start()
+        return timed_out
+
+    def untrack(self, cur):
+        with self._lock:
+            timer = self._cursors.pop(cur, None)
+        if timer:
+            timer.cancel()
+
+    def aborted(self, error: Exception, timed_out: threading.Event) -> Exception:
+        """The error to raise for a failure on a tracked cursor."""
+        reason = "timeout" if timed_out.is_set() else self.cancelled
+        if not reason:
+            return error
+        QUERIES_ABORTED.inc(reason=reason)
+        return QueryCancelled(reason)
+
+    @contextmanager
+    def running(self, cur):
+        """Run a query on cur: interrupted after the timeout or on cancel()."""
+        timed_out = self.track(cur)
+        try:
+            yield cur
+        except Exception as e:
+            error = self.aborted(e, timed_out)
+            if error is e:
+                raise
+            raise error
+        finally:
+            self.untrack(cur)
+
+
+_current = contextvars.ContextVar("query_guard", default=None)
+
+
+def current_guard() -> QueryGuard:
+    """The request's guard, or a fresh one (timeout only) outside a request."""
+    return _current.get() or QueryGuard()
+
+
+@contextmanager
+def use_guard(guard: QueryGuard):
+    token = _current.set(guard)
+    try:
+        yield guard
+    finally:
+        _current.reset(token)
+
+
+def guarded_fetchdf(conn, sql: str, prepared: tuple[str, list] | None = None):
+    """
+    conn.execute(sql).fetchdf() with the cost check, timeout and cancellation.
+
+    prepared: optional (template, params) equivalent to sql, run as a
+    prepared statement instead. The cost check runs once per template
+    and cursor; if the statement fails, sql runs as usual.
+    """
+    if prepared is not None and not preparable(prepared[0]):
+        prepared = None
+    if prepared is None or not is_prepared(conn, prepared[0]):
+        check_cost(conn, sql)
+    with current_guard().running(conn):
+        if prepared is not None:
+            try:
+                return execute_prepared(conn, *prepared).fetchdf()
+            except duckdb.InterruptException:
+                raise
+            except duckdb.Error as e:
+                logger.warning(f"Prepared statement failed, running plain SQL: {e}")
+                PREPARED_STATEMENTS.inc(outcome="failed")
+                forget(conn, prepared[0])
+        return conn.execute(sql).fetchdf()
+
+
+async def cancel_on_disconnect(request, guard: QueryGuard, awaitable):
+    """
+    Await a query while watching the HTTP connection; if the client goes
+    away, interrupt the guard's queries (raises QueryCancelled).
+    """
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            logger.info("Client disconnected; cancelling query")
+            guard.cancel("disconnect")
+            return await task
@@ -1,16 +1,25 @@
 from pathlib import Path
+import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.api.endpoints import router
-from app.core.database import create_db_and_tables
+from app.core.database import create_db_and_tables, close_pool, get_pool
+from app.core.metrics import HTTP_SECONDS, render, server_timing, start_request
+from app.services.jobs import get_jobs
+from app.services.sql_cache import get_sql_cache
 
 app = FastAPI(title="DataPilot Backend", version="0.1.0")
 
+# per-request Server-Timing header with the pipeline stage spans
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "false").lower() == "true"
+
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -20,9 +29,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    spans = start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=route.path if route else "other",
+        status=response.status_code,
+    )
+
+    if SERVER_TIMING:
+        spans.append(("total", elapsed))
+        response.headers["Server-Timing"] = server_timing(spans)
+    return response
+
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    get_sql_cache()  # warm from SQLite
+    get_jobs().resume()  # ingestion jobs left by the last process
+
+@app.on_event("shutdown")
+def on_shutdown():
+    get_jobs().shutdown()
+    close_pool()
 
 # Include API routes
 app.include_router(router, prefix="/api", tags=["data"])
@@ -31,6 +67,19 @@ app.include_router(router, prefix="/api", tags=["data"])
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/db")
+def db_health_check():
+    pool = get_pool()
+    return {
+        "status": "ok" if pool.health_check() else "error",
+        "pool": pool.stats(),
+    }
+
 # Serve frontend static files (built with `npm run build`)
 frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
 if frontend_dist.exists():
@@ -1,12 +1,29 @@
 # ai_service.py
+import asyncio
 import logging
+import os
+import time
 from rag.sql_generator import SQLGenerator
 from rag.llm import LocalLLM
+from rag.prompt import build_repair_prompt
+from app.core.concurrency import run_db
+from app.core.database import get_connection
+from app.core.metrics import SQL_REPAIRS, SQL_VALIDATIONS, span
+from app.services.generator_cache import get_generator_cache
+from app.services.sql_cache import get_sql_cache
+from app.services.sql_templates import SQL_TEMPLATES, get_template_cache, mentioned_values
+from app.services.sql_validator import SQLValidationError, validate_sql
 
 logger = logging.getLogger(__name__)
 
+# LLM calls allowed to fix SQL that fails validation
+SQL_REPAIR_ATTEMPTS = int(os.environ.get("SQL_REPAIR_ATTEMPTS", "1"))
+
 _llm = None
-_generators = {}  # cache per dataset
+
+
+class SQLGenerationError(RuntimeError):
+    """No SQL could be produced: the LLM call failed (error after retries, timeout, auth)."""
 
 
 def get_llm():
@@ -30,22 +47,264 @@ def build_schema_docs(schema: list[dict], table_name: str) -> list[str]:
     return docs
 
 
-def generate_sql(question: str, schema: list[dict], table_name: str, sample_data: list[dict] | None = None) -> str:
+def _get_generator(schema: list[dict], table_name: str) -> SQLGenerator:
+    def build():
+        logger.info(f"Building retriever for {table_name}")
+
+        docs = build_schema_docs(schema, table_name)
+
+        return SQLGenerator(
+            schema_docs=docs,
+            llm_instance=get_llm(),
+            dataset_id=table_name,
+        )
+
+    return get_generator_cache().get(table_name, build)
+
+
+def _cacheable(sql: str) -> bool:
+    return sql.strip().lower().startswith(("select", "with"))
+
+
+# ======================================
+# Literal-parameterized templates
+# ======================================
+def _match_template(
+    question: str, schema: list[dict], table_name: str, value_hints: list[str] | None
+) -> str | None:
+    """SQL from a learned template with this question's values, or None."""
+    if not SQL_TEMPLATES:
+        return None
+    with span("sql_template"):
+        return get_template_cache().match(table_name, schema, question, mentioned_values(value_hints))
+
+
+def _learn_template(question: str, schema: list[dict], table_name: str, sql: str, llm_ms: float | None):
+    if SQL_TEMPLATES and llm_ms is not None and _cacheable(sql):
+        get_template_cache().learn(table_name, schema, question, sql, llm_ms)
+
+
+def _remember(question: str, schema: list[dict], table_name: str, cached: str | None,
+              sql: str, llm_ms: float | None):
+    """
+    Write validated SQL to the SQL cache and template cache. A failed
+    write is logged; it must not turn a good answer into the fallback.
+    """
     try:
-        if table_name not in _generators:
-            logger.info(f"Building retriever ONCE for {table_name}")
+        if sql != cached and _cacheable(sql):
+            get_sql_cache().put(table_name, schema, question, sql)
+        _learn_template(question, schema, table_name, sql, llm_ms)
+    except Exception as e:
+        logger.warning(f"Failed to cache SQL for {table_name}: {e}")
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+# ======================================
+# Validation + repair
+# ======================================
+def _validate(sql: str, schema: list[dict], table_name: str) -> str:
+    with get_connection() as conn:
+        return validate_sql(conn, sql, table_name, schema)
+
+
+def _repair_prompt(question: str, sql: str, error: Exception, schema: list[dict], table_name: str) -> str:
+    return build_repair_prompt(question, build_schema_docs(schema, table_name), sql, str(error))
+
+
+def _give_up(error: SQLValidationError, attempt: int) -> bool:
+    """True if the error is final; records the outcome."""
+    if error.read_only or attempt >= SQL_REPAIR_ATTEMPTS:
+        SQL_VALIDATIONS.inc(outcome="rejected" if error.read_only else "failed")
+        SQL_REPAIRS.observe(attempt)
+        return True
+    return False
+
+
+def _passed(attempt: int):
+    SQL_VALIDATIONS.inc(outcome="repaired" if attempt else "valid")
+    SQL_REPAIRS.observe(attempt)
+
+
+def _validated(question: str, sql: str, schema: list[dict], table_name: str) -> tuple[str, int]:
+    """
+    Validate SQL before it runs; on error, ask the LLM to fix it (at most
+    SQL_REPAIR_ATTEMPTS times). Returns (sql, repair calls made); raises
+    SQLValidationError if it stays invalid.
+    """
+    attempt = 0
+    while True:
+        try:
+            with span("validate"):
+                sql = _validate(sql, schema, table_name)
+            _passed(attempt)
+            return sql, attempt
+        except SQLValidationError as e:
+            if _give_up(e, attempt):
+                raise
+            attempt += 1
+            logger.info(f"Repairing SQL for {table_name} (attempt {attempt}): {e}")
+            with span("repair"):
+                sql = get_llm().generate(_repair_prompt(question, sql, e, schema, table_name))
 
-            docs = build_schema_docs(schema, table_name)
 
-            _generators[table_name] = SQLGenerator(
-                schema_docs=docs,
-                llm_instance=get_llm()
+async def _avalidated(question: str, sql: str, schema: list[dict], table_name: str) -> tuple[str, int]:
+    """Async variant of _validated(); validation runs in the db pool."""
+    attempt = 0
+    while True:
+        try:
+            with span("validate"):
+                sql = await run_db(_validate, sql, schema, table_name)
+            _passed(attempt)
+            return sql, attempt
+        except SQLValidationError as e:
+            if _give_up(e, attempt):
+                raise
+            attempt += 1
+            logger.info(f"Repairing SQL for {table_name} (attempt {attempt}): {e}")
+            with span("repair"):
+                sql = await get_llm().agenerate(_repair_prompt(question, sql, e, schema, table_name))
+
+
+def generate_sql(
+    question: str,
+    schema: list[dict],
+    table_name: str,
+    sample_data: list[dict] | None = None,
+    value_hints: list[str] | None = None,
+    examples: list[tuple[str, str]] | None = None,
+) -> str:
+    try:
+        cache = get_sql_cache()
+        with span("sql_cache"):
+            cached = cache.get(table_name, schema, question)
+
+        llm_ms = None
+        sql = cached or _match_template(question, schema, table_name, value_hints)
+        if sql is None:
+            generator = _get_generator(schema, table_name)
+            started = time.perf_counter()
+            sql = generator.generate(
+                question, sample_data=sample_data, value_hints=value_hints, examples=examples
             )
+            llm_ms = _elapsed_ms(started)
+
+        sql, _ = _validated(question, sql, schema, table_name)
+
+    except SQLValidationError:
+        raise
+    except Exception as e:
+        logger.error(f"SQL generation failed for {table_name}: {e}")
+        raise SQLGenerationError(str(e) or type(e).__name__) from e
 
-        generator = _generators[table_name]
+    _remember(question, schema, table_name, cached, sql, llm_ms)
+    return sql
 
-        return generator.generate(question, sample_data=sample_data)
 
+def invalidate_dataset(table_name: str):
+    """Forget everything cached for a table (re-upload or delete)."""
+    get_sql_cache().invalidate(table_name)
+    get_template_cache().invalidate(table_name)
+    get_generator_cache().invalidate(table_name)
+
+    if os.environ.get("USE_LOCAL_RAG", "").lower() == "true":
+        from rag.schema_index import get_schema_index
+        get_schema_index().remove(table_name)
+
+
+async def agenerate_sql(
+    question: str,
+    schema: list[dict],
+    table_name: str,
+    sample_data: list[dict] | None = None,
+    value_hints: list[str] | None = None,
+    examples: list[tuple[str, str]] | None = None,
+) -> str:
+    """
+    Async variant of generate_sql(). Building a generator may load
+    retrieval models and cache lookups may embed the question, so both
+    happen in worker threads.
+
+    The SQL (cached or generated) is validated before it is returned;
+    SQLValidationError means it could not be repaired, SQLGenerationError
+    that the LLM call failed.
+    """
+    try:
+        cache = get_sql_cache()
+        with span("sql_cache"):
+            cached = await asyncio.to_thread(cache.get, table_name, schema, question)
+
+        llm_ms = None
+        sql = cached or _match_template(question, schema, table_name, value_hints)
+        if sql is None:
+            generator = await asyncio.to_thread(_get_generator, schema, table_name)
+            started = time.perf_counter()
+            sql = await generator.agenerate(
+                question, sample_data=sample_data, value_hints=value_hints, examples=examples
+            )
+            llm_ms = _elapsed_ms(started)
+
+        sql, _ = await _avalidated(question, sql, schema, table_name)
+
+    except SQLValidationError:
+        raise
     except Exception as e:
-        logger.error(e)
-        return f"SELECT * FROM {table_name} LIMIT 5"
+        logger.error(f"SQL generation failed for {table_name}: {e}")
+        raise SQLGenerationError(str(e) or type(e).__name__) from e
+
+    await asyncio.to_thread(_remember, question, schema, table_name, cached, sql, llm_ms)
+    return sql
+
+
+async def astream_sql(
+    question: str,
+    schema: list[dict],
+    table_name: str,
+    sample_data: list[dict] | None = None,
+    value_hints: list[str] | None = None,
+    examples: list[tuple[str, str]] | None = None,
+):
+    """
+    Streaming variant of agenerate_sql(). Yields (kind, value) events:
+
+        ("cached", sql)            SQL cache or template hit (no schema / token events)
+        ("schema", docs)           retrieved schema docs
+        ("token", text)            LLM output as it arrives
+        ("validated", (sql, n))    validated SQL after n repair calls, last
+
+    Raises SQLValidationError and SQLGenerationError like agenerate_sql().
+    """
+    try:
+        cache = get_sql_cache()
+        with span("sql_cache"):
+            cached = await asyncio.to_thread(cache.get, table_name, schema, question)
+
+        llm_ms = None
+        sql = cached or _match_template(question, schema, table_name, value_hints)
+        if sql is not None:
+            yield "cached", sql
+        else:
+            generator = await asyncio.to_thread(_get_generator, schema, table_name)
+            started = time.perf_counter()
+            sql = ""
+            async for kind, value in generator.astream(
+                question, sample_data=sample_data, value_hints=value_hints, examples=examples
+            ):
+                if kind == "sql":
+                    sql = value
+                else:
+                    yield kind, value
+            llm_ms = _elapsed_ms(started)
+
+        sql, repairs = await _avalidated(question, sql, schema, table_name)
+
+    except SQLValidationError:
+        raise
+    except Exception as e:
+        logger.error(f"SQL generation failed for {table_name}: {e}")
+        raise SQLGenerationError(str(e) or type(e).__name__) from e
+
+    await asyncio.to_thread(_remember, question, schema, table_name, cached, sql, llm_ms)
+    yield "validated", (sql, repairs)
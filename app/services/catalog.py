@@ -0,0 +1,175 @@
+"""
+Per-dataset profile catalog.
+
+Computed once at ingestion and persisted to SQLite, so /ask can build
+prompts from memory instead of running DESCRIBE + sample queries on
+every question. A profile holds:
+- schema and row count
+- a few representative (reservoir-sampled) rows
+- per column: null ratio, approx distinct count, min/max, and top-k
+  values for low-cardinality text columns
+"""
+
+import json
+import logging
+import os
+import threading
+
+from sqlmodel import Session
+
+from app.api.models import DatasetProfile
+from app.core.database import engine, get_connection
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_ROWS = int(os.environ.get("PROFILE_SAMPLE_ROWS", "3"))
+PROFILE_TOP_K = int(os.environ.get("PROFILE_TOP_K", "10"))
+# text columns with at most this many distinct values get top-k values
+PROFILE_TOP_K_MAX_DISTINCT = int(os.environ.get("PROFILE_TOP_K_MAX_DISTINCT", "50"))
+
+_profiles = {}  # dataset_id -> profile dict
+_lock = threading.Lock()
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _json_rows(df) -> list[dict]:
+    """DataFrame -> JSON-safe list of dicts (NaN -> None)."""
+    return json.loads(df.to_json(orient="records"))
+
+
+# ======================================
+# Build
+# ======================================
+def build_profile(conn, table_name: str) -> dict:
+    """Profile a DuckDB table in one SUMMARIZE pass plus one top-k query."""
+    summary = conn.execute(f"SUMMARIZE {table_name}").fetchall()
+    row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+    schema = []
+    columns = {}
+    top_k_cols = []
+
+    for name, col_type, min_v, max_v, approx_unique, *_rest, null_pct in summary:
+        schema.append({"column": name, "type": col_type})
+        columns[name] = {
+            "type": col_type,
+            "min": min_v,
+            "max": max_v,
+            "distinct": int(approx_unique or 0),
+            "null_ratio": float(null_pct or 0) / 100,
+        }
+        if col_type == "VARCHAR" and 0 < (approx_unique or 0) <= PROFILE_TOP_K_MAX_DISTINCT:
+            top_k_cols.append(name)
+
+    if top_k_cols:
+        top_sql = " UNION ALL ".join(
+            f"""SELECT * FROM (
+                    SELECT '{c.replace("'", "''")}' AS col, {_q(c)} AS val, COUNT(*) AS n
+                    FROM {table_name} WHERE {_q(c)} IS NOT NULL
+                    GROUP BY 2 ORDER BY 3 DESC LIMIT {PROFILE_TOP_K}
+                )"""
+            for c in top_k_cols
+        )
+        for col, val, _n in conn.execute(top_sql).fetchall():
+            columns[col].setdefault("top_values", []).append(val)
+
+    # dates/timestamps as DuckDB renders them ("2024-01-28"), not ISO-with-millis
+    projection = ", ".join(
+        f"CAST({_q(c['column'])} AS VARCHAR) AS {_q(c['column'])}"
+        if c["type"].startswith(("DATE", "TIME")) else _q(c["column"])
+        for c in schema
+    )
+    sample = conn.execute(
+        f"SELECT {projection} FROM {table_name} "
+        f"USING SAMPLE reservoir({PROFILE_SAMPLE_ROWS} ROWS) REPEATABLE (42)"
+    ).fetchdf()
+
+    return {
+        "schema": schema,
+        "row_count": row_count,
+        "sample_rows": _json_rows(sample),
+        "columns": columns,
+    }
+
+
+# ======================================
+# Cache + persistence
+# ======================================
+def refresh_profile(dataset_id: str) -> dict:
+    """(Re)compute, persist and cache the profile for a dataset table."""
+    with get_connection() as conn:
+        profile = build_profile(conn, dataset_id)
+
+    with Session(engine) as session:
+        session.merge(DatasetProfile(
+            dataset_id=dataset_id,
+            profile_json=json.dumps(profile, default=str),
+        ))
+        session.commit()
+
+    with _lock:
+        _profiles[dataset_id] = profile
+    return profile
+
+
+def get_profile(dataset_id: str) -> dict:
+    """Memory, then SQLite, then compute (datasets from before profiling)."""
+    with _lock:
+        profile = _profiles.get(dataset_id)
+    if profile is not None:
+        return profile
+
+    with Session(engine) as session:
+        row = session.get(DatasetProfile, dataset_id)
+    if row is not None:
+        profile = json.loads(row.profile_json)
+        with _lock:
+            _profiles[dataset_id] = profile
+        return profile
+
+    return refresh_profile(dataset_id)
+
+
+def forget_profile(dataset_id: str):
+    """Drop the in-memory copy (the table changed or is going away)."""
+    with _lock:
+        _profiles.pop(dataset_id, None)
+
+
+def delete_profile(dataset_id: str):
+    forget_profile(dataset_id)
+    with Session(engine) as session:
+        row = session.get(DatasetProfile, dataset_id)
+        if row is not None:
+            session.delete(row)
+            session.commit()
+
+
+# ======================================
+# Prompt hints
+# ======================================
+def value_hints(profile: dict, max_len: int = 60) -> list[str]:
+    """
+    One short line per column telling the LLM what values look like.
+
+    Examples:
+      "region: one of 'East', 'West', 'North'"
+      "revenue: 1.5 to 499.9"
+      "notes: 12% null"
+    """
+    hints = []
+    for name, col in profile.get("columns", {}).items():
+        parts = []
+        if col.get("top_values"):
+            values = ", ".join(f"'{str(v)[:max_len]}'" for v in col["top_values"])
+            parts.append(f"one of {values}")
+        elif col.get("min") is not None and col["type"] != "VARCHAR":
+            parts.append(f"{col['min']} to {col['max']}")
+        if col.get("null_ratio", 0) >= 0.01:
+            parts.append(f"{col['null_ratio']:.0%} null")
+        if parts:
+            hints.append(f"{name}: " + "; ".join(parts))
+    return hints
@@ -0,0 +1,121 @@
+"""
+Bounded cache of per-dataset SQLGenerators.
+
+Each generator holds a Retriever (schema docs, and in local RAG mode a
+FAISS index; the embedding/reranking models themselves are shared via
+rag.models). Generators are kept in an LRU bounded by entry count and
+an approximate memory budget, expire after GENERATOR_CACHE_TTL seconds
+without use, and are evicted when their dataset is invalidated.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+GENERATOR_CACHE_SIZE = int(os.environ.get("GENERATOR_CACHE_SIZE", "64"))
+GENERATOR_CACHE_TTL = float(os.environ.get("GENERATOR_CACHE_TTL", "3600"))
+GENERATOR_CACHE_MB = float(os.environ.get("GENERATOR_CACHE_MB", "128"))
+
+
+def _nbytes(generator) -> int:
+    retriever = getattr(generator, "retriever", None)
+    if retriever is None or not hasattr(retriever, "nbytes"):
+        return 0
+    return retriever.nbytes()
+
+
+class GeneratorCache:
+
+    def __init__(
+        self,
+        max_entries: int = GENERATOR_CACHE_SIZE,
+        ttl: float = GENERATOR_CACHE_TTL,
+        max_bytes: int = int(GENERATOR_CACHE_MB * 1024 * 1024),
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # table -> (generator, nbytes, last_used)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "hits": 0,
+            "builds": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+        }
+
+    def _pop(self, table: str):
+        _, nbytes, _ = self._entries.pop(table)
+        self._bytes -= nbytes
+
+    def get(self, table: str, build):
+        """Cached generator for a table, calling build() on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(table)
+            if item is not None:
+                generator, nbytes, last_used = item
+                if now - last_used <= self.ttl:
+                    self._entries[table] = (generator, nbytes, now)
+                    self._entries.move_to_end(table)
+                    self._stats["hits"] += 1
+                    return generator
+                self._pop(table)
+                self._stats["expired"] += 1
+
+        # build outside the lock: it may embed every schema doc
+        generator = build()
+        nbytes = _nbytes(generator)
+
+        with self._lock:
+            self._stats["builds"] += 1
+            if table in self._entries:
+                self._pop(table)
+            self._entries[table] = (generator, nbytes, time.monotonic())
+            self._bytes += nbytes
+
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                evicted, _ = next(iter(self._entries.items()))
+                self._pop(evicted)
+                self._stats["evictions"] += 1
+                logger.info(f"Evicted SQL generator for {evicted}")
+
+        return generator
+
+    def invalidate(self, table: str):
+        with self._lock:
+            if table in self._entries:
+                self._pop(table)
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_entries"] = self.max_entries
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_generator_cache() -> GeneratorCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GeneratorCache()
+    return _cache
@@ -1,13 +1,51 @@
 """
-Ingestion service: CSV/Excel -> DuckDB with clean SQL-safe columns
+Ingestion service: CSV/Excel/Parquet/JSON -> DuckDB with clean SQL-safe columns
+
+Files are streamed into DuckDB rather than materialized in pandas:
+- CSV, Parquet and JSON/NDJSON (optionally .gz / .zst compressed) go
+  through DuckDB's native readers, with the cleaned column names
+  applied as a projection
+- Parquet can also be registered as an external view that queries the
+  uploaded file in place (no copy, projection/predicate pushdown)
+- .xlsx is read row by row and appended in chunks
+- legacy .xls (capped at 65,536 rows by the format) still uses pandas
+
+append_file() loads a file into a staging table the same way and then
+appends it to (or upserts it into) an existing dataset table.
+
+Both take an optional progress object (see services/jobs.py) with
+attach(conn) / detach(conn) around the DuckDB work and rows(n) per
+appended Excel chunk, which may raise to stop the ingestion.
 """
 
+import logging
+import os
+import threading
 import uuid
 import re
 from pathlib import Path
+import duckdb
 import pandas as pd
 
 from app.core.database import get_connection
+from app.services.value_index import build_value_index, merge_value_index
+
+logger = logging.getLogger(__name__)
+
+EXCEL_CHUNK_ROWS = int(os.environ.get("EXCEL_CHUNK_ROWS", "50000"))
+
+COMPRESSION_SUFFIXES = (".gz", ".zst", ".zstd")
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".xlsx": "xlsx",
+    ".xls": "xls",
+}
+# formats DuckDB can read through a compression wrapper
+COMPRESSIBLE_FORMATS = {"csv", "json", "ndjson"}
 
 
 # ======================================
@@ -37,33 +75,8 @@ def _clean_col(name: str) -> str:
     return name
 
 
-# ======================================
-# Main ingestion function
-# ======================================
-def ingest_file(file_path: Path, table_name: str | None = None) -> dict:
-    """
-    Load CSV or Excel into DuckDB with cleaned columns
-    """
-
-    if table_name is None:
-        table_name = f"dataset_{uuid.uuid4().hex[:8]}"
-
-    ext = file_path.suffix.lower()
-    if ext not in [".csv", ".xlsx", ".xls"]:
-        raise ValueError("Only CSV or Excel supported")
-
-    # -----------------------
-    # Load file into pandas
-    # -----------------------
-    if ext == ".csv":
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-
-    # -----------------------
-    # Clean column names
-    # -----------------------
-    original_cols = list(df.columns)
+def _clean_columns(original_cols: list) -> list[str]:
+    """Clean every column name and make the result unique."""
     cleaned_cols = [_clean_col(c) for c in original_cols]
 
     # ensure uniqueness
@@ -77,39 +90,477 @@ def ingest_file(file_path: Path, table_name: str | None = None) -> dict:
             seen[c] += 1
             final_cols.append(f"{c}_{seen[c]}")
 
-    df.columns = final_cols
+    return final_cols
 
-    column_mapping = [
-        {"original": o, "clean": c}
-        for o, c in zip(original_cols, final_cols)
+
+def _quote_ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def detect_format(filename: str) -> str | None:
+    """
+    Map a filename to an ingestion format, looking through .gz/.zst.
+
+    Examples:
+      "sales.csv"        -> "csv"
+      "events.ndjson.gz" -> "ndjson"
+      "report.pdf"       -> None
+    """
+    name = filename.lower()
+
+    compressed = name.endswith(COMPRESSION_SUFFIXES)
+    if compressed:
+        name = name[:name.rindex(".")]
+
+    fmt = FILE_FORMATS.get(Path(name).suffix)
+    if compressed and fmt not in COMPRESSIBLE_FORMATS:
+        return None
+    return fmt
+
+
+# ======================================
+# CSV / Parquet / JSON: native DuckDB readers
+# ======================================
+def _reader_sql(file_path: Path, fmt: str, options: str = "") -> str:
+    path = _quote_literal(file_path.resolve())
+
+    if fmt == "csv":
+        return f"read_csv({path}, header=true{options})"
+    if fmt == "parquet":
+        return f"read_parquet({path}{options})"
+    if fmt == "ndjson":
+        return f"read_json({path}, format='newline_delimited'{options})"
+    return f"read_json({path}{options})"
+
+
+def _create_from_source(conn, source: str, table_name: str, external: bool) -> list[str]:
+    """
+    CREATE TABLE (or VIEW) over a DuckDB reader with cleaned column names.
+    Returns the original column names.
+    """
+    original_cols = [
+        r[0] for r in conn.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()
     ]
+    final_cols = _clean_columns(original_cols)
 
-    # -----------------------
-    # Write into DuckDB
-    # -----------------------
-    conn = get_connection()
+    projection = ", ".join(
+        f"{_quote_ident(o)} AS {c}" for o, c in zip(original_cols, final_cols)
+    )
+
+    kind = "VIEW" if external else "TABLE"
+    conn.execute(f"""
+        CREATE OR REPLACE {kind} {table_name}
+        AS SELECT {projection} FROM {source}
+    """)
 
+    return original_cols
+
+
+def _ingest_native(conn, file_path: Path, fmt: str, table_name: str, external: bool) -> list[str]:
+    """
+    Stream a CSV / Parquet / JSON file straight into DuckDB.
+    Returns the original column names.
+    """
     try:
-        conn.register("tmp_df", df)
+        return _create_from_source(conn, _reader_sql(file_path, fmt), table_name, external)
+    except (duckdb.ConversionException, duckdb.InvalidInputException) as e:
+        if fmt == "parquet":
+            raise
+        # the sniffer only samples the head of the file; when a later row
+        # disagrees with the guessed types, re-sniff over the whole file
+        logger.info(f"Type sniffing failed on sample ({e}); retrying with full scan")
+        return _create_from_source(
+            conn, _reader_sql(file_path, fmt, ", sample_size=-1"), table_name, external
+        )
 
-        conn.execute(f"""
-            CREATE OR REPLACE TABLE {table_name}
-            AS SELECT * FROM tmp_df
-        """)
 
-        schema_rows = conn.execute(f"DESCRIBE {table_name}").fetchall()
-        row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+def drop_relation(conn, name: str):
+    """DROP a dataset whether it was ingested as a table or a view."""
+    row = conn.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = ?",
+        [name],
+    ).fetchone()
+
+    if row and row[0] == "VIEW":
+        conn.execute(f"DROP VIEW IF EXISTS {name}")
+    else:
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+
+
+# ======================================
+# Excel: chunked append
+# ======================================
+_INTEGER_TYPES = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT"}
+
+
+def _widen_for_chunk(conn, table_name: str, chunk: pd.DataFrame):
+    """
+    Widen table columns when a later chunk holds text where earlier
+    chunks looked numeric (or were empty), or fractions where they
+    looked integral.
+    """
+    types = dict(
+        (r[0], r[1]) for r in conn.execute(f"DESCRIBE {table_name}").fetchall()
+    )
+
+    for col in chunk.columns:
+        current = types.get(col)
+        is_text = (
+            pd.api.types.is_object_dtype(chunk[col])
+            or pd.api.types.is_string_dtype(chunk[col])
+        )
+        if is_text and chunk[col].notna().any() and current != "VARCHAR":
+            conn.execute(f"ALTER TABLE {table_name} ALTER {col} TYPE VARCHAR")
+        elif pd.api.types.is_float_dtype(chunk[col]) and current in _INTEGER_TYPES:
+            conn.execute(f"ALTER TABLE {table_name} ALTER {col} TYPE DOUBLE")
+
+
+def _append_chunk(conn, table_name: str, chunk: pd.DataFrame, first: bool):
+    conn.register("tmp_chunk", chunk)
+
+    try:
+        if first:
+            conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM tmp_chunk")
+        else:
+            _widen_for_chunk(conn, table_name, chunk)
+            conn.execute(f"INSERT INTO {table_name} SELECT * FROM tmp_chunk")
+
+    finally:
+        conn.unregister("tmp_chunk")
+
+
+def _ingest_xlsx(conn, file_path: Path, table_name: str, progress=None) -> list:
+    """
+    Read an .xlsx sheet in row chunks and append them to DuckDB.
+    Returns the original column names.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("Excel file is empty")
+
+        original_cols = [
+            h if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)
+        ]
+        final_cols = _clean_columns(original_cols)
+
+        width = len(final_cols)
+        first = True
+        batch = []
+        for row in rows:
+            # read-only sheets may return short rows
+            batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(batch) >= EXCEL_CHUNK_ROWS:
+                chunk = pd.DataFrame.from_records(batch, columns=final_cols).infer_objects()
+                _append_chunk(conn, table_name, chunk, first)
+                if progress is not None:
+                    progress.rows(len(batch))
+                first = False
+                batch = []
+
+        if batch or first:
+            chunk = pd.DataFrame.from_records(batch, columns=final_cols).infer_objects()
+            _append_chunk(conn, table_name, chunk, first)
+            if progress is not None:
+                progress.rows(len(batch))
 
     finally:
-        conn.close()
+        wb.close()
+
+    return original_cols
+
+
+def _ingest_xls(conn, file_path: Path, table_name: str) -> list:
+    df = pd.read_excel(file_path)
+
+    original_cols = list(df.columns)
+    df.columns = _clean_columns(original_cols)
+
+    _append_chunk(conn, table_name, df, first=True)
+
+    return original_cols
+
+
+# ======================================
+# Staging
+# ======================================
+def _load(conn, file_path: Path, fmt: str, table_name: str, external: bool = False, progress=None) -> list:
+    """Load a file into table_name with cleaned columns; returns the original names."""
+    if progress is not None:
+        progress.attach(conn)
+    try:
+        if fmt == "xlsx":
+            return _ingest_xlsx(conn, file_path, table_name, progress)
+        if fmt == "xls":
+            return _ingest_xls(conn, file_path, table_name)
+        return _ingest_native(conn, file_path, fmt, table_name, external)
+    finally:
+        if progress is not None:
+            progress.detach(conn)
+
+
+# ======================================
+# Main ingestion function
+# ======================================
+def ingest_file(
+    file_path: Path,
+    table_name: str | None = None,
+    external: bool = False,
+    progress=None,
+) -> dict:
+    """
+    Load a data file into DuckDB with cleaned columns.
+
+    external=True registers Parquet as a view over the file instead of
+    copying it into a table.
+    """
+
+    if table_name is None:
+        table_name = f"dataset_{uuid.uuid4().hex[:8]}"
+
+    fmt = detect_format(file_path.name)
+    if fmt is None:
+        raise ValueError("Unsupported file type")
+    if external and fmt != "parquet":
+        raise ValueError("External mode is only supported for Parquet")
+
+    # -----------------------
+    # Stream into DuckDB
+    # -----------------------
+    with get_connection() as conn:
+        original_cols = _load(conn, file_path, fmt, table_name, external, progress)
+
+        schema_rows = conn.execute(f"DESCRIBE {table_name}").fetchall()
+        row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
 
     schema = [{"column": r[0], "type": r[1]} for r in schema_rows]
 
+    column_mapping = [
+        {"original": o, "clean": c}
+        for o, c in zip(original_cols, _clean_columns(original_cols))
+    ]
+
     return {
         "dataset_id": table_name,
         "table_name": table_name,
         "schema": schema,
         "row_count": row_count,
         "column_mapping": column_mapping,
+        "storage": "view" if external else "table",
         "message": "Upload successful",
     }
+
+
+# ======================================
+# Append / upsert into an existing table
+# ======================================
+class SchemaMismatch(ValueError):
+    """Incoming columns that do not fit the dataset table."""
+
+
+_table_locks = {}
+_table_locks_lock = threading.Lock()
+
+
+def _table_lock(table_name: str) -> threading.Lock:
+    """One append at a time per table (ALTERs and MERGEs would conflict)."""
+    with _table_locks_lock:
+        return _table_locks.setdefault(table_name, threading.Lock())
+
+
+def _describe(conn, name: str) -> dict[str, str]:
+    return {r[0]: r[1] for r in conn.execute(f"DESCRIBE {name}").fetchall()}
+
+
+def _common_type(conn, a: str, b: str) -> str:
+    """Narrowest type holding both a and b (VARCHAR if there is none)."""
+    try:
+        return conn.execute(f"SELECT typeof([NULL::{a}, NULL::{b}][1])").fetchone()[0]
+    except duckdb.Error:
+        return "VARCHAR"
+
+
+def _fits(conn, staging: str, col: str, source_type: str, target_type: str) -> bool:
+    """Whether every incoming value of col converts to the table's type."""
+    if source_type == target_type:
+        return True
+    if conn.execute(
+        f"SELECT can_cast_implicitly(NULL::{source_type}, NULL::{target_type})"
+    ).fetchone()[0]:
+        return True
+    if source_type != "VARCHAR" or target_type in _INTEGER_TYPES:
+        return False  # DOUBLE -> BIGINT and '2.5' -> BIGINT would round
+    # e.g. a small CSV sniffed as VARCHAR whose values are all dates
+    col = _quote_ident(col)
+    return conn.execute(
+        f"SELECT COUNT({col}) = COUNT(TRY_CAST({col} AS {target_type})) FROM {staging}"
+    ).fetchone()[0]
+
+
+def _reconcile(conn, table_name: str, staging: str, widen: bool) -> dict:
+    """
+    Check the staged columns against the table, widening the table when
+    allowed. Returns {"added": [...], "widened": [...]}.
+    """
+    target = _describe(conn, table_name)
+    incoming = _describe(conn, staging)
+
+    added = [c for c in incoming if c not in target]
+    conflicts = [
+        c for c, t in incoming.items()
+        if c in target and not _fits(conn, staging, c, t, target[c])
+    ]
+
+    if (added or conflicts) and not widen:
+        problems = [f"new column {c} ({incoming[c]})" for c in added]
+        problems += [f"{c}: {incoming[c]} does not fit {target[c]}" for c in conflicts]
+        raise SchemaMismatch(
+            "Incoming columns do not match the dataset: " + "; ".join(problems)
+            + ". Retry with widen=true to add or widen columns."
+        )
+
+    widened = []
+    for c in conflicts:
+        new_type = _common_type(conn, target[c], incoming[c])
+        conn.execute(f"ALTER TABLE {table_name} ALTER {_quote_ident(c)} TYPE {new_type}")
+        widened.append({"column": c, "from": target[c], "to": new_type})
+    for c in added:
+        conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {_quote_ident(c)} {incoming[c]}")
+
+    return {"added": added, "widened": widened}
+
+
+def _insert(conn, table_name: str, staging: str, columns: list[str], types: dict) -> int:
+    cols = ", ".join(_quote_ident(c) for c in columns)
+    projection = ", ".join(f"CAST({_quote_ident(c)} AS {types[c]})" for c in columns)
+    return conn.execute(
+        f"INSERT INTO {table_name} ({cols}) SELECT {projection} FROM {staging}"
+    ).fetchone()[0]
+
+
+def _upsert(conn, table_name: str, staging: str, columns: list[str], types: dict,
+            keys: list[str]) -> tuple[int, int]:
+    """MERGE staged rows on the key columns. Returns (inserted, updated)."""
+    key_list = ", ".join(_quote_ident(k) for k in keys)
+    # with repeated keys in the file, its last row wins
+    source = f"""(
+        SELECT {", ".join(f"CAST({_quote_ident(c)} AS {types[c]}) AS {_quote_ident(c)}" for c in columns)}
+        FROM {staging}
+        QUALIFY row_number() OVER (PARTITION BY {key_list} ORDER BY rowid DESC) = 1
+    )"""
+    on = " AND ".join(f"t.{_quote_ident(k)} = s.{_quote_ident(k)}" for k in keys)
+
+    updated = conn.execute(
+        f"SELECT COUNT(*) FROM {source} s WHERE EXISTS (SELECT 1 FROM {table_name} t WHERE {on})"
+    ).fetchone()[0]
+    values = [c for c in columns if c not in keys]
+    matched = (
+        f"WHEN MATCHED THEN UPDATE SET {', '.join(f'{_quote_ident(c)} = s.{_quote_ident(c)}' for c in values)} "
+        if values else ""
+    )
+    total = conn.execute(f"""
+        MERGE INTO {table_name} t USING {source} s ON {on}
+        {matched}WHEN NOT MATCHED THEN INSERT BY NAME
+    """).fetchone()[0]
+    return total - (updated if values else 0), updated
+
+
+def append_file(
+    file_path: Path,
+    table_name: str,
+    key: list[str] | None = None,
+    widen: bool = False,
+    progress=None,
+) -> dict:
+    """
+    Append the rows of a data file to an existing dataset table, or
+    upsert them on the key columns (rows with a matching key are
+    updated, the others inserted).
+
+    Column names are cleaned like at upload. Columns missing from the
+    file are left NULL (or unchanged by an upsert). New columns and
+    values that do not fit a column's type are rejected with
+    SchemaMismatch, unless widen=True adds / widens those columns.
+
+    The value index is extended with the appended values (rebuilt after
+    an upsert, which can also remove values).
+    """
+    fmt = detect_format(file_path.name)
+    if fmt is None:
+        raise ValueError("Unsupported file type")
+    keys = [_clean_col(k) for k in key or []]
+
+    staging = f"{table_name}__staging_{uuid.uuid4().hex[:8]}"
+    with _table_lock(table_name), get_connection() as conn:
+        row = conn.execute(
+            "SELECT table_type FROM information_schema.tables WHERE table_name = ?",
+            [table_name],
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Table {table_name} does not exist")
+        if row[0] == "VIEW":
+            raise ValueError("Can not append to an external (view) dataset")
+
+        try:
+            original_cols = _load(conn, file_path, fmt, staging, progress=progress)
+            incoming = _describe(conn, staging)
+            missing_keys = [k for k in keys if k not in incoming or k not in _describe(conn, table_name)]
+            if missing_keys:
+                raise SchemaMismatch(f"Key columns not in both the file and the dataset: {missing_keys}")
+
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                changes = _reconcile(conn, table_name, staging, widen)
+                types = _describe(conn, table_name)
+                columns = list(incoming)
+                if keys:
+                    inserted, updated = _upsert(conn, table_name, staging, columns, types, keys)
+                else:
+                    inserted, updated = _insert(conn, table_name, staging, columns, types), 0
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            schema_rows = conn.execute(f"DESCRIBE {table_name}").fetchall()
+            row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+            text_columns = [r[0] for r in schema_rows if r[1] == "VARCHAR"]
+            if keys or changes["added"] or changes["widened"]:
+                build_value_index(conn, table_name, text_columns)
+            else:
+                merge_value_index(conn, table_name, staging, [c for c in text_columns if c in incoming])
+        finally:
+            conn.execute(f"DROP TABLE IF EXISTS {staging}")
+
+    logger.info(
+        f"{'Upserted' if keys else 'Appended'} {file_path.name} into {table_name}: "
+        f"{inserted} inserted, {updated} updated, {row_count} rows"
+    )
+
+    return {
+        "dataset_id": table_name,
+        "table_name": table_name,
+        "mode": "upsert" if keys else "append",
+        "schema": [{"column": r[0], "type": r[1]} for r in schema_rows],
+        "row_count": row_count,
+        "rows_inserted": inserted,
+        "rows_updated": updated,
+        "columns_added": changes["added"],
+        "columns_widened": changes["widened"],
+        "column_mapping": [
+            {"original": o, "clean": c}
+            for o, c in zip(original_cols, _clean_columns(original_cols))
+        ],
+        "message": "Append successful",
+    }
@@ -0,0 +1,35 @@
+"""
+Single place to invalidate everything derived from a DuckDB table.
+
+Call invalidate_table() whenever a dataset table is created, replaced,
+appended to or dropped.
+"""
+
+import logging
+
+from app.services.ai_service import invalidate_dataset
+from app.services.catalog import forget_profile
+from app.services.query_history import get_few_shot_index
+from app.services.result_cache import get_result_cache
+from app.services.rollups import get_rollups
+
+logger = logging.getLogger(__name__)
+
+
+def invalidate_table(table_name: str):
+    logger.info(f"Invalidating caches for {table_name}")
+
+    # generated SQL
+    invalidate_dataset(table_name)
+
+    # query results
+    get_result_cache().bump_table_version(table_name)
+
+    # in-memory profile (the persisted one is rebuilt or deleted by the caller)
+    forget_profile(table_name)
+
+    # few-shot examples (reloaded from the history on next use)
+    get_few_shot_index().invalidate(table_name)
+
+    # rollups (rebuilt in the background, or dropped with the table)
+    get_rollups().invalidate(table_name)
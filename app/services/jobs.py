@@ -0,0 +1,341 @@
+"""
+Background ingestion jobs.
+
+POST /api/upload only saves the file and answers 202 with a job id; the
+ingestion runs here, on INGEST_JOB_WORKERS threads. Each running job
+holds one pooled DuckDB cursor, so query traffic keeps the rest. At most
+INGEST_JOB_QUEUE jobs wait; further uploads are refused.
+
+Job state is kept in SQLite (IngestJob). While a job runs, bytes
+processed come from DuckDB's query progress on its cursor, and rows
+from the chunks Excel files are appended in. The totals are stored
+when the job finishes.
+
+Queued and running jobs are picked up again at startup: the upload is
+still on disk and ingestion replaces the table, so a rerun is safe.
+Cancelling a queued job drops it; a running one is interrupted.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from sqlmodel import Session, select
+
+from app.api.models import IngestJob
+from app.core.database import engine
+from app.core.metrics import INGEST_JOB_SECONDS, INGEST_JOBS
+
+logger = logging.getLogger(__name__)
+
+INGEST_JOB_WORKERS = int(os.environ.get("INGEST_JOB_WORKERS", "2"))
+INGEST_JOB_QUEUE = int(os.environ.get("INGEST_JOB_QUEUE", "100"))
+
+ACTIVE = ("queued", "running")
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class JobCancelled(RuntimeError):
+    pass
+
+
+# ======================================
+# Progress of one job
+# ======================================
+class JobProgress:
+    """
+    Live progress of a job, passed to ingestion as `progress`.
+
+    The cursor is only touched under the lock, so a cancel or progress
+    read never reaches a cursor that went back to the pool.
+    """
+
+    def __init__(self, bytes_total: int):
+        self.bytes_total = bytes_total
+        self.rows_done = 0
+        self.started = None  # time.time() once running
+        self.stage = "queued"  # -> loading -> finishing (profile, value index, ...)
+        self._fraction = 0.0
+        self.cancelled = threading.Event()
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        conn.execute("SET enable_progress_bar = true")
+        conn.execute("SET enable_progress_bar_print = false")
+        with self._lock:
+            self._conn = conn
+            self.stage = "loading"
+        if self.cancelled.is_set():
+            raise JobCancelled("cancelled")
+
+    def detach(self, conn):
+        with self._lock:
+            self._conn = None
+            self.stage = "finishing"
+        try:
+            conn.execute("RESET enable_progress_bar")
+            conn.execute("RESET enable_progress_bar_print")
+        except Exception as e:
+            logger.warning(f"Failed to reset progress settings: {e}")
+
+    def rows(self, n: int):
+        self.rows_done += n
+        if self.cancelled.is_set():
+            raise JobCancelled("cancelled")
+
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.interrupt()
+                except Exception as e:
+                    logger.warning(f"Failed to interrupt ingestion: {e}")
+
+    def fraction(self) -> float:
+        """Share of the file loaded, from DuckDB's progress on the load statement."""
+        with self._lock:
+            if self.stage == "finishing":
+                return 1.0
+            if self._conn is not None:
+                try:
+                    percent = self._conn.query_progress()
+                except Exception:
+                    percent = -1
+                # never goes back (e.g. between the sniffing and loading statements)
+                if percent >= 0:
+                    self._fraction = max(self._fraction, min(percent, 100.0) / 100)
+            return self._fraction
+
+
+# ======================================
+# Queue
+# ======================================
+class IngestJobs:
+
+    def __init__(self, workers: int = INGEST_JOB_WORKERS, max_queued: int = INGEST_JOB_QUEUE):
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-job")
+        self._handlers = {}  # kind -> handler(job, params, progress) -> result dict
+        self._runs = {}  # job id -> JobProgress, while queued or running
+        self._lock = threading.Lock()
+        self._closing = False
+
+    def register(self, kind: str, handler: Callable[[IngestJob, dict, JobProgress], dict]):
+        self._handlers[kind] = handler
+
+    def full(self) -> bool:
+        with self._lock:
+            return sum(1 for p in self._runs.values() if p.started is None) >= self.max_queued
+
+    def submit(self, kind: str, filename: str, file_path: Path, dataset_id: str,
+               params: dict | None = None) -> IngestJob:
+        """Persist and queue a job; raises JobQueueFull when too many are waiting."""
+        if self.full():
+            raise JobQueueFull(f"{self.max_queued} ingestion jobs are already waiting")
+
+        job = IngestJob(
+            id=uuid.uuid4().hex[:12],
+            kind=kind,
+            status="queued",
+            filename=filename,
+            file_path=str(file_path),
+            dataset_id=dataset_id,
+            params_json=json.dumps(params or {}),
+            bytes_total=file_path.stat().st_size,
+        )
+        with Session(engine) as session:
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+
+        self._enqueue(job.id, job.bytes_total)
+        logger.info(f"Queued {kind} job {job.id} for {filename} ({job.bytes_total} bytes)")
+        return job
+
+    def _enqueue(self, job_id: str, bytes_total: int):
+        progress = JobProgress(bytes_total)
+        with self._lock:
+            self._runs[job_id] = progress
+        self._executor.submit(self._run, job_id, progress)
+
+    def _update(self, job_id: str, **fields) -> IngestJob | None:
+        with Session(engine) as session:
+            job = session.get(IngestJob, job_id)
+            if job is None:
+                return None
+            for name, value in fields.items():
+                setattr(job, name, value)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def _finish(self, job_id: str, status: str, **fields):
+        self._update(job_id, status=status, finished_at=datetime.utcnow(), **fields)
+        INGEST_JOBS.inc(outcome=status)
+
+    def _run(self, job_id: str, progress: JobProgress):
+        try:
+            if self._closing:
+                return  # stays queued for the next start
+            if progress.cancelled.is_set():
+                return  # cancel() already recorded it
+
+            progress.started = time.time()
+            job = self._update(job_id, status="running", started_at=datetime.utcnow())
+            if job is None:
+                return
+            handler = self._handlers.get(job.kind)
+            if handler is None:
+                self._finish(job_id, "failed", error=f"No handler for {job.kind} jobs")
+                return
+
+            start = time.perf_counter()
+            try:
+                result = handler(job, json.loads(job.params_json), progress)
+            except Exception as e:
+                if self._closing:
+                    # interrupted by shutdown: run again on the next start
+                    self._update(job_id, status="queued", started_at=None)
+                elif progress.cancelled.is_set():
+                    self._finish(job_id, "cancelled", rows_processed=progress.rows_done)
+                else:
+                    logger.warning(f"Ingestion job {job_id} failed: {e}")
+                    self._finish(job_id, "failed", error=str(e), rows_processed=progress.rows_done)
+                return
+
+            INGEST_JOB_SECONDS.observe(time.perf_counter() - start)
+            self._finish(
+                job_id, "succeeded",
+                bytes_processed=job.bytes_total,
+                rows_processed=result.get("row_count", progress.rows_done),
+                result_json=json.dumps(result, default=str),
+            )
+            logger.info(f"Ingestion job {job_id} done in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} could not be recorded: {e}")
+        finally:
+            with self._lock:
+                self._runs.pop(job_id, None)
+
+    # -------------------------------------------------------
+    # status / control
+    # -------------------------------------------------------
+
+    def _describe(self, job: IngestJob) -> dict:
+        with self._lock:
+            progress = self._runs.get(job.id)
+
+        bytes_done, rows_done, stage = job.bytes_processed, job.rows_processed, None
+        if job.status == "running" and progress is not None:
+            bytes_done = int(progress.fraction() * job.bytes_total)
+            rows_done = progress.rows_done
+            stage = progress.stage
+
+        elapsed = None
+        if job.started_at:
+            elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "stage": stage,
+            "filename": job.filename,
+            "dataset_id": job.dataset_id,
+            "bytes_total": job.bytes_total,
+            "bytes_processed": bytes_done,
+            "rows_processed": rows_done,
+            "progress": round(bytes_done / job.bytes_total, 4) if job.bytes_total else None,
+            "elapsed_seconds": round(elapsed, 2) if elapsed is not None else None,
+            "bytes_per_second": round(bytes_done / elapsed) if elapsed else None,
+            "rows_per_second": round(rows_done / elapsed) if elapsed else None,
+            "cancel_requested": bool(progress and progress.cancelled.is_set()),
+            "error": job.error,
+            "result": json.loads(job.result_json) if job.result_json else None,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+
+    def get(self, job_id: str) -> dict | None:
+        with Session(engine) as session:
+            job = session.get(IngestJob, job_id)
+        return self._describe(job) if job else None
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        with Session(engine) as session:
+            jobs = session.exec(
+                select(IngestJob).order_by(IngestJob.created_at.desc()).limit(limit)
+            ).all()
+        return [self._describe(j) for j in jobs]
+
+    def cancel(self, job_id: str) -> dict | None:
+        """Cancel a queued or running job. Returns its state, None if unknown."""
+        with Session(engine) as session:
+            job = session.get(IngestJob, job_id)
+        if job is None:
+            return None
+        with self._lock:
+            progress = self._runs.get(job_id)
+        if job.status in ACTIVE and progress is not None:
+            progress.cancel()
+            if progress.started is None:
+                self._finish(job_id, "cancelled")
+        return self.get(job_id)
+
+    def resume(self):
+        """Queue again the jobs a previous process left queued or running."""
+        with Session(engine) as session:
+            jobs = session.exec(
+                select(IngestJob)
+                .where(IngestJob.status.in_(ACTIVE))
+                .order_by(IngestJob.created_at)
+            ).all()
+
+        for job in jobs:
+            with self._lock:
+                if job.id in self._runs:
+                    continue
+            if not Path(job.file_path).exists():
+                self._finish(job.id, "failed", error="Uploaded file is gone")
+                continue
+            self._update(job.id, status="queued", started_at=None)
+            self._enqueue(job.id, job.bytes_total)
+        if jobs:
+            logger.info(f"Resumed {len(jobs)} ingestion jobs")
+
+    def shutdown(self):
+        """Stop running jobs so the next start resumes them."""
+        self._closing = True
+        with self._lock:
+            runs = list(self._runs.values())
+        for progress in runs:
+            if progress.started is not None:
+                progress.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def get_jobs() -> IngestJobs:
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                _jobs = IngestJobs()
+    return _jobs
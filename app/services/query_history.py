@@ -0,0 +1,270 @@
+"""
+Query history: recording, few-shot retrieval and cache warming.
+
+- every /ask that generates SQL is recorded in QueryHistory with its
+  latency, row count and whether the SQL ran
+- successful (question, SQL) pairs for a dataset are indexed and the
+  most similar ones are passed to the LLM as few-shot examples
+  (embedding similarity in local RAG mode, word overlap otherwise)
+- after an upload, the most frequent questions asked of earlier uploads
+  of the same file (same filename and schema) are pre-generated and
+  executed in the background, warming the SQL and result caches
+
+History is shared between uploads of the same file: examples written
+against an older table are rewritten to the new table name.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session, select, func, or_
+
+from app.api.models import Dataset, QueryHistory
+from app.core.database import engine
+from app.services.sql_cache import normalize_question, schema_fingerprint
+
+logger = logging.getLogger(__name__)
+
+FEW_SHOT_EXAMPLES = int(os.environ.get("FEW_SHOT_EXAMPLES", "3"))
+FEW_SHOT_MIN_SIMILARITY = float(os.environ.get("FEW_SHOT_MIN_SIMILARITY", "0.3"))
+FEW_SHOT_HISTORY = int(os.environ.get("FEW_SHOT_HISTORY", "500"))  # pairs kept per dataset
+FEW_SHOT_SEMANTIC = os.environ.get(
+    "FEW_SHOT_SEMANTIC", os.environ.get("USE_LOCAL_RAG", "")
+).lower() == "true"
+WARM_TOP_QUESTIONS = int(os.environ.get("WARM_TOP_QUESTIONS", "5"))
+
+_warmer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warm")
+
+_TABLE_RE = re.compile(r"\bdataset_[0-9a-f]{8}\b")
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _dataset_key(dataset_id: str):
+    """(filename, schema fingerprint) identifying uploads of the same file."""
+    with Session(engine) as session:
+        ds = session.get(Dataset, dataset_id)
+    if ds is None:
+        return None, None
+    return ds.filename, schema_fingerprint(json.loads(ds.schema_info))
+
+
+def _related_filter(dataset_id: str):
+    filename, fingerprint = _dataset_key(dataset_id)
+    if filename is None:
+        return QueryHistory.dataset_id == dataset_id
+    return or_(
+        QueryHistory.dataset_id == dataset_id,
+        (QueryHistory.filename == filename) & (QueryHistory.schema_fingerprint == fingerprint),
+    )
+
+
+# ======================================
+# Recording
+# ======================================
+def record_ask(
+    dataset_id: str,
+    question: str,
+    sql_query: str,
+    answer: str,
+    latency_ms: float,
+    row_count: int | None,
+    success: bool,
+):
+    filename, fingerprint = _dataset_key(dataset_id)
+
+    with Session(engine) as session:
+        session.add(QueryHistory(
+            dataset_id=dataset_id,
+            question=question,
+            sql_query=sql_query,
+            answer=answer,
+            latency_ms=latency_ms,
+            row_count=row_count,
+            success=success,
+            filename=filename,
+            schema_fingerprint=fingerprint,
+        ))
+        session.commit()
+
+    if success:
+        get_few_shot_index().add(dataset_id, question, sql_query)
+
+
+# ======================================
+# Few-shot examples
+# ======================================
+class FewShotIndex:
+    """Per-dataset successful (question, SQL) pairs, loaded from SQLite on first use."""
+
+    def __init__(self, semantic: bool = FEW_SHOT_SEMANTIC, max_pairs: int = FEW_SHOT_HISTORY):
+        self.semantic = semantic
+        self.max_pairs = max_pairs
+        self._pairs = {}  # dataset_id -> {normalized question: (question, sql)}
+        self._indexes = {}  # dataset_id -> VectorIndex over normalized questions
+        self._lock = threading.RLock()
+
+    def _load(self, dataset_id: str) -> dict:
+        with self._lock:
+            pairs = self._pairs.get(dataset_id)
+            if pairs is not None:
+                return pairs
+
+        with Session(engine) as session:
+            rows = session.exec(
+                select(QueryHistory)
+                .where(_related_filter(dataset_id), QueryHistory.success == True)  # noqa: E712
+                .order_by(QueryHistory.created_at.desc())
+                .limit(self.max_pairs)
+            ).all()
+
+        pairs = {}
+        for row in rows:
+            key = normalize_question(row.question)
+            if key not in pairs:
+                # written against an earlier upload of the same file
+                sql = _TABLE_RE.sub(dataset_id, row.sql_query)
+                pairs[key] = (row.question, sql)
+
+        with self._lock:
+            self._pairs[dataset_id] = pairs
+            self._indexes.pop(dataset_id, None)
+        return pairs
+
+    def add(self, dataset_id: str, question: str, sql: str):
+        with self._lock:
+            pairs = self._pairs.get(dataset_id)
+            if pairs is None:
+                return  # loaded (including this one) on first lookup
+            pairs[normalize_question(question)] = (question, sql)
+            self._indexes.pop(dataset_id, None)
+
+    def invalidate(self, dataset_id: str):
+        with self._lock:
+            self._pairs.pop(dataset_id, None)
+            self._indexes.pop(dataset_id, None)
+
+    def _semantic(self, dataset_id: str, keys: list[str], question: str, k: int):
+        from rag.index import VectorIndex
+        from rag.models import embed
+
+        with self._lock:
+            index = self._indexes.get(dataset_id)
+        if index is None:
+            index = VectorIndex.build(embed(keys, prefix="query"), keys)
+            with self._lock:
+                self._indexes[dataset_id] = index
+        return index.search_with_scores(embed(question, prefix="query"), k)
+
+    def _lexical(self, keys: list[str], question: str, k: int):
+        q = _words(question)
+        scored = []
+        for key in keys:
+            w = _words(key)
+            if q and w:
+                scored.append((key, len(q & w) / len(q | w)))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored[:k]
+
+    def examples(self, dataset_id: str, question: str, k: int = FEW_SHOT_EXAMPLES) -> list[tuple[str, str]]:
+        """Most similar past (question, SQL) pairs, best first."""
+        pairs = self._load(dataset_id)
+        if not pairs or k <= 0:
+            return []
+
+        keys = list(pairs)
+        normalized = normalize_question(question)
+
+        scored = None
+        if self.semantic:
+            try:
+                scored = self._semantic(dataset_id, keys, normalized, k + 1)
+            except Exception as e:
+                logger.warning(f"Semantic few-shot lookup failed: {e}")
+        if scored is None:
+            scored = self._lexical(keys, normalized, k + 1)
+
+        return [
+            pairs[key] for key, score in scored
+            if score >= FEW_SHOT_MIN_SIMILARITY and key != normalized
+        ][:k]
+
+
+_few_shot = None
+_few_shot_lock = threading.Lock()
+
+
+def get_few_shot_index() -> FewShotIndex:
+    global _few_shot
+    if _few_shot is None:
+        with _few_shot_lock:
+            if _few_shot is None:
+                _few_shot = FewShotIndex()
+    return _few_shot
+
+
+# ======================================
+# Warming
+# ======================================
+def frequent_questions(dataset_id: str, limit: int = WARM_TOP_QUESTIONS) -> list[str]:
+    """Most often asked successful questions for this dataset or earlier uploads of it."""
+    with Session(engine) as session:
+        rows = session.exec(
+            select(QueryHistory.question, func.count().label("n"))
+            .where(_related_filter(dataset_id), QueryHistory.success == True)  # noqa: E712
+            .group_by(QueryHistory.question)
+            .order_by(func.count().desc())
+            .limit(limit * 3)
+        ).all()
+
+    seen, questions = set(), []
+    for question, _ in rows:
+        key = normalize_question(question)
+        if key not in seen:
+            seen.add(key)
+            questions.append(question)
+    return questions[:limit]
+
+
+def warm_dataset(dataset_id: str, load_context, run_query):
+    """
+    Pre-generate SQL for the dataset's frequent questions and execute it,
+    filling the SQL and result caches.
+
+    load_context(dataset_id, question) -> (schema, sample_rows, hints)
+    run_query(sql, dataset_id) executes through the result cache
+    """
+    from app.services.ai_service import generate_sql
+
+    questions = frequent_questions(dataset_id)
+    if not questions:
+        return
+
+    logger.info(f"Warming {len(questions)} frequent questions for {dataset_id}")
+    for question in questions:
+        try:
+            schema, sample_rows, hints = load_context(dataset_id, question)
+            # validated (and repaired if needed) before it is returned
+            sql = generate_sql(
+                question=question,
+                schema=schema,
+                table_name=dataset_id,
+                sample_data=sample_rows,
+                value_hints=hints,
+                examples=get_few_shot_index().examples(dataset_id, question),
+            )
+            run_query(sql, dataset_id)
+        except Exception as e:
+            logger.warning(f"Warming '{question}' for {dataset_id} failed: {e}")
+
+
+def schedule_warm(dataset_id: str, load_context, run_query):
+    """Run warm_dataset() on the background warm thread."""
+    if WARM_TOP_QUESTIONS > 0:
+        _warmer.submit(warm_dataset, dataset_id, load_context, run_query)
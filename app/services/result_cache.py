@@ -0,0 +1,147 @@
+"""
+Query result cache for generated SQL.
+
+Keyed by normalized SQL plus the version of every table it reads. A
+table's version is bumped whenever it is uploaded, replaced or deleted,
+so stale results are never served and never need to be hunted down.
+
+Results are kept as DataFrames (columnar numpy blocks) in an LRU
+bounded by a memory budget rather than as lists of row dicts.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MB = float(os.environ.get("RESULT_CACHE_MB", "256"))
+
+_TABLE_RE = re.compile(r"\bdataset_[0-9a-z_]+\b", re.IGNORECASE)
+_LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse whitespace outside string literals and drop the trailing ';'
+    so cosmetic differences in generated SQL share a cache entry.
+    """
+    parts = _LITERAL_RE.split(sql.strip().rstrip(";").strip())
+    return "".join(
+        p if i % 2 else re.sub(r"\s+", " ", p)
+        for i, p in enumerate(parts)
+    )
+
+
+def referenced_tables(sql: str) -> set[str]:
+    """dataset_* tables mentioned anywhere in the query."""
+    return {t.lower() for t in _TABLE_RE.findall(sql)}
+
+
+class ResultCache:
+
+    def __init__(self, max_bytes: int = int(RESULT_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        # a single result may not take more than 1/8 of the budget
+        self.max_entry_bytes = max_bytes // 8
+
+        self._entries = OrderedDict()  # key -> (df, nbytes)
+        self._versions = {}  # table -> int
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "rejected_too_large": 0,
+        }
+
+    # -------------------------------------------------------
+    # table versions
+    # -------------------------------------------------------
+
+    def table_version(self, table: str) -> int:
+        with self._lock:
+            return self._versions.get(table.lower(), 0)
+
+    def bump_table_version(self, table: str):
+        """Invalidate every cached result that reads this table."""
+        table = table.lower()
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [k for k in self._entries if any(t == table for t, _ in k[1])]
+            for k in stale:
+                _, nbytes = self._entries.pop(k)
+                self._bytes -= nbytes
+
+    def key(self, sql: str, tables: set[str] = frozenset()):
+        """
+        Cache key for a query. Take it *before* executing so a table
+        bumped mid-query cannot file a stale result under the new version.
+        """
+        tables = referenced_tables(sql) | {t.lower() for t in tables}
+        with self._lock:
+            versions = tuple(sorted((t, self._versions.get(t, 0)) for t in tables))
+        return normalize_sql(sql), versions
+
+    # -------------------------------------------------------
+    # get / put
+    # -------------------------------------------------------
+
+    def get(self, key) -> pd.DataFrame | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[0]
+
+    def put(self, key, df: pd.DataFrame):
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            if nbytes > self.max_entry_bytes:
+                self._stats["rejected_too_large"] += 1
+                return
+
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (df, nbytes)
+            self._bytes += nbytes
+
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
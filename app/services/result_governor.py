@@ -0,0 +1,149 @@
+"""
+Result-size governor for /ask.
+
+- caps what is sent to the browser at MAX_RESULT_ROWS / MAX_RESULT_BYTES
+  by wrapping the generated SQL with LIMIT (plus one row to detect
+  truncation) and reports the true row count when it truncates;
+  streamed formats stop at MAX_RESULT_ROWS and report truncation
+- for charts, downsamples inside DuckDB instead of shipping every row:
+    x + numeric y  -> min/max per bucket along x (keeps peaks and dips)
+    label + value  -> top-N labels by value
+    single numeric -> histogram bins
+"""
+
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULT_ROWS = int(os.environ.get("MAX_RESULT_ROWS", "10000"))
+MAX_RESULT_BYTES = int(float(os.environ.get("MAX_RESULT_MB", "16")) * 1024 * 1024)
+CHART_MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", "500"))
+
+_NUMERIC_RE = re.compile(
+    r"^(TINYINT|SMALLINT|INTEGER|BIGINT|HUGEINT|UTINYINT|USMALLINT|UINTEGER|UBIGINT|UHUGEINT"
+    r"|FLOAT|DOUBLE|REAL|DECIMAL.*)$"
+)
+_TEMPORAL_RE = re.compile(r"^(DATE|TIME.*|TIMESTAMP.*)$")
+
+
+def _inner(sql: str) -> str:
+    return sql.strip().rstrip(";")
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def is_numeric(type_name: str) -> bool:
+    return bool(_NUMERIC_RE.match(type_name.upper()))
+
+
+def is_temporal(type_name: str) -> bool:
+    return bool(_TEMPORAL_RE.match(type_name.upper()))
+
+
+# ======================================
+# Row / byte budget
+# ======================================
+def limited_sql(sql: str, max_rows: int = MAX_RESULT_ROWS) -> str:
+    """Fetch one row past the budget so truncation can be detected."""
+    return f"SELECT * FROM ({_inner(sql)}) AS q LIMIT {max_rows + 1}"
+
+
+def count_sql(sql: str) -> str:
+    return f"SELECT COUNT(*) AS n FROM ({_inner(sql)}) AS q"
+
+
+def apply_budget(df, max_rows: int = MAX_RESULT_ROWS, max_bytes: int = MAX_RESULT_BYTES):
+    """
+    Trim a limited result to the row and byte budgets.
+    Returns (df, truncated).
+    """
+    truncated = len(df) > max_rows
+    if truncated:
+        df = df.iloc[:max_rows]
+
+    nbytes = int(df.memory_usage(index=False, deep=True).sum())
+    if nbytes > max_bytes and len(df):
+        keep = max(1, int(len(df) * max_bytes / nbytes))
+        df = df.iloc[:keep]
+        truncated = True
+
+    return df, truncated
+
+
+# ======================================
+# Chart downsampling
+# ======================================
+def downsample_sql(sql: str, columns: list[tuple[str, str]], points: int = CHART_MAX_POINTS):
+    """
+    Pick a DuckDB downsampling query for a chart of this result shape.
+
+    columns: [(name, type)] as returned by DESCRIBE on the query.
+    Returns (sql, method) or (None, None) when no strategy applies.
+    """
+    inner = _inner(sql)
+    if not columns:
+        return None, None
+
+    numeric = [c for c, t in columns if is_numeric(t)]
+
+    # single numeric column -> histogram
+    if len(columns) == 1 and numeric:
+        v = _q(numeric[0])
+        n = points
+        return f"""
+            WITH src AS (
+                SELECT CAST({v} AS DOUBLE) AS v FROM ({inner}) AS q WHERE {v} IS NOT NULL
+            ),
+            bounds AS (SELECT min(v) AS lo, max(v) AS hi FROM src),
+            binned AS (
+                SELECT
+                    CASE WHEN hi = lo THEN 0
+                         ELSE least(CAST(floor((v - lo) / (hi - lo) * {n}) AS BIGINT), {n} - 1)
+                    END AS bin,
+                    lo, hi
+                FROM src, bounds
+            )
+            SELECT
+                printf('%.4g - %.4g', lo + (hi - lo) * bin / {n}, lo + (hi - lo) * (bin + 1) / {n}) AS bin_range,
+                count(*) AS count
+            FROM binned
+            GROUP BY bin, lo, hi
+            ORDER BY bin
+        """, "histogram"
+
+    x_name, x_type = columns[0]
+    y = [c for c in numeric if c != x_name]
+    if not y:
+        return None, None
+
+    # ordered x (time / number) + numeric y -> min/max per bucket
+    if is_temporal(x_type) or is_numeric(x_type):
+        x, yv = _q(x_name), _q(y[0])
+        buckets = max(1, points // 2)
+        return f"""
+            WITH b AS (
+                SELECT *, ntile({buckets}) OVER (ORDER BY {x}) AS __bucket
+                FROM ({inner}) AS q
+            ),
+            r AS (
+                SELECT *,
+                    row_number() OVER (PARTITION BY __bucket ORDER BY {yv}) AS __lo,
+                    row_number() OVER (PARTITION BY __bucket ORDER BY {yv} DESC) AS __hi
+                FROM b
+            )
+            SELECT * EXCLUDE (__bucket, __lo, __hi)
+            FROM r
+            WHERE __lo = 1 OR __hi = 1
+            ORDER BY {x}
+        """, "minmax"
+
+    # categorical label + value -> largest N
+    return f"""
+        SELECT * FROM ({inner}) AS q
+        ORDER BY {_q(y[0])} DESC NULLS LAST
+        LIMIT {points}
+    """, "top_n"
@@ -0,0 +1,254 @@
+"""
+Columnar / streamed query responses and cursor-style pagination.
+
+- NDJSON: one metadata line, then one JSON object per row, encoded a
+  DuckDB chunk at a time (no full list-of-dicts in memory)
+- Arrow IPC stream: DuckDB record batches written straight to the wire
+  (needs pyarrow, which is optional)
+- page tokens: signed (dataset, SQL, offset, limit) so the next page
+  skips SQL generation and cannot be forged into arbitrary SQL
+
+A streamed result holds its pooled cursor while the client reads, so
+at most STREAM_MAX_CURSORS streams are open at once and the rest of
+the pool stays free for JSON answers.
+"""
+
+import base64
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import threading
+
+from app.core.concurrency import run_db
+from app.core.database import POOL_SIZE, POOL_TIMEOUT, get_pool
+from app.core.query_guard import check_cost, current_guard
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# without a configured secret, tokens are only valid for this process
+_TOKEN_SECRET = os.environ.get("PAGE_TOKEN_SECRET", "").encode() or os.urandom(32)
+
+ROWS_PER_BATCH = 2048
+
+STREAM_MAX_CURSORS = int(os.environ.get("STREAM_MAX_CURSORS", str(max(1, POOL_SIZE // 2))))
+_stream_slots = threading.BoundedSemaphore(STREAM_MAX_CURSORS)
+
+
+class StreamsBusy(RuntimeError):
+    pass
+
+
+# ======================================
+# Format negotiation
+# ======================================
+def negotiate_format(requested: str | None, accept: str | None) -> str:
+    """Explicit `format` wins; otherwise look at the Accept header."""
+    if requested:
+        requested = requested.lower()
+        if requested not in ("json", "ndjson", "arrow"):
+            raise ValueError(f"Unknown format: {requested}")
+        return requested
+
+    accept = (accept or "").lower()
+    if ARROW_MEDIA_TYPE in accept:
+        return "arrow"
+    if NDJSON_MEDIA_TYPE in accept:
+        return "ndjson"
+    return "json"
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ======================================
+# Page tokens
+# ======================================
+def encode_page_token(dataset_id: str, sql: str, offset: int, limit: int) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({
+        "d": dataset_id, "s": sql, "o": offset, "l": limit,
+    }).encode()).decode()
+    sig = hmac.new(_TOKEN_SECRET, payload.encode(), hashlib.sha256).hexdigest()[:32]
+    return f"{payload}.{sig}"
+
+
+def decode_page_token(token: str) -> dict:
+    """Returns {"dataset_id", "sql", "offset", "limit"}; ValueError if invalid."""
+    try:
+        payload, sig = token.rsplit(".", 1)
+    except ValueError:
+        raise ValueError("Malformed page token")
+
+    expected = hmac.new(_TOKEN_SECRET, payload.encode(), hashlib.sha256).hexdigest()[:32]
+    if not hmac.compare_digest(sig, expected):
+        raise ValueError("Invalid or expired page token")
+
+    data = json.loads(base64.urlsafe_b64decode(payload.encode()))
+    return {"dataset_id": data["d"], "sql": data["s"], "offset": data["o"], "limit": data["l"]}
+
+
+def paged_sql(sql: str, offset: int = 0, limit: int | None = None) -> str:
+    """Wrap a query with LIMIT/OFFSET without touching its own clauses."""
+    if not offset and limit is None:
+        return sql
+    inner = sql.strip().rstrip(";")
+    paged = f"SELECT * FROM ({inner}) AS q"
+    if limit is not None:
+        paged += f" LIMIT {int(limit)}"
+    if offset:
+        paged += f" OFFSET {int(offset)}"
+    return paged
+
+
+# ======================================
+# Streaming
+# ======================================
+class ResultStream:
+    """
+    An executed query on a borrowed pooled cursor. The cursor goes back
+    to the pool once the stream is exhausted or closed.
+
+    Executing happens in __init__ (call it from a worker thread) so
+    errors surface before the HTTP response starts. DuckDB computes
+    rows as they are fetched, so the cursor stays with the request's
+    guard until close(): the timeout counts from opening the stream,
+    and a cancel interrupts it mid-stream.
+    """
+
+    def __init__(self, sql: str, overflow_sql: str | None = None):
+        """
+        overflow_sql: optional query that returns a row if there are rows
+        past the ones sql selects; sets `truncated` before any row is sent.
+        """
+        # next_chunk() and close() may be called from different threads
+        self._lock = threading.Lock()
+        self._pool = get_pool()
+        self._guard = current_guard()
+        self._cur = None
+        self._timed_out = None
+        if not _stream_slots.acquire(timeout=POOL_TIMEOUT):
+            raise StreamsBusy(f"All {STREAM_MAX_CURSORS} streamed result slots are busy")
+        self._slot = True
+        try:
+            self._cur = self._pool.acquire()
+            check_cost(self._cur, sql)
+            self._timed_out = self._guard.track(self._cur)
+            self.truncated = (
+                overflow_sql is not None
+                and self._cur.execute(overflow_sql).fetchone() is not None
+            )
+            self._result = self._cur.execute(sql)
+        except Exception as e:
+            self.close()
+            raise self._aborted(e)
+        self.columns = [d[0] for d in self._result.description]
+
+    def _aborted(self, error: Exception) -> Exception:
+        if self._timed_out is None:
+            return error
+        return self._guard.aborted(error, self._timed_out)
+
+    def close(self):
+        with self._lock:
+            if self._cur is not None:
+                self._guard.untrack(self._cur)
+                self._pool.release(self._cur)
+                self._cur = None
+            if self._slot:
+                _stream_slots.release()
+                self._slot = False
+
+    def next_chunk(self):
+        """Next DuckDB chunk as a DataFrame, or None (and the cursor is released) at the end."""
+        with self._lock:
+            if self._cur is None:
+                return None
+            try:
+                df = self._result.fetch_df_chunk(1)
+            except Exception as e:
+                error = self._aborted(e)
+            else:
+                error = None
+        if error is not None:
+            self.close()
+            raise error
+        if df.empty:
+            self.close()
+            return None
+        return df
+
+    def _next_batch(self, reader):
+        """Next Arrow record batch, or None once exhausted or closed."""
+        with self._lock:
+            if self._cur is None:
+                return None
+            try:
+                return reader.read_next_batch()
+            except StopIteration:
+                return None
+            except Exception as e:
+                error = self._aborted(e)
+        self.close()
+        raise error
+
+    async def body(self, chunks):
+        """
+        Send a sync body (ndjson() or arrow()) from the db pool. When
+        the response ends early (the client went away), the fetch in
+        flight is interrupted and the cursor released right away.
+        """
+        done = False
+        try:
+            while (chunk := await run_db(next, chunks, None)) is not None:
+                yield chunk
+            done = True
+        finally:
+            if not done:
+                self._guard.cancel("disconnect")
+            self.close()
+
+    def ndjson(self, header: dict):
+        """Yield a metadata line, then rows as JSON lines."""
+        try:
+            yield (json.dumps({**header, "columns": self.columns}, default=str) + "\n").encode()
+
+            while (df := self.next_chunk()) is not None:
+                text = df.to_json(orient="records", lines=True, date_format="iso")
+                if not text.endswith("\n"):
+                    text += "\n"
+                yield text.encode()
+        finally:
+            self.close()
+
+    def arrow(self):
+        """Yield an Arrow IPC stream, one record batch at a time."""
+        import pyarrow as pa
+
+        try:
+            reader = self._result.fetch_record_batch(ROWS_PER_BATCH)
+            sink = io.BytesIO()
+            writer = pa.ipc.new_stream(sink, reader.schema)
+
+            def drain() -> bytes:
+                data = sink.getvalue()
+                sink.seek(0)
+                sink.truncate()
+                return data
+
+            while (batch := self._next_batch(reader)) is not None:
+                writer.write_batch(batch)
+                yield drain()
+            writer.close()
+            yield drain()
+        finally:
+            self.close()
@@ -0,0 +1,632 @@
+"""
+Pre-aggregated rollup tables for hot GROUP BY patterns.
+
+The advisor reads the successful SQL in the query history of a dataset
+and reduces each aggregate query to its shape:
+
+    dims      columns grouped or filtered on, or date_trunc(grain, col)
+    measures  (column, stat) pairs, stat one of sum / count / min / max
+
+Shapes seen at least ROLLUP_MIN_QUERIES times on a table of at least
+ROLLUP_MIN_ROWS rows are materialized as
+
+    CREATE TABLE <table>__rollup_<hash> AS
+    SELECT dims..., COUNT(*) AS __count, SUM(m) AS m__sum, ... FROM <table> GROUP BY ALL
+
+(kept only if it has at most ROLLUP_MAX_RATIO of the table's rows).
+
+At execution, a query whose shape a rollup covers is rewritten on its
+DuckDB syntax tree (json_serialize_sql / json_deserialize_sql) to read
+the rollup and re-aggregate: SUM(m) -> SUM(m__sum), COUNT(*) ->
+SUM(__count), AVG(m) -> SUM(m__sum) / SUM(m__count), date_trunc('year',
+d) -> date_trunc('year', d__month). WHERE, GROUP BY, HAVING, ORDER BY
+and LIMIT are kept, so the answer is the same as from the base table.
+
+When the base table changes (invalidate_table) its rollups stop being
+used at once and are rebuilt in the background, or dropped if the table
+is gone.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+from sqlmodel import Session, delete, select
+
+from app.api.models import QueryHistory, Rollup
+from app.core.database import engine, get_connection
+from app.core.metrics import ROLLUP_QUERIES
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS = os.environ.get("ROLLUPS", "true").lower() == "true"
+ROLLUP_MIN_QUERIES = int(os.environ.get("ROLLUP_MIN_QUERIES", "3"))
+ROLLUP_MIN_ROWS = int(float(os.environ.get("ROLLUP_MIN_ROWS", "1e6")))
+ROLLUP_MAX_RATIO = float(os.environ.get("ROLLUP_MAX_RATIO", "0.1"))
+ROLLUPS_PER_TABLE = int(os.environ.get("ROLLUPS_PER_TABLE", "5"))
+ROLLUP_HISTORY = int(os.environ.get("ROLLUP_HISTORY", "500"))
+
+# date_trunc parts, finest first
+_GRAINS = ("second", "minute", "hour", "day", "week", "month", "quarter", "year")
+# aggregate -> stats it needs from the rollup
+_STATS = {
+    "sum": ("sum",),
+    "count": ("count",),
+    "count_star": ("count",),
+    "min": ("min",),
+    "max": ("max",),
+    "avg": ("sum", "count"),
+    "mean": ("sum", "count"),
+}
+# how each aggregate reads the rollup ({c} = column name prefix)
+_REAGGREGATE = {
+    "sum": 'sum("{c}__sum")',
+    "count": 'COALESCE(CAST(sum("{c}__count") AS BIGINT), 0)',
+    "count_star": 'COALESCE(CAST(sum("__count") AS BIGINT), 0)',
+    "min": 'min("{c}__min")',
+    "max": 'max("{c}__max")',
+    "avg": 'CAST(sum("{c}__sum") AS DOUBLE) / sum("{c}__count")',
+    "mean": 'CAST(sum("{c}__sum") AS DOUBLE) / sum("{c}__count")',
+}
+_MODIFIERS = {"ORDER_MODIFIER", "LIMIT_MODIFIER", "DISTINCT_MODIFIER"}
+_UNSUPPORTED = {"WINDOW", "SUBQUERY", "STAR", "LAMBDA", "PARAMETER", "POSITIONAL_REFERENCE"}
+
+
+class _NoRollup(Exception):
+    """The query can not be answered from a rollup."""
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _grain_serves(stored: str, asked: str) -> bool:
+    """Whether date_trunc(asked, date_trunc(stored, x)) == date_trunc(asked, x)."""
+    if stored == asked:
+        return True
+    if stored in ("second", "minute", "hour", "day"):
+        return _GRAINS.index(stored) < _GRAINS.index(asked)
+    return (stored, asked) in {("month", "quarter"), ("month", "year"), ("quarter", "year")}
+
+
+# ======================================
+# Query shapes
+# ======================================
+class _Shape:
+    """Walks a SELECT's syntax tree collecting dims and measures."""
+
+    def __init__(self, node: dict, table_name: str, columns: set[str], aggregates: set[str]):
+        self.node = node
+        self.table = table_name
+        self.columns = columns
+        self.aggregates = aggregates
+        self.aliases = {e.get("alias") for e in node.get("select_list", []) if e.get("alias")}
+        self.dims = set()  # (column, grain or None)
+        self.measures = set()  # (column or "*", stat)
+        self.agg_nodes = []  # aggregate FUNCTION nodes
+        self.trunc_nodes = []  # date_trunc FUNCTION nodes over a column
+
+    def _column(self, ref: dict) -> str | None:
+        """Base column a COLUMN_REF names, None for a select alias."""
+        names = ref["column_names"]
+        if len(names) == 2 and names[0].lower() == self.table:
+            names = names[1:]
+        if len(names) != 1:
+            raise _NoRollup("qualified column")
+        if names[0] in self.columns:
+            return names[0]
+        if names[0] in self.aliases:
+            return None
+        raise _NoRollup(f"unknown column {names[0]}")
+
+    def visit(self, expr):
+        if isinstance(expr, list):
+            for e in expr:
+                self.visit(e)
+            return
+        if not isinstance(expr, dict):
+            return
+
+        cls = expr.get("class")
+        if cls in _UNSUPPORTED:
+            raise _NoRollup(cls.lower())
+
+        if cls == "COLUMN_REF":
+            col = self._column(expr)
+            if col is not None:
+                self.dims.add((col, None))
+            return
+
+        if cls == "FUNCTION":
+            name = expr["function_name"].lower()
+            children = expr.get("children", [])
+            if name in self.aggregates:
+                self._aggregate(expr, name, children)
+                return
+            if (
+                name == "date_trunc" and len(children) == 2
+                and children[0].get("class") == "CONSTANT"
+                and str(children[0]["value"].get("value", "")).lower() in _GRAINS
+                and children[1].get("class") == "COLUMN_REF"
+            ):
+                col = self._column(children[1])
+                if col is not None:
+                    self.dims.add((col, str(children[0]["value"]["value"]).lower()))
+                    self.trunc_nodes.append(expr)
+                    return
+
+        for key, value in expr.items():
+            if key not in ("value", "cast_type", "type"):
+                self.visit(value)
+
+    def _aggregate(self, expr: dict, name: str, children: list):
+        if name not in _STATS or expr.get("distinct") or expr.get("filter") or expr["order_bys"]["orders"]:
+            raise _NoRollup(f"aggregate {name}")
+        if name == "count_star" or (name == "count" and not children):
+            self.measures.add(("*", "count"))
+        else:
+            if len(children) != 1 or children[0].get("class") != "COLUMN_REF":
+                raise _NoRollup(f"{name} over an expression")
+            col = self._column(children[0])
+            if col is None:
+                raise _NoRollup("aggregate over an alias")
+            for stat in _STATS[name]:
+                self.measures.add((col, stat))
+        self.agg_nodes.append(expr)
+
+    def analyze(self):
+        node = self.node
+        source = node.get("from_table") or {}
+        if (
+            node.get("type") != "SELECT_NODE"
+            or source.get("type") != "BASE_TABLE"
+            or source.get("table_name", "").lower() != self.table
+            or source.get("schema_name") not in ("", "main")
+            or source.get("sample") or node.get("sample") or node.get("qualify")
+            or node.get("cte_map", {}).get("map")
+            or node.get("aggregate_handling") not in ("STANDARD_HANDLING", "FORCE_AGGREGATES")
+        ):
+            raise _NoRollup("not a single-table SELECT")
+
+        for modifier in node.get("modifiers", []):
+            if modifier["type"] not in _MODIFIERS:
+                raise _NoRollup(modifier["type"].lower())
+            self.visit(modifier)
+        for key in ("select_list", "where_clause", "group_expressions", "having"):
+            self.visit(node.get(key))
+
+        grouped = node.get("group_expressions") or node.get("aggregate_handling") == "FORCE_AGGREGATES"
+        if not self.agg_nodes and not grouped:
+            raise _NoRollup("not an aggregate query")
+        return self
+
+
+# ======================================
+# Rollup specs
+# ======================================
+def _spec_columns(spec: dict) -> set[str]:
+    cols = {c if g is None else f"{c}__{g}" for c, g in spec["dims"]}
+    cols |= {"__count" if c == "*" else f"{c}__{s}" for c, s in spec["measures"]}
+    return cols
+
+
+def _covers(spec: dict, shape: _Shape) -> dict | None:
+    """Stored grain per asked date_trunc dim if the rollup answers the shape, else None."""
+    dims = {tuple(d) for d in spec["dims"]}
+    stored = _spec_columns(spec)
+    grains = {}
+    for col, grain in shape.dims:
+        if (col, None) in dims:
+            continue  # the raw column is stored
+        finer = [g for c, g in dims if c == col and g is not None and _grain_serves(g, grain or "")]
+        if grain is None or not finer:
+            return None
+        # coarsest stored grain that still serves
+        grains[(col, grain)] = max(finer, key=_GRAINS.index)
+    for col, stat in shape.measures:
+        if ("__count" if col == "*" else f"{col}__{stat}") not in stored:
+            return None
+    return grains
+
+
+def build_sql(table_name: str, spec: dict) -> str:
+    """SELECT materializing a rollup spec."""
+    select_list = []
+    for col, grain in spec["dims"]:
+        if grain is None:
+            select_list.append(_q(col))
+        else:
+            select_list.append(f"date_trunc('{grain}', {_q(col)}) AS {_q(f'{col}__{grain}')}")
+    select_list.append("COUNT(*) AS __count")
+    for col, stat in spec["measures"]:
+        if col != "*":
+            select_list.append(f"{stat}({_q(col)}) AS {_q(f'{col}__{stat}')}")
+    return f"SELECT {', '.join(select_list)} FROM {table_name} GROUP BY ALL"
+
+
+def rollup_name(table_name: str, spec: dict) -> str:
+    digest = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:8]
+    return f"{table_name}__rollup_{digest}"
+
+
+# ======================================
+# Manager
+# ======================================
+class RollupManager:
+
+    def __init__(self, persist: bool = True):
+        self.persist = persist
+        self._rollups = {}  # dataset_id -> {name: {"spec", "rows", "base_rows", "columns", "hits"}}
+        self._stale = set()  # datasets whose rollups are being rebuilt
+        self._rejected = {}  # dataset_id -> specs too large to be worth keeping
+        self._rewrites = OrderedDict()  # (dataset_id, sql) -> rewritten sql or None
+        self._lock = threading.RLock()
+        self._stats = {"rewrites": 0, "misses": 0, "builds": 0, "refreshes": 0, "drops": 0, "rejected": 0}
+
+        # parsing only; never touches data
+        self._parser = duckdb.connect()
+        self._parser_lock = threading.Lock()
+        self._aggregates = {
+            r[0] for r in self._parser.execute(
+                "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'"
+            ).fetchall()
+        } | {"count_star"}
+
+    # -------------------------------------------------------
+    # parsing
+    # -------------------------------------------------------
+
+    def _parse(self, sql: str) -> dict | None:
+        with self._parser_lock:
+            tree = json.loads(self._parser.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        if tree.get("error") or len(tree["statements"]) != 1:
+            return None
+        return tree
+
+    def _deparse(self, tree: dict) -> str:
+        with self._parser_lock:
+            return self._parser.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0]
+
+    def _expression(self, sql: str) -> dict:
+        return self._parse(f"SELECT {sql}")["statements"][0]["node"]["select_list"][0]
+
+    def _default_name(self, expr: dict) -> str:
+        """The column name DuckDB gives an unaliased expression, e.g. avg(rev)."""
+        tree = self._parse("SELECT 1")
+        tree["statements"][0]["node"]["select_list"] = [dict(expr, alias="")]
+        return self._deparse(tree)[len("SELECT "):]
+
+    def shape(self, sql: str, table_name: str, columns: set[str]) -> _Shape | None:
+        """Dims and measures of an aggregate query over table_name, or None."""
+        tree = self._parse(sql.strip().rstrip(";"))
+        if tree is None:
+            return None
+        try:
+            return _Shape(tree["statements"][0]["node"], table_name, columns, self._aggregates).analyze()
+        except _NoRollup as e:
+            logger.debug(f"No rollup shape for query: {e}")
+            return None
+
+    # -------------------------------------------------------
+    # rewriting
+    # -------------------------------------------------------
+
+    def rewrite(self, sql: str, dataset_id: str) -> str | None:
+        """The query reading a covering rollup instead of the table, or None."""
+        with self._lock:
+            rollups = self._rollups.get(dataset_id)
+            if not ROLLUPS or not rollups or dataset_id in self._stale:
+                return None
+            key = (dataset_id, sql)
+            if key in self._rewrites:
+                self._rewrites.move_to_end(key)
+                rewritten = self._rewrites[key]
+                self._count(rewritten)
+                return rewritten
+            candidates = sorted(rollups.items(), key=lambda kv: kv[1]["rows"])
+            columns = set(candidates[0][1]["columns"])
+
+        rewritten = None
+        try:
+            rewritten = self._rewrite(sql, dataset_id, columns, candidates)
+        except Exception as e:
+            logger.warning(f"Rollup rewrite failed: {e}")
+
+        with self._lock:
+            self._rewrites[key] = rewritten
+            while len(self._rewrites) > 1000:
+                self._rewrites.popitem(last=False)
+            self._count(rewritten)
+        return rewritten
+
+    def _count(self, rewritten: str | None):
+        self._stats["rewrites" if rewritten else "misses"] += 1
+        ROLLUP_QUERIES.inc(outcome="rewritten" if rewritten else "base")
+
+    def _rewrite(self, sql: str, dataset_id: str, columns: set[str], candidates: list) -> str | None:
+        shape = self.shape(sql, dataset_id, columns)
+        if shape is None:
+            return None
+
+        for name, entry in candidates:  # smallest first
+            grains = _covers(entry["spec"], shape)
+            if grains is None:
+                continue
+
+            # keep the base query's column names: AVG(rev) stays "avg(rev)",
+            # not the re-aggregation that replaces it
+            for item in shape.node["select_list"]:
+                if not item.get("alias") and item.get("class") != "COLUMN_REF":
+                    item["alias"] = self._default_name(item)
+
+            # the nodes collected by shape() belong to its tree; edit them in place
+            for node in shape.agg_nodes:
+                fn = node["function_name"].lower()
+                if fn == "count" and not node.get("children"):
+                    fn = "count_star"
+                col = node["children"][0]["column_names"][-1] if node.get("children") else ""
+                replacement = self._expression(_REAGGREGATE[fn].format(c=col.replace('"', '""')))
+                replacement["alias"] = node.get("alias", "")
+                node.clear()
+                node.update(replacement)
+            for node in shape.trunc_nodes:
+                ref = node["children"][1]
+                col = ref["column_names"][-1]
+                grain = str(node["children"][0]["value"]["value"]).lower()
+                if (col, grain) in grains:
+                    ref["column_names"] = [f"{col}__{grains[(col, grain)]}"]
+            table = shape.node["from_table"]
+            # qualified references (dataset_x.region) still resolve
+            table["alias"] = table.get("alias") or table["table_name"]
+            table["table_name"] = name
+
+            with self._lock:
+                entry["hits"] += 1
+            tree = {"error": False, "statements": [{"node": shape.node, "named_param_map": []}]}
+            return self._deparse(tree)
+        return None
+
+    # -------------------------------------------------------
+    # advisor
+    # -------------------------------------------------------
+
+    def _history(self, dataset_id: str) -> list[str]:
+        with Session(engine) as session:
+            return list(session.exec(
+                select(QueryHistory.sql_query)
+                .where(QueryHistory.dataset_id == dataset_id, QueryHistory.success == True)  # noqa: E712
+                .order_by(QueryHistory.id.desc())
+                .limit(ROLLUP_HISTORY)
+            ).all())
+
+    def advise(self, dataset_id: str, sqls: list[str] | None = None) -> list[str]:
+        """
+        Materialize rollups for the hot shapes among sqls (default: the
+        dataset's recent query history). Returns the rollups built.
+        """
+        if not ROLLUPS:
+            return []
+        if sqls is None:
+            sqls = self._history(dataset_id)
+
+        with get_connection() as conn:
+            base_rows = conn.execute(f"SELECT COUNT(*) FROM {dataset_id}").fetchone()[0]
+            if base_rows < ROLLUP_MIN_ROWS:
+                return []
+            columns = {r[0] for r in conn.execute(f"DESCRIBE {dataset_id}").fetchall()}
+
+        # count shapes, merging the measures of shapes with the same dims
+        counts, measures = {}, {}
+        for sql in sqls:
+            shape = self.shape(sql, dataset_id, columns)
+            if shape is None:
+                continue
+            dims = frozenset(shape.dims)
+            counts[dims] = counts.get(dims, 0) + 1
+            measures.setdefault(dims, set()).update(shape.measures)
+
+        built = []
+        for dims, n in sorted(counts.items(), key=lambda kv: -kv[1]):
+            if n < ROLLUP_MIN_QUERIES:
+                break
+            spec = {
+                "dims": sorted([c, g] for c, g in dims),
+                "measures": sorted([c, s] for c, s in measures[dims] | {("*", "count")}),
+            }
+            with self._lock:
+                existing = dict(self._rollups.get(dataset_id, {}))
+                probe = _Shape({}, dataset_id, columns, self._aggregates)
+                probe.dims, probe.measures = set(dims), measures[dims]
+                if any(_covers(e["spec"], probe) is not None for e in existing.values()):
+                    continue
+                # same dims, new measures: widen that rollup instead of adding one
+                replaces = [
+                    name for name, e in existing.items()
+                    if {tuple(d) for d in e["spec"]["dims"]} == set(dims)
+                ]
+                for name in replaces:
+                    spec["measures"] = sorted(
+                        {tuple(m) for m in spec["measures"]} | {tuple(m) for m in existing[name]["spec"]["measures"]}
+                    )
+                    spec["measures"] = [list(m) for m in spec["measures"]]
+                if spec in self._rejected.get(dataset_id, []):
+                    continue
+                if len(existing) - len(replaces) >= ROLLUPS_PER_TABLE:
+                    continue
+            name = self._build(dataset_id, spec, base_rows, sorted(columns))
+            if name:
+                built.append(name)
+                for old in replaces:
+                    if old != name:
+                        self.drop(dataset_id, old)
+        return built
+
+    def _build(self, dataset_id: str, spec: dict, base_rows: int, columns: list[str]) -> str | None:
+        name = rollup_name(dataset_id, spec)
+        with get_connection() as conn:
+            conn.execute(f"CREATE OR REPLACE TABLE {name} AS {build_sql(dataset_id, spec)}")
+            rows = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            if rows > base_rows * ROLLUP_MAX_RATIO:
+                conn.execute(f"DROP TABLE IF EXISTS {name}")
+                with self._lock:
+                    self._rejected.setdefault(dataset_id, []).append(spec)
+                    self._stats["rejected"] += 1
+                logger.info(f"Rollup {name} not kept: {rows} rows for {base_rows} base rows")
+                return None
+
+        entry = {"spec": spec, "rows": rows, "base_rows": base_rows, "columns": columns, "hits": 0}
+        with self._lock:
+            self._rollups.setdefault(dataset_id, {})[name] = entry
+            self._rewrites.clear()
+            self._stats["builds"] += 1
+        self._save(dataset_id, name, entry)
+        logger.info(f"Built rollup {name}: {rows} rows from {base_rows} ({spec})")
+        return name
+
+    # -------------------------------------------------------
+    # invalidation / persistence
+    # -------------------------------------------------------
+
+    def invalidate(self, dataset_id: str):
+        """The base table changed: stop using its rollups and rebuild them in the background."""
+        with self._lock:
+            self._rejected.pop(dataset_id, None)
+            if not self._rollups.get(dataset_id):
+                return
+            self._stale.add(dataset_id)
+            self._rewrites.clear()
+        _advisor.submit(self.refresh, dataset_id)
+
+    def refresh(self, dataset_id: str):
+        """Rebuild a dataset's rollups from its table, or drop them if it is gone."""
+        with self._lock:
+            rollups = dict(self._rollups.get(dataset_id, {}))
+        try:
+            exists = False
+            with get_connection() as conn:
+                exists = conn.execute(
+                    "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [dataset_id]
+                ).fetchone()[0]
+                if exists:
+                    base_rows = conn.execute(f"SELECT COUNT(*) FROM {dataset_id}").fetchone()[0]
+                    columns = {r[0] for r in conn.execute(f"DESCRIBE {dataset_id}").fetchall()}
+            for name, entry in rollups.items():
+                spec_cols = {c for c, _ in entry["spec"]["dims"]} | {
+                    c for c, _ in entry["spec"]["measures"] if c != "*"
+                }
+                if exists and spec_cols <= columns and self._build(
+                    dataset_id, entry["spec"], base_rows, sorted(columns)
+                ):
+                    with self._lock:
+                        self._stats["refreshes"] += 1
+                else:
+                    self.drop(dataset_id, name)
+        except Exception as e:
+            logger.warning(f"Refreshing rollups for {dataset_id} failed, dropping them: {e}")
+            for name in rollups:
+                self.drop(dataset_id, name)
+        finally:
+            with self._lock:
+                self._stale.discard(dataset_id)
+
+    def drop(self, dataset_id: str, name: str):
+        try:
+            with get_connection() as conn:
+                conn.execute(f"DROP TABLE IF EXISTS {name}")
+        except Exception as e:
+            logger.warning(f"Failed to drop rollup {name}: {e}")
+        with self._lock:
+            self._rollups.get(dataset_id, {}).pop(name, None)
+            self._rewrites.clear()
+            self._stats["drops"] += 1
+        if self.persist:
+            with Session(engine) as session:
+                session.exec(delete(Rollup).where(Rollup.name == name))
+                session.commit()
+
+    def _save(self, dataset_id: str, name: str, entry: dict):
+        if not self.persist:
+            return
+        with Session(engine) as session:
+            session.merge(Rollup(
+                name=name,
+                dataset_id=dataset_id,
+                spec_json=json.dumps({"spec": entry["spec"], "columns": entry["columns"]}),
+                row_count=entry["rows"],
+                base_row_count=entry["base_rows"],
+            ))
+            session.commit()
+
+    def load(self):
+        """Registry from SQLite (the tables themselves live in DuckDB)."""
+        with Session(engine) as session:
+            rows = session.exec(select(Rollup)).all()
+        with self._lock:
+            for row in rows:
+                saved = json.loads(row.spec_json)
+                self._rollups.setdefault(row.dataset_id, {})[row.name] = {
+                    "spec": saved["spec"],
+                    "rows": row.row_count,
+                    "base_rows": row.base_row_count,
+                    "columns": saved["columns"],
+                    "hits": 0,
+                }
+        logger.info(f"Loaded {len(rows)} rollups")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["rollups"] = [
+                {"name": name, "dataset_id": ds, "rows": e["rows"], "base_rows": e["base_rows"],
+                 "hits": e["hits"], "dims": e["spec"]["dims"], "measures": e["spec"]["measures"]}
+                for ds, rollups in self._rollups.items()
+                for name, e in rollups.items()
+            ]
+        return stats
+
+
+_manager = None
+_manager_lock = threading.Lock()
+# one background thread for advising and rebuilding; rollup builds scan whole tables
+_advisor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rollups")
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def get_rollups() -> RollupManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                manager = RollupManager()
+                try:
+                    manager.load()
+                except Exception as e:
+                    logger.warning(f"Could not load rollups: {e}")
+                _manager = manager
+    return _manager
+
+
+def _advise(dataset_id: str):
+    with _pending_lock:
+        _pending.discard(dataset_id)
+    try:
+        get_rollups().advise(dataset_id)
+    except Exception as e:
+        logger.warning(f"Rollup advisor failed for {dataset_id}: {e}")
+
+
+def schedule_advise(dataset_id: str):
+    """Run the advisor for a dataset on the background thread (once if already queued)."""
+    if not ROLLUPS:
+        return
+    with _pending_lock:
+        if dataset_id in _pending:
+            return
+        _pending.add(dataset_id)
+    _advisor.submit(_advise, dataset_id)
@@ -0,0 +1,93 @@
+"""
+Slow-query log.
+
+Queries slower than SLOW_QUERY_MS are kept (most recent first, bounded)
+with their SQL and a DuckDB EXPLAIN ANALYZE profile. EXPLAIN ANALYZE
+re-runs the query, so it happens on a single background thread, off the
+request path, at most once per distinct SQL in the log, and under the
+same cost check and timeout as the query itself.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app.core.database import get_connection
+from app.core.metrics import SLOW_QUERIES
+from app.core.query_guard import check_cost, current_guard, guarded_fetchdf
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "1000"))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "50"))
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+
+_log = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_lock = threading.Lock()
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+_pending = set()  # SQL queued for or running EXPLAIN ANALYZE
+
+
+def _explain(sql: str):
+    try:
+        with get_connection() as conn:
+            check_cost(conn, sql)
+            # outside a request this is a fresh guard: timeout only
+            with current_guard().running(conn):
+                rows = conn.execute(f"EXPLAIN ANALYZE {sql}").fetchall()
+        profile = "\n".join(r[-1] for r in rows)
+    except Exception as e:
+        profile = f"EXPLAIN ANALYZE failed: {e}"
+
+    with _lock:
+        _pending.discard(sql)
+        for e in _log:
+            if e["sql"] == sql and e["profile"] is None:
+                e["profile"] = profile
+
+
+def record_query(sql: str, seconds: float, dataset_id: str | None = None):
+    """Call after executing a query; logs it if it was slow."""
+    ms = seconds * 1000
+    if ms < SLOW_QUERY_MS:
+        return
+
+    SLOW_QUERIES.inc()
+    logger.warning(f"Slow query ({ms:.0f} ms) on {dataset_id}: {sql}")
+
+    entry = {
+        "sql": sql,
+        "dataset_id": dataset_id,
+        "duration_ms": round(ms, 1),
+        "at": datetime.now(timezone.utc).isoformat(),
+        "profile": None,
+    }
+
+    with _lock:
+        # reuse an earlier profile of the same SQL, or the one being made
+        earlier = next((e["profile"] for e in _log if e["sql"] == sql and e["profile"]), None)
+        entry["profile"] = earlier
+        _log.appendleft(entry)
+        submit = SLOW_QUERY_EXPLAIN and earlier is None and sql not in _pending
+        if submit:
+            _pending.add(sql)
+
+    if submit:
+        _explainer.submit(_explain, sql)
+
+
+def timed_execute(conn, sql: str, dataset_id: str | None = None, prepared: tuple[str, list] | None = None):
+    """guarded_fetchdf(conn, sql, prepared), feeding the slow-query log."""
+    start = time.perf_counter()
+    df = guarded_fetchdf(conn, sql, prepared)
+    record_query(sql, time.perf_counter() - start, dataset_id)
+    return df
+
+
+def slow_queries() -> list[dict]:
+    with _lock:
+        return [dict(e) for e in _log]
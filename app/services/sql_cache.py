@@ -0,0 +1,303 @@
+"""
+Question → SQL cache in front of the LLM.
+
+Two tiers, both keyed by (dataset_id, schema fingerprint, normalized question):
+1. exact match LRU with TTL
+2. optional embedding similarity lookup (shared rag embedder + VectorIndex)
+   for near-duplicate wording of a question already answered
+
+Entries are written through to SQLite so the cache survives restarts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, delete
+
+from app.api.models import SQLCacheEntry
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+SQL_CACHE_SIZE = int(os.environ.get("SQL_CACHE_SIZE", "1000"))
+SQL_CACHE_TTL = float(os.environ.get("SQL_CACHE_TTL", str(24 * 3600)))
+SQL_CACHE_SIMILARITY = float(os.environ.get("SQL_CACHE_SIMILARITY", "0.95"))
+SQL_CACHE_SEMANTIC = os.environ.get(
+    "SQL_CACHE_SEMANTIC", os.environ.get("USE_LOCAL_RAG", "")
+).lower() == "true"
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for exact matching.
+
+    Examples:
+      "  Total Revenue by Region? " -> "total revenue by region"
+    """
+    q = question.strip().lower()
+    q = re.sub(r"\s+", " ", q)
+    q = q.strip("?!. \"'")
+    return q
+
+
+def schema_fingerprint(schema: list[dict]) -> str:
+    """Short hash of the (column, type) list; changes when the table does."""
+    payload = json.dumps([[c["column"], c["type"]] for c in schema])
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _cache_key(dataset_id: str, fingerprint: str, question: str) -> str:
+    return hashlib.sha1(f"{dataset_id}\x00{fingerprint}\x00{question}".encode()).hexdigest()
+
+
+class SQLCache:
+
+    def __init__(
+        self,
+        max_entries: int = SQL_CACHE_SIZE,
+        ttl: float = SQL_CACHE_TTL,
+        semantic: bool = SQL_CACHE_SEMANTIC,
+        similarity: float = SQL_CACHE_SIMILARITY,
+        persist: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic = semantic
+        self.similarity = similarity
+        self.persist = persist
+
+        self._entries = OrderedDict()  # key -> entry dict
+        self._lock = threading.RLock()
+
+        # dataset_id -> VectorIndex over normalized questions (texts are cache keys)
+        self._indexes = {}
+
+        self._stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+        }
+
+    # -------------------------------------------------------
+    # embeddings (semantic tier)
+    # -------------------------------------------------------
+
+    def _encode(self, texts: list[str]):
+        from rag.models import embed
+        return embed(texts, prefix="query")
+
+    def _index_add(self, dataset_id: str, keys: list[str], questions: list[str]):
+        from rag.index import VectorIndex
+
+        vectors = self._encode(questions)
+        with self._lock:
+            index = self._indexes.get(dataset_id)
+            if index is None:
+                index = VectorIndex(vectors.shape[1])
+                self._indexes[dataset_id] = index
+            index.add(vectors, keys)
+
+    def _semantic_lookup(self, dataset_id: str, fingerprint: str, question: str):
+        with self._lock:
+            index = self._indexes.get(dataset_id)
+        if index is None:
+            return None
+
+        for key, score in index.search_with_scores(self._encode([question]), k=3):
+            if score < self.similarity:
+                break
+            entry = self._live(key)
+            if entry and entry["fingerprint"] == fingerprint:
+                return entry
+        return None
+
+    # -------------------------------------------------------
+    # exact tier
+    # -------------------------------------------------------
+
+    def _live(self, key: str):
+        """Return a non-expired entry and mark it recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created"] > self.ttl:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def get(self, dataset_id: str, schema: list[dict], question: str) -> str | None:
+        fingerprint = schema_fingerprint(schema)
+        normalized = normalize_question(question)
+
+        entry = self._live(_cache_key(dataset_id, fingerprint, normalized))
+        if entry:
+            with self._lock:
+                self._stats["exact_hits"] += 1
+            return entry["sql"]
+
+        if self.semantic:
+            try:
+                entry = self._semantic_lookup(dataset_id, fingerprint, normalized)
+            except Exception as e:
+                logger.warning(f"Semantic SQL cache lookup failed: {e}")
+                entry = None
+            if entry:
+                with self._lock:
+                    self._stats["semantic_hits"] += 1
+                return entry["sql"]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, dataset_id: str, schema: list[dict], question: str, sql: str):
+        fingerprint = schema_fingerprint(schema)
+        normalized = normalize_question(question)
+        key = _cache_key(dataset_id, fingerprint, normalized)
+
+        self._store(key, {
+            "dataset_id": dataset_id,
+            "fingerprint": fingerprint,
+            "question": normalized,
+            "sql": sql,
+            "created": time.time(),
+        })
+
+        if self.semantic:
+            try:
+                self._index_add(dataset_id, [key], [normalized])
+            except Exception as e:
+                logger.warning(f"Semantic SQL cache insert failed: {e}")
+
+        if self.persist:
+            # one statement, so concurrent puts of the same new question do not collide
+            row = {
+                "key": key,
+                "dataset_id": dataset_id,
+                "schema_fingerprint": fingerprint,
+                "question": normalized,
+                "sql_query": sql,
+                "created_at": datetime.utcnow(),
+            }
+            upsert = sqlite_insert(SQLCacheEntry).values(**row)
+            upsert = upsert.on_conflict_do_update(
+                index_elements=["key"],
+                set_={k: upsert.excluded[k] for k in row if k != "key"},
+            )
+            with Session(engine) as session:
+                session.exec(upsert)
+                session.commit()
+
+    def _store(self, key: str, entry: dict):
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                evicted.append(old_key)
+                self._stats["evictions"] += 1
+
+        if evicted and self.persist:
+            with Session(engine) as session:
+                session.exec(delete(SQLCacheEntry).where(SQLCacheEntry.key.in_(evicted)))
+                session.commit()
+
+    # -------------------------------------------------------
+    # invalidation / persistence
+    # -------------------------------------------------------
+
+    def invalidate(self, dataset_id: str):
+        """Drop every entry for a dataset (re-upload, replace, delete)."""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e["dataset_id"] == dataset_id]
+            for k in stale:
+                del self._entries[k]
+            self._indexes.pop(dataset_id, None)
+            self._stats["invalidations"] += 1
+
+        if self.persist:
+            with Session(engine) as session:
+                session.exec(delete(SQLCacheEntry).where(SQLCacheEntry.dataset_id == dataset_id))
+                session.commit()
+
+    def load(self):
+        """Warm the in-memory tiers from SQLite, skipping expired rows."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+
+        with Session(engine) as session:
+            session.exec(delete(SQLCacheEntry).where(SQLCacheEntry.created_at < cutoff))
+            session.commit()
+            rows = session.exec(
+                select(SQLCacheEntry)
+                .order_by(SQLCacheEntry.created_at.desc())
+                .limit(self.max_entries)
+            ).all()
+
+        by_dataset = {}
+        with self._lock:
+            for row in reversed(rows):
+                # created_at is naive UTC
+                created = row.created_at.replace(tzinfo=timezone.utc).timestamp()
+                self._entries[row.key] = {
+                    "dataset_id": row.dataset_id,
+                    "fingerprint": row.schema_fingerprint,
+                    "question": row.question,
+                    "sql": row.sql_query,
+                    "created": created,
+                }
+                by_dataset.setdefault(row.dataset_id, []).append((row.key, row.question))
+
+        if self.semantic:
+            for dataset_id, items in by_dataset.items():
+                try:
+                    self._index_add(dataset_id, [k for k, _ in items], [q for _, q in items])
+                except Exception as e:
+                    logger.warning(f"Semantic SQL cache warmup failed: {e}")
+                    break
+
+        logger.info(f"Loaded {len(rows)} cached SQL entries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        )
+        stats["semantic"] = self.semantic
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sql_cache() -> SQLCache:
+    """Process-wide SQL cache, loaded from SQLite on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = SQLCache()
+                try:
+                    cache.load()
+                except Exception as e:
+                    logger.warning(f"Could not load SQL cache: {e}")
+                _cache = cache
+    return _cache
@@ -0,0 +1,350 @@
+"""
+Question → SQL templates with the literals as parameters.
+
+When the LLM answers "revenue in East region" with
+
+    SELECT SUM(revenue) FROM t WHERE region = 'East'
+
+the literal 'East' is found in the question, so the pair is learned as
+
+    question pattern   revenue in (.+?) region
+    SQL template       SELECT SUM(revenue) FROM t WHERE region = $1
+
+"revenue in West region" then matches the pattern and gets the template
+with 'West' bound, without an LLM call. Only literals that appear in the
+question become parameters (string values keep the question's casing
+pattern, e.g. "east" -> 'East'); everything else stays inline.
+
+Rendered SQL is remembered with its (template, params), so execution can
+run it as a prepared statement (see core/prepared.py).
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import duckdb
+
+from app.core.metrics import SQL_TEMPLATE_LOOKUPS, SQL_TEMPLATE_SAVED
+from app.core.prepared import sql_literal
+from app.services.sql_cache import schema_fingerprint
+
+logger = logging.getLogger(__name__)
+
+SQL_TEMPLATES = os.environ.get("SQL_TEMPLATES", "true").lower() == "true"
+SQL_TEMPLATE_CACHE_SIZE = int(os.environ.get("SQL_TEMPLATE_CACHE_SIZE", "500"))
+SQL_TEMPLATE_MAX_WORDS = 5  # longest string value a slot captures
+
+_NUMBER_RE = r"-?\d+(?:\.\d+)?"
+_TRANSFORMS = {
+    "same": lambda v: v,
+    "lower": str.lower,
+    "upper": str.upper,
+    "title": str.title,
+}
+# a capture containing these is more than one value ("East and West")
+_MULTI_VALUE_RE = re.compile(r",|\b(and|or|not|vs|versus|except|excluding)\b", re.IGNORECASE)
+_MENTIONED_RE = re.compile(r"^.+?: '(.*)' \(mentioned in the question\)$")
+# typed literals (DATE '2024-01-01') can not take a parameter
+_TYPED_LITERAL_KEYWORDS = {"date", "time", "timestamp", "interval"}
+
+
+def _normalize(question: str) -> str:
+    """Like sql_cache.normalize_question(), but keeps the case of values."""
+    q = re.sub(r"\s+", " ", question.strip())
+    return q.strip("?!. \"'")
+
+
+# ======================================
+# Literal extraction
+# ======================================
+def _literals(sql: str) -> list[tuple[int, int, str, object]]:
+    """
+    (start, end, kind, value) of each string / numeric literal that may
+    become a parameter.
+    """
+    tokens = duckdb.tokenize(sql)
+    found = []
+    for i, (start, kind) in enumerate(tokens):
+        end = tokens[i + 1][0] if i + 1 < len(tokens) else len(sql)
+        text = sql[start:end].rstrip()
+        end = start + len(text)
+        prev = sql[tokens[i - 1][0]:start].strip().lower() if i else ""
+
+        if kind == duckdb.token_type.string_const:
+            if not (text.startswith("'") and text.endswith("'")) or prev in _TYPED_LITERAL_KEYWORDS:
+                continue
+            found.append((start, end, "str", text[1:-1].replace("''", "'")))
+        elif kind == duckdb.token_type.numeric_const:
+            if prev == "by":  # ORDER BY 1 is a column position
+                continue
+            try:
+                value = int(text) if re.fullmatch(r"\d+", text) else float(text)
+            except ValueError:
+                continue
+            found.append((start, end, "num", value))
+    return found
+
+
+def _find_span(question: str, kind: str, value) -> tuple[int, int, str] | None:
+    """Unique occurrence of a literal in the question: (start, end, transform)."""
+    text = str(value)
+    pattern = rf"(?<![\w.]){re.escape(text)}(?!\w|\.\d)"
+    matches = list(re.finditer(pattern, question, re.IGNORECASE))
+    if len(matches) != 1:
+        return None
+    span = matches[0].group(0)
+    if kind == "num":
+        return matches[0].start(), matches[0].end(), "same"
+    for name, fn in _TRANSFORMS.items():
+        if fn(span) == text:
+            return matches[0].start(), matches[0].end(), name
+    return None
+
+
+def parameterize(question: str, sql: str) -> dict | None:
+    """
+    Template for a (question, SQL) pair, or None if no literal of the
+    SQL can be found in the question.
+
+    Returns {"pattern", "slots", "parts", "params"}: the compiled question
+    pattern, one {"kind", "transform"} per captured value, the SQL split
+    around its parameters, and which slot each parameter takes.
+    """
+    question = _normalize(question)
+
+    literals = _literals(sql)
+    occurrences = {}
+    for _, _, kind, value in literals:
+        occurrences[(kind, value)] = occurrences.get((kind, value), 0) + 1
+
+    slots = {}  # question span -> slot info
+    params = []  # (start, end, span) per parameterized literal
+    for start, end, kind, value in literals:
+        found = _find_span(question, kind, value)
+        if found is None:
+            continue
+        if occurrences[(kind, value)] > 1:
+            # "customer_id = 1 LIMIT 1": which 1 is the question's is unknown
+            return None
+        span_start, span_end, transform = found
+        key = (span_start, span_end)
+        if key in slots and (slots[key]["kind"], slots[key]["transform"]) != (kind, transform):
+            continue
+        slots.setdefault(key, {"kind": kind, "transform": transform,
+                               "is_int": isinstance(value, int)})
+        params.append((start, end, key))
+
+    if not slots:
+        return None
+
+    # question pattern: static text around the slots
+    ordered = sorted(slots)
+    pieces, last = [], 0
+    for span_start, span_end in ordered:
+        if span_start < last:
+            return None  # overlapping spans
+        pieces.append(question[last:span_start])
+        last = span_end
+    pieces.append(question[last:])
+
+    # each slot needs static text on both sides, or matching is ambiguous.
+    # A trailing string slot would capture the rest of a longer question
+    # ("region East" -> 'West in 2024'); a trailing number can not.
+    static_words = re.findall(r"\w+", " ".join(pieces))
+    if len(static_words) < 2 or any(not p.strip() for p in pieces[1:-1]):
+        return None
+    if not pieces[-1].strip() and slots[ordered[-1]]["kind"] != "num":
+        return None
+
+    regex = re.escape(pieces[0])
+    for (span_start, span_end), piece in zip(ordered, pieces[1:]):
+        capture = _NUMBER_RE if slots[(span_start, span_end)]["kind"] == "num" else ".+?"
+        regex += f"({capture})" + re.escape(piece)
+
+    # SQL around the parameters
+    parts, slot_of_param, last = [], [], 0
+    for start, end, key in sorted(params):
+        parts.append(sql[last:start])
+        slot_of_param.append(ordered.index(key))
+        last = end
+    parts.append(sql[last:])
+
+    return {
+        "pattern": re.compile(regex, re.IGNORECASE),
+        "slots": [slots[k] for k in ordered],
+        "parts": parts,
+        "params": slot_of_param,
+    }
+
+
+def template_sql(template: dict) -> str:
+    """The SQL with $1, $2, ... placeholders (one per slot)."""
+    sql = template["parts"][0]
+    for slot, part in zip(template["params"], template["parts"][1:]):
+        sql += f"${slot + 1}" + part
+    return sql
+
+
+def render(template: dict, values: list) -> str:
+    """The SQL with the values inlined as literals."""
+    sql = template["parts"][0]
+    for slot, part in zip(template["params"], template["parts"][1:]):
+        sql += sql_literal(values[slot]) + part
+    return sql
+
+
+def mentioned_values(value_hints: list[str] | None) -> dict[str, str]:
+    """
+    Values the value index found in the question, by lowercased value.
+
+    Example: ["city: 'San Francisco' (mentioned in the question)"]
+             -> {"san francisco": "San Francisco"}
+    """
+    values = {}
+    for hint in value_hints or []:
+        match = _MENTIONED_RE.match(hint)
+        if match:
+            value = match.group(1).replace("''", "'")
+            values.setdefault(value.lower(), value)
+    return values
+
+
+def _bind(template: dict, question: str, known: dict[str, str] | None = None) -> list | None:
+    """
+    Slot values for a question matching the template's pattern. String
+    values take the data's spelling from known (see mentioned_values()),
+    else the casing pattern learned with the template.
+    """
+    match = template["pattern"].fullmatch(_normalize(question))
+    if match is None:
+        return None
+    values = []
+    for slot, raw in zip(template["slots"], match.groups()):
+        raw = raw.strip()
+        if slot["kind"] == "num":
+            if slot["is_int"] and not re.fullmatch(r"-?\d+", raw):
+                return None
+            values.append(int(raw) if slot["is_int"] else float(raw))
+        else:
+            if not raw or len(raw.split()) > SQL_TEMPLATE_MAX_WORDS or _MULTI_VALUE_RE.search(raw):
+                return None
+            values.append((known or {}).get(raw.lower()) or _TRANSFORMS[slot["transform"]](raw))
+    return values
+
+
+# ======================================
+# Cache
+# ======================================
+class SQLTemplateCache:
+    """
+    Learned templates per (dataset, schema fingerprint), LRU-bounded,
+    plus the (template, params) of recently rendered SQL for execution.
+    """
+
+    def __init__(self, max_entries: int = SQL_TEMPLATE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (dataset_id, fingerprint, pattern) -> entry
+        self._bindings = OrderedDict()  # rendered sql -> (template sql, params)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "learned": 0, "evictions": 0, "saved_ms": 0.0}
+
+    def _remember(self, sql: str, template: dict, values: list):
+        with self._lock:
+            self._bindings[sql] = (template_sql(template), values)
+            self._bindings.move_to_end(sql)
+            while len(self._bindings) > self.max_entries * 4:
+                self._bindings.popitem(last=False)
+
+    def learn(self, dataset_id: str, schema: list[dict], question: str, sql: str, llm_ms: float):
+        """Remember the template of a generated, validated (question, SQL) pair."""
+        try:
+            template = parameterize(question, sql)
+        except Exception as e:
+            logger.warning(f"Could not parameterize SQL: {e}")
+            return
+        if template is None:
+            return
+
+        values = _bind(template, question)
+        if values is None or render(template, values) != sql:
+            return  # the question does not round-trip through its own pattern
+
+        key = (dataset_id, schema_fingerprint(schema), template["pattern"].pattern)
+        with self._lock:
+            self._entries[key] = {"template": template, "llm_ms": llm_ms}
+            self._entries.move_to_end(key)
+            self._stats["learned"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        self._remember(sql, template, values)
+        logger.info(f"Learned SQL template for {dataset_id}: {template['pattern'].pattern}")
+
+    def match(
+        self, dataset_id: str, schema: list[dict], question: str, known: dict[str, str] | None = None
+    ) -> str | None:
+        """SQL for a question matching a learned template, or None."""
+        fingerprint = schema_fingerprint(schema)
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in reversed(self._entries.items())
+                if key[0] == dataset_id and key[1] == fingerprint
+            ]
+
+        for key, entry in candidates:
+            values = _bind(entry["template"], question, known)
+            if values is None:
+                continue
+            sql = render(entry["template"], values)
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["saved_ms"] += entry["llm_ms"]
+            SQL_TEMPLATE_LOOKUPS.inc(outcome="hit")
+            SQL_TEMPLATE_SAVED.inc(entry["llm_ms"] / 1000)
+            self._remember(sql, entry["template"], values)
+            return sql
+
+        with self._lock:
+            self._stats["misses"] += 1
+        SQL_TEMPLATE_LOOKUPS.inc(outcome="miss")
+        return None
+
+    def prepared(self, sql: str) -> tuple[str, list] | None:
+        """(template, params) that render to sql, if it came from a template."""
+        with self._lock:
+            return self._bindings.get(sql)
+
+    def invalidate(self, dataset_id: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == dataset_id]:
+                del self._entries[key]
+            # table names are unique to a dataset, so its SQL mentions it
+            for sql in [s for s in self._bindings if dataset_id in s]:
+                del self._bindings[sql]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["saved_ms"] = round(stats["saved_ms"], 1)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_template_cache() -> SQLTemplateCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SQLTemplateCache()
+    return _cache
@@ -0,0 +1,117 @@
+"""
+Cheap validation of generated SQL before it runs.
+
+- parse with json_serialize_sql(): syntax errors, and anything that is
+  not a single SELECT (DuckDB only serializes SELECT statements, so
+  DDL/DML/COPY/ATTACH/PRAGMA are rejected by the parser, not by a
+  string prefix; WITH ... SELECT passes)
+- walk the parse tree: only the dataset's table (and CTEs) may be read,
+  no table functions (read_csv, read_parquet, ...)
+- EXPLAIN binds the query against the catalog (unknown columns, tables,
+  type errors) without executing it
+
+Each step takes about a millisecond, so errors are caught before a full
+scan runs and can be handed back to the LLM for a repair.
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# harmless table functions the LLM may use to generate rows
+ALLOWED_TABLE_FUNCTIONS = {"range", "generate_series", "unnest"}
+
+
+class SQLValidationError(ValueError):
+    """
+    Generated SQL failed validation.
+
+    read_only: the statement is not a query at all (DELETE, COPY, ...);
+    such SQL is rejected outright rather than repaired.
+    sql: the statement that failed
+    """
+
+    def __init__(self, message: str, read_only: bool = False, sql: str | None = None):
+        super().__init__(message)
+        self.read_only = read_only
+        self.sql = sql
+
+
+def _walk(node):
+    """Yield every dict in a json_serialize_sql tree."""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def parse_sql(conn, sql: str) -> dict:
+    """Parse tree of a single SELECT statement; SQLValidationError otherwise."""
+    tree = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+
+    if tree.get("error"):
+        message = tree.get("error_message", "could not parse SQL")
+        if message.startswith("Only SELECT"):
+            raise SQLValidationError("Only SELECT queries allowed", read_only=True)
+        raise SQLValidationError(f"Parser Error: {message}")
+
+    statements = tree.get("statements", [])
+    if len(statements) != 1:
+        raise SQLValidationError(f"Expected exactly one SQL statement, got {len(statements)}")
+    return statements[0]
+
+
+def check_tables(statement: dict, table_name: str):
+    """Only the dataset's own table and CTEs defined in the query may be read."""
+    ctes = {
+        entry["key"].lower()
+        for node in _walk(statement)
+        for entry in node.get("cte_map", {}).get("map", [])
+    }
+
+    for node in _walk(statement):
+        kind = node.get("type")
+        if kind == "BASE_TABLE":
+            name = node.get("table_name", "")
+            if name.lower() not in ctes and name.lower() != table_name.lower():
+                raise SQLValidationError(
+                    f"Table '{name}' does not exist; the only table is {table_name}"
+                )
+        elif kind == "TABLE_FUNCTION":
+            function = node.get("function", {}).get("function_name", "")
+            if function.lower() not in ALLOWED_TABLE_FUNCTIONS:
+                raise SQLValidationError(
+                    f"Table function {function}() is not allowed; query {table_name} instead"
+                )
+
+
+def validate_sql(conn, sql: str, table_name: str, schema: list[dict]) -> str:
+    """
+    Validate SQL for a dataset without running it.
+
+    Returns the statement without a trailing semicolon; raises
+    SQLValidationError with a message meant for the repair prompt.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    if not sql:
+        raise SQLValidationError("Empty SQL")
+
+    try:
+        statement = parse_sql(conn, sql)
+        check_tables(statement, table_name)
+    except SQLValidationError as e:
+        e.sql = sql
+        raise
+
+    try:
+        conn.execute(f"EXPLAIN {sql}")
+    except Exception as e:
+        message = str(e).replace("EXPLAIN ", "")
+        columns = ", ".join(c["column"] for c in schema)
+        raise SQLValidationError(f"{message}\nColumns of {table_name}: {columns}", sql=sql)
+
+    return sql
@@ -0,0 +1,217 @@
+"""
+Column-value index for grounding question terms in the data.
+
+At ingestion the distinct values of every (short) text column go into a
+side table `<table>__values(col, val, norm, n)`, sorted by the
+normalized value. Sorting lets DuckDB's min/max zone maps skip most of
+the table for equality and prefix-range probes, so lookups stay fast
+with millions of distinct values.
+
+At question time the question's word n-grams are probed against it:
+- exact matches on the normalized value
+- fuzzy matches (Jaro-Winkler) among values sharing the n-gram's prefix
+
+Only the matched (column, value) pairs go into the prompt.
+"""
+
+import logging
+import os
+import re
+
+from app.core.database import get_connection
+
+logger = logging.getLogger(__name__)
+
+VALUE_INDEX_MAX_LENGTH = int(os.environ.get("VALUE_INDEX_MAX_LENGTH", "100"))
+VALUE_MATCH_LIMIT = int(os.environ.get("VALUE_MATCH_LIMIT", "10"))
+VALUE_MATCH_SIMILARITY = float(os.environ.get("VALUE_MATCH_SIMILARITY", "0.9"))
+
+MAX_NGRAM = 3
+FUZZY_PREFIX = 3
+# values scored per fuzzy probe; bounds latency when a prefix is very common
+FUZZY_CANDIDATES = 5000
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "from", "by", "with", "and", "or",
+    "is", "are", "was", "were", "be", "what", "which", "who", "how", "many", "much",
+    "show", "me", "list", "give", "get", "find", "all", "per", "each", "total", "average",
+    "avg", "sum", "count", "number", "top", "most", "least", "than", "more", "less",
+    "between", "where", "when", "did", "does", "do", "has", "have", "at", "as", "it",
+}
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _lit(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def index_table(table_name: str) -> str:
+    return f"{table_name}__values"
+
+
+# ======================================
+# Build
+# ======================================
+def build_value_index(conn, table_name: str, columns: list[str]) -> int:
+    """
+    (Re)build the value index over the given text columns.
+    Returns the number of indexed (column, value) pairs.
+    """
+    idx = index_table(table_name)
+    if not columns:
+        conn.execute(f"DROP TABLE IF EXISTS {idx}")
+        return 0
+
+    parts = " UNION ALL ".join(
+        f"""SELECT {_lit(c)} AS col, {_q(c)} AS val, COUNT(*) AS n
+            FROM {table_name}
+            WHERE {_q(c)} IS NOT NULL AND length({_q(c)}) <= {VALUE_INDEX_MAX_LENGTH}
+            GROUP BY 2"""
+        for c in columns
+    )
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {idx} AS
+        SELECT col, val, lower(trim(val)) AS norm, n
+        FROM ({parts})
+        ORDER BY norm
+    """)
+    count = conn.execute(f"SELECT COUNT(*) FROM {idx}").fetchone()[0]
+    logger.info(f"Value index for {table_name}: {count} values over {len(columns)} columns")
+    return count
+
+
+def merge_value_index(conn, table_name: str, source: str, columns: list[str]) -> int:
+    """
+    Add the values of rows appended from source (e.g. a staging table)
+    to the index, without scanning the dataset table.
+    Returns the number of indexed (column, value) pairs.
+    """
+    idx = index_table(table_name)
+    exists = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [idx]
+    ).fetchone()[0]
+    if not exists:
+        return build_value_index(conn, table_name, columns)
+    if not columns:
+        return conn.execute(f"SELECT COUNT(*) FROM {idx}").fetchone()[0]
+
+    parts = " UNION ALL ".join(
+        f"""SELECT {_lit(c)} AS col, {_q(c)} AS val, COUNT(*) AS n
+            FROM {source}
+            WHERE {_q(c)} IS NOT NULL AND length({_q(c)}) <= {VALUE_INDEX_MAX_LENGTH}
+            GROUP BY 2"""
+        for c in columns
+    )
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {idx} AS
+        SELECT col, val, lower(trim(val)) AS norm, SUM(n)::BIGINT AS n
+        FROM (SELECT col, val, n FROM {idx} UNION ALL {parts})
+        GROUP BY col, val
+        ORDER BY norm
+    """)
+    count = conn.execute(f"SELECT COUNT(*) FROM {idx}").fetchone()[0]
+    logger.info(f"Value index for {table_name}: merged appended rows, {count} values")
+    return count
+
+
+def refresh_value_index(table_name: str, schema: list[dict]) -> int:
+    columns = [c["column"] for c in schema if c["type"] == "VARCHAR"]
+    with get_connection() as conn:
+        return build_value_index(conn, table_name, columns)
+
+
+def drop_value_index(conn, table_name: str):
+    conn.execute(f"DROP TABLE IF EXISTS {index_table(table_name)}")
+
+
+# ======================================
+# Lookup
+# ======================================
+def question_ngrams(question: str, max_n: int = MAX_NGRAM) -> list[str]:
+    """
+    Lowercased word n-grams that could name a value.
+
+    Examples:
+      "revenue in New York" -> ["revenue", "new", "york", "new york", "in new york", ...]
+      (n-grams that start or end with a stopword are skipped)
+    """
+    words = re.findall(r"[\w][\w'&.-]*", question.lower())
+    grams = []
+    for n in range(1, max_n + 1):
+        for i in range(len(words) - n + 1):
+            gram = words[i:i + n]
+            if gram[0] in _STOPWORDS or gram[-1] in _STOPWORDS:
+                continue
+            text = " ".join(gram).strip(".")
+            if len(text) >= 2 and text not in grams:
+                grams.append(text)
+    return grams
+
+
+def _prefix_range(prefix: str) -> tuple[str, str]:
+    """[lo, hi) range of strings starting with prefix."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def match_values(conn, table_name: str, question: str, limit: int = VALUE_MATCH_LIMIT) -> list[tuple[str, str]]:
+    """(column, value) pairs from the table that the question mentions."""
+    idx = index_table(table_name)
+    exists = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [idx]
+    ).fetchone()[0]
+    grams = question_ngrams(question)
+    if not exists or not grams:
+        return []
+
+    exact = conn.execute(
+        f"SELECT col, val, norm, n FROM {idx} WHERE norm IN ({', '.join('?' * len(grams))})",
+        grams,
+    ).fetchall()
+    matched_norms = {r[2] for r in exact}
+
+    fuzzy = []
+    probes = [
+        g for g in grams
+        if len(g) >= 4 and g not in matched_norms
+        and not any(g in m or m in g for m in matched_norms)
+    ]
+    if probes:
+        queries, params = [], []
+        for g in probes:
+            lo, hi = _prefix_range(g[:FUZZY_PREFIX])
+            queries.append(f"""
+                SELECT col, val, norm, n,
+                    greatest(
+                        jaro_winkler_similarity(norm, ?),
+                        -- "acme" -> "acme corp"
+                        CASE WHEN starts_with(norm, ?) THEN {VALUE_MATCH_SIMILARITY} ELSE 0 END
+                    ) AS score
+                FROM (
+                    SELECT * FROM {idx} WHERE norm >= ? AND norm < ? LIMIT {FUZZY_CANDIDATES}
+                )
+            """)
+            params += [g, g + " ", lo, hi]
+        fuzzy = conn.execute(
+            f"SELECT col, val, max(score) AS score, any_value(n) AS n FROM ({' UNION ALL '.join(queries)}) "
+            f"WHERE score >= {VALUE_MATCH_SIMILARITY} "
+            f"GROUP BY col, val ORDER BY score DESC, n DESC LIMIT {int(limit)}",
+            params,
+        ).fetchall()
+
+    pairs = []
+    for col, val, *_ in sorted(exact, key=lambda r: -r[3]) + fuzzy:
+        if (col, val) not in pairs:
+            pairs.append((col, val))
+    return pairs[:limit]
+
+
+def match_hints(pairs: list[tuple[str, str]]) -> list[str]:
+    """
+    Prompt lines for matched values.
+
+    Example: "city: 'San Francisco' (mentioned in the question)"
+    """
+    return [f"{col}: '{val}' (mentioned in the question)" for col, val in pairs]
@@ -0,0 +1,101 @@
+"""
+ANN benchmark: recall@k vs query latency for each VectorIndex kind.
+
+Vectors are a synthetic mixture of normalized Gaussian clusters (closer
+to real embeddings than uniform noise). Ground truth comes from the
+exact flat index. Each approximate kind is swept over its search knob
+(nprobe for IVF, efSearch for HNSW).
+
+Usage:
+    python -m benchmarks.bench_ann --n 200000 --dim 384
+    python -m benchmarks.bench_ann --n 1000000 --dim 768 --kinds ivf_flat,ivf_pq
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from rag.index import VectorIndex, choose_index_kind
+
+SWEEPS = {
+    "flat": [None],
+    "ivf_flat": [1, 4, 16, 64],
+    "hnsw": [16, 32, 64, 128],
+    "ivf_pq": [4, 16, 64],
+}
+
+
+def make_vectors(n: int, dim: int, clusters: int = 256, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, n)
+    x = centers[labels] + 0.35 * rng.standard_normal((n, dim)).astype("float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(index: VectorIndex, queries: np.ndarray, k: int):
+    """One query at a time (like /ask). Returns (ids, p50 ms, p99 ms)."""
+    ids, times = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, found = index.index.search(q[None, :], k)
+        times.append((time.perf_counter() - start) * 1000)
+        ids.append(found[0])
+    return np.array(ids), float(np.percentile(times, 50)), float(np.percentile(times, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", default="flat,ivf_flat,hnsw,ivf_pq")
+    parser.add_argument("--fp16", action="store_true", help="also run float16 variants")
+    args = parser.parse_args()
+
+    # queries come from the same distribution as the corpus, but are held out
+    vectors = make_vectors(args.n + args.queries, args.dim)
+    data, queries = vectors[:args.n], vectors[args.n:]
+    texts = [""] * args.n
+
+    print(f"\nn={args.n:,} dim={args.dim} k={args.k}  (auto picks: {choose_index_kind(args.n)})")
+
+    truth_index = VectorIndex.build(data, texts, kind="flat")
+    truth, _, _ = run(truth_index, queries, args.k)
+
+    print(f"{'index':>14} {'knob':>6} {'build s':>8} {'MB':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    variants = [(kind, False) for kind in args.kinds.split(",")]
+    if args.fp16:
+        variants += [(kind, True) for kind in args.kinds.split(",") if kind != "ivf_pq"]
+
+    for kind, fp16 in variants:
+        start = time.perf_counter()
+        index = VectorIndex.build(data, texts, kind=kind, fp16=fp16)
+        build = time.perf_counter() - start
+        mb = index.nbytes() / 1024 ** 2
+        name = kind + ("/fp16" if fp16 else "")
+
+        for knob in SWEEPS[kind]:
+            if kind == "hnsw":
+                index.set_search_params(ef_search=knob)
+            elif knob is not None:
+                index.set_search_params(nprobe=knob)
+
+            found, p50, p99 = run(index, queries, args.k)
+            print(
+                f"{name:>14} {knob if knob is not None else '-':>6} {build:>8.1f} {mb:>8.1f} "
+                f"{recall_at_k(found, truth):>9.3f} {p50:>8.3f} {p99:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
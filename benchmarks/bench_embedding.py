@@ -0,0 +1,90 @@
+"""
+Embedding throughput: one forward pass per question vs micro-batching.
+
+Each client thread encodes --requests questions back to back, either
+calling the model directly ("direct", the old per-question path) or
+through rag.batcher.MicroBatcher ("batched").
+
+--fake replaces bge-base with a model whose cost is a fixed per-call
+overhead plus a per-item cost, for machines without
+sentence-transformers.
+
+Usage:
+    python -m benchmarks.bench_embedding --clients 1,8,64
+    python -m benchmarks.bench_embedding --clients 1,8,64 --fake
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from rag.batcher import MicroBatcher
+
+
+class FakeEmbedder:
+    def __init__(self, call_ms: float = 8.0, item_ms: float = 0.3, dim: int = 768):
+        self.call_s = call_ms / 1000
+        self.item_s = item_ms / 1000
+        self.dim = dim
+
+    def encode(self, texts, prefix=None):
+        if isinstance(texts, str):
+            texts = [texts]
+        time.sleep(self.call_s + self.item_s * len(texts))
+        return np.zeros((len(texts), self.dim), dtype="float32")
+
+
+def run(encode, clients: int, requests: int) -> float:
+    """Returns questions/sec across all clients."""
+    def client(i):
+        for j in range(requests):
+            encode(f"query: total revenue by region for client {i} request {j}")
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return clients * requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default="1,8,64")
+    parser.add_argument("--requests", type=int, default=20, help="per client")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    parser.add_argument("--fake", action="store_true")
+    args = parser.parse_args()
+
+    if args.fake:
+        model = FakeEmbedder()
+    else:
+        from rag.embed import Embedder
+        model = Embedder()
+    model.encode(["warmup"])
+
+    lock = threading.Lock()
+
+    def direct(text):
+        # torch already parallelizes one forward pass; serialize callers
+        with lock:
+            return model.encode([text])
+
+    batcher = MicroBatcher(model.encode, max_batch=args.batch_size, max_wait_ms=args.wait_ms)
+
+    print(f"\n{'clients':>8} {'direct q/s':>11} {'batched q/s':>12} {'speedup':>8} {'avg batch':>10}")
+    for clients in (int(c) for c in args.clients.split(",")):
+        before = batcher.stats()
+        d = run(direct, clients, args.requests)
+        b = run(lambda text: batcher([text]), clients, args.requests)
+        after = batcher.stats()
+        avg = (after["items"] - before["items"]) / max(1, after["batches"] - before["batches"])
+        print(f"{clients:>8} {d:>11.1f} {b:>12.1f} {b / d:>7.1f}x {avg:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Generator cache benchmark: RSS and build time against number of datasets.
+
+Builds one SQLGenerator per synthetic dataset schema through
+ai_service._get_generator and reports resident memory at checkpoints.
+With --local the retrievers use FAISS + embedder + reranker (needs
+sentence-transformers); --no-share drops the shared models after each
+build, which reproduces the old one-model-set-per-dataset behaviour.
+
+Usage:
+    python -m benchmarks.bench_generators --datasets 10,100,500
+    python -m benchmarks.bench_generators --datasets 10,50 --local --no-share
+"""
+
+import argparse
+import os
+import resource
+import time
+
+
+def rss_mb() -> float:
+    """Current RSS (Linux), falling back to peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_schema(i: int, columns: int) -> list[dict]:
+    types = ["VARCHAR", "DOUBLE", "BIGINT", "DATE"]
+    return [
+        {"column": f"col_{i}_{c}", "type": types[c % len(types)]}
+        for c in range(columns)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--datasets", default="10,100,500")
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--local", action="store_true", help="USE_LOCAL_RAG=true")
+    parser.add_argument("--no-share", action="store_true", help="reload models per dataset")
+    parser.add_argument("--cache-size", type=int, help="override GENERATOR_CACHE_SIZE")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    if args.local:
+        os.environ["USE_LOCAL_RAG"] = "true"
+    if args.cache_size:
+        os.environ["GENERATOR_CACHE_SIZE"] = str(args.cache_size)
+
+    import rag.models
+    import app.services.ai_service as ai_service
+    from app.services.generator_cache import get_generator_cache
+
+    ai_service._llm = object()  # generators only hold a reference
+
+    checkpoints = sorted(int(n) for n in args.datasets.split(","))
+    base = rss_mb()
+    print(f"\nbaseline RSS {base:.0f}MB")
+    print(f"{'datasets':>9} {'RSS':>9} {'delta':>9} {'ms/build':>9} {'cached':>7} {'evicted':>8}")
+
+    built = 0
+    start = time.perf_counter()
+    for target in checkpoints:
+        while built < target:
+            ai_service._get_generator(make_schema(built, args.columns), f"dataset_bench{built}")
+            built += 1
+            if args.no_share:
+                rag.models._embedder = None
+                rag.models._reranker = None
+
+        stats = get_generator_cache().stats()
+        elapsed = (time.perf_counter() - start) * 1000 / built
+        rss = rss_mb()
+        print(
+            f"{built:>9} {rss:>7.0f}MB {rss - base:>7.0f}MB {elapsed:>9.1f} "
+            f"{stats['entries']:>7} {stats['evictions']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Ingestion benchmark: peak RSS and rows/sec for CSV uploads.
+
+Each run happens in a fresh subprocess against a throwaway DuckDB file,
+so peak RSS (ru_maxrss) belongs to that ingestion alone. The "pandas"
+engine reproduces the old pd.read_csv + register path for comparison.
+
+Usage:
+    python -m benchmarks.bench_ingestion --sizes 100MB,1GB,5GB
+    python -m benchmarks.bench_ingestion --sizes 100MB --engines streaming,pandas
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def make_csv(path: Path, size: int):
+    """Write a synthetic sales CSV of roughly `size` bytes."""
+    if path.exists() and path.stat().st_size >= size:
+        return
+
+    rng = random.Random(42)
+    regions = ["East", "West", "North", "South", "Central"]
+    products = ["Widget", "Gadget", "Doohickey", "Gizmo", "Thingamajig"]
+
+    with open(path, "w") as f:
+        f.write("Order ID,Region,Product Name,Unit Price ($),Quantity,Order Date,Notes\n")
+        written = 0
+        i = 0
+        while written < size:
+            lines = []
+            for _ in range(10_000):
+                i += 1
+                lines.append(
+                    f"{i},{rng.choice(regions)},{rng.choice(products)},"
+                    f"{rng.uniform(1, 500):.2f},{rng.randint(1, 50)},"
+                    f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},"
+                    f"note {rng.randint(0, 10 ** 6)}\n"
+                )
+            chunk = "".join(lines)
+            f.write(chunk)
+            written += len(chunk)
+
+
+def child(engine: str, csv_path: str):
+    """Runs inside the subprocess; prints one JSON line."""
+    start = time.perf_counter()
+
+    if engine == "streaming":
+        from app.services.ingestion import ingest_file
+        result = ingest_file(Path(csv_path), table_name="bench")
+        rows = result["row_count"]
+    else:
+        import pandas as pd
+        from app.core.database import get_connection
+        from app.services.ingestion import _clean_columns
+
+        df = pd.read_csv(csv_path)
+        df.columns = _clean_columns(list(df.columns))
+        with get_connection() as conn:
+            conn.register("tmp_df", df)
+            conn.execute("CREATE OR REPLACE TABLE bench AS SELECT * FROM tmp_df")
+            rows = conn.execute("SELECT COUNT(*) FROM bench").fetchone()[0]
+
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"rows": rows, "seconds": elapsed, "peak_rss_mb": peak_kb / 1024}))
+
+
+def run_one(engine: str, csv_path: Path, workdir: Path) -> dict:
+    db_path = workdir / f"bench_{engine}.duckdb"
+    for p in (db_path, Path(str(db_path) + ".wal")):
+        if p.exists():
+            p.unlink()
+
+    env = dict(os.environ, DUCKDB_PATH=str(db_path))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_ingestion", "--child", engine, str(csv_path)],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100MB,1GB,5GB")
+    parser.add_argument("--engines", default="streaming,pandas")
+    parser.add_argument("--workdir", default=tempfile.gettempdir())
+    parser.add_argument("--child", nargs=2, metavar=("ENGINE", "CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    workdir = Path(args.workdir)
+    print(f"\n{'size':>8} {'engine':>10} {'rows':>12} {'seconds':>9} {'rows/sec':>12} {'peak RSS':>10}")
+
+    for size_text in args.sizes.split(","):
+        size = parse_size(size_text)
+        csv_path = workdir / f"datapilot_bench_{size_text.strip()}.csv"
+        make_csv(csv_path, size)
+
+        for engine in args.engines.split(","):
+            r = run_one(engine.strip(), csv_path, workdir)
+            if "error" in r:
+                print(f"{size_text:>8} {engine:>10}  failed: {r['error']}")
+                continue
+            print(
+                f"{size_text:>8} {engine:>10} {r['rows']:>12,} {r['seconds']:>9.2f} "
+                f"{r['rows'] / r['seconds']:>12,.0f} {r['peak_rss_mb']:>8.0f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Prompt size and LLM latency against table width.
+
+For each width builds a synthetic schema, three sample rows and value
+hints, then reports prompt tokens and LLM latency with the full prompt
+("full") and with the token-budgeted one from rag.prompt_planner
+("pruned").
+
+By default the LLM is the in-process stand-in (rag.llm_standin) with a
+latency proportional to prompt tokens (--ms-per-1k-tokens); --env uses
+the backend configured by LLM_PROVIDER / GROQ_API_KEY instead.
+
+Usage:
+    python -m benchmarks.bench_prompt_width --widths 20,100,400,800
+    python -m benchmarks.bench_prompt_width --widths 100,800 --budget 2000 --env
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+QUESTION = "average revenue by region for the east region"
+
+
+def make_table(columns: int):
+    """Schema docs, sample rows and value hints for a table of `columns` columns."""
+    from app.services.ai_service import build_schema_docs
+
+    names = ["region", "revenue"] + [f"metric_{c}_total" for c in range(columns - 2)]
+    types = ["VARCHAR", "DOUBLE"] + ["BIGINT"] * (columns - 2)
+    schema = [{"column": n, "type": t} for n, t in zip(names, types)]
+    rows = [
+        {n: ("East" if n == "region" else i * 10 + c) for c, n in enumerate(names)}
+        for i in range(3)
+    ]
+    hints = ["region: 'East' (mentioned in the question)"] + [f"{n}: 0 to 1000" for n in names[1:]]
+    return build_schema_docs(schema, "sales"), rows, hints
+
+
+def serve_standin(port: int, ms_per_1k_tokens: float, latency_ms: float):
+    import uvicorn
+    from rag.llm_standin import create_app
+
+    app = create_app(latency_ms, ms_per_1k_tokens=ms_per_1k_tokens)
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def time_llm(llm, prompt: str, repeat: int) -> float:
+    """Median latency in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        llm.generate(prompt)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--widths", default="20,100,200,400,800")
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--env", action="store_true", help="use the configured LLM backend")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=150)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    from rag.llm import LocalLLM
+    from rag.llm_backends import LLMClient, OpenAICompatibleBackend
+    from rag.prompt import build_sql_prompt
+    from rag.prompt_planner import plan_prompt
+
+    if args.env:
+        llm = LocalLLM()
+    else:
+        serve_standin(args.port, args.ms_per_1k_tokens, args.latency_ms)
+        backend = OpenAICompatibleBackend(f"http://127.0.0.1:{args.port}/v1", "standin")
+        llm = LocalLLM(client=LLMClient(backend))
+
+    print(f"budget={args.budget} tokens, question={QUESTION!r}")
+    print(f"{'columns':>8} {'tokens full':>12} {'tokens pruned':>14} {'kept':>6} "
+          f"{'plan ms':>8} {'llm full ms':>12} {'llm pruned ms':>14}")
+    for width in sorted(int(w) for w in args.widths.split(",")):
+        docs, rows, hints = make_table(width)
+        full = build_sql_prompt(QUESTION, docs, sample_data=rows, value_hints=hints)
+
+        start = time.perf_counter()
+        pruned, stats = plan_prompt(QUESTION, docs, rows, hints, budget=args.budget)
+        plan_ms = (time.perf_counter() - start) * 1000
+
+        full_ms = time_llm(llm, full, args.repeat)
+        pruned_ms = time_llm(llm, pruned, args.repeat)
+        print(f"{width:>8} {stats['tokens_before']:>12} {stats['tokens_after']:>14} "
+              f"{stats['columns_kept']:>6} {plan_ms:>8.1f} {full_ms:>12.0f} {pruned_ms:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Dashboard-style GROUP BY latency: base table vs rollup tables.
+
+Builds a synthetic sales table of --rows rows in a throwaway DuckDB
+file, lets app.services.rollups advise on a repeated dashboard workload,
+then times each query on the base table and rewritten onto its rollup,
+checking both return the same rows.
+
+Usage:
+    python -m benchmarks.bench_rollups --rows 20000000
+    python -m benchmarks.bench_rollups --rows 100000000 --repeat 3
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+TABLE = "dataset_bench_rollups"
+
+QUERIES = [
+    f"SELECT region, SUM(amount) AS total FROM {TABLE} GROUP BY region ORDER BY total DESC",
+    f"SELECT region, COUNT(*) AS orders, AVG(amount) AS avg_amount FROM {TABLE} "
+    f"WHERE region IN ('East', 'West') GROUP BY region ORDER BY region",
+    f"SELECT date_trunc('month', order_date) AS month, SUM(amount) AS total, MAX(amount) AS largest "
+    f"FROM {TABLE} GROUP BY ALL ORDER BY month",
+    f"SELECT date_trunc('year', order_date) AS year, product, SUM(quantity) AS units "
+    f"FROM {TABLE} GROUP BY ALL ORDER BY year, product",
+]
+
+
+def make_table(conn, rows: int):
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {TABLE} AS
+        SELECT
+            i AS order_id,
+            (['East', 'West', 'North', 'South', 'Central'])[1 + i % 5] AS region,
+            (['Widget', 'Gadget', 'Gizmo', 'Doohickey'])[1 + (i // 7) % 4] AS product,
+            DATE '2022-01-01' + CAST(i % 1095 AS INTEGER) AS order_date,
+            round(random() * 500, 2) AS amount,
+            1 + i % 50 AS quantity
+        FROM range({rows}) t(i)
+    """)
+
+
+def time_query(conn, sql: str, repeat: int) -> tuple[float, list]:
+    """Median latency in ms and the rows."""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = conn.execute(sql).fetchall()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def same(a: list, b: list) -> bool:
+    def norm(rows):
+        return [tuple(round(v, 6) if isinstance(v, float) else v for v in r) for r in rows]
+    return norm(a) == norm(b)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_rollups_")
+    os.environ["DUCKDB_PATH"] = os.path.join(workdir, "bench.duckdb")
+    os.environ.setdefault("ROLLUP_MIN_ROWS", "0")
+
+    from app.core.database import get_connection
+    from app.services.rollups import RollupManager
+
+    with get_connection() as conn:
+        start = time.perf_counter()
+        make_table(conn, args.rows)
+        print(f"table: {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+    rollups = RollupManager(persist=False)
+    start = time.perf_counter()
+    built = rollups.advise(TABLE, QUERIES * 3)
+    print(f"rollups: {len(built)} built in {time.perf_counter() - start:.1f}s")
+    for r in rollups.stats()["rollups"]:
+        print(f"  {r['name']}: {r['rows']:,} rows, dims={r['dims']}")
+
+    print(f"\n{'query':>5} {'base ms':>10} {'rollup ms':>10} {'speedup':>8} {'same':>5}")
+    with get_connection() as conn:
+        for i, sql in enumerate(QUERIES):
+            rewritten = rollups.rewrite(sql, TABLE)
+            base_ms, base_rows = time_query(conn, sql, args.repeat)
+            if rewritten is None:
+                print(f"{i:>5} {base_ms:>10.1f} {'-':>10} {'-':>8} {'-':>5}")
+                continue
+            rollup_ms, rollup_rows = time_query(conn, rewritten, args.repeat)
+            print(f"{i:>5} {base_ms:>10.1f} {rollup_ms:>10.1f} {base_ms / rollup_ms:>7.0f}x "
+                  f"{str(same(base_rows, rollup_rows)):>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Load test: latency of /health and /api/datasets while /api/ask calls
+are in flight.
+
+The LLM is replaced by a stub that takes --llm-delay seconds per call, so
+the test measures the server's concurrency model rather than Groq.
+With --blocking the stub sleeps synchronously inside the event loop,
+which reproduces the old behaviour for comparison.
+
+The app runs against DuckDB / SQLite files in a temporary directory,
+so the test dataset never shows up in the real dataset list.
+
+Usage:
+    python -m benchmarks.load_ask --ask-clients 16 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "load-test")
+
+# throwaway databases, set before the app reads its config
+_workdir = tempfile.mkdtemp(prefix="load_ask_")
+os.environ["DUCKDB_PATH"] = os.path.join(_workdir, "load.duckdb")
+os.environ["DATAPILOT_DB_PATH"] = os.path.join(_workdir, "load.db")
+
+import httpx
+
+from app.main import app
+from app.api.endpoints import UPLOAD_DIR
+from app.core.database import create_db_and_tables
+import app.services.ai_service as ai_service
+
+
+class StubLLM:
+    def __init__(self, delay: float, blocking: bool):
+        self.delay = delay
+        self.blocking = blocking
+        self.table = None
+
+    def _sql(self) -> str:
+        return f"SELECT region, SUM(revenue) AS total FROM {self.table} GROUP BY region;"
+
+    def generate(self, prompt: str, max_tokens: int = 256) -> str:
+        time.sleep(self.delay)
+        return self._sql()
+
+    async def agenerate(self, prompt: str, max_tokens: int = 256) -> str:
+        if self.blocking:
+            time.sleep(self.delay)
+        else:
+            await asyncio.sleep(self.delay)
+        return self._sql()
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def report(name: str, latencies: list[float]):
+    ms = [v * 1000 for v in latencies]
+    print(
+        f"{name:<22} n={len(ms):<6} "
+        f"p50={statistics.median(ms):8.2f}ms  "
+        f"p99={percentile(ms, 99):8.2f}ms  "
+        f"max={max(ms):8.2f}ms"
+    )
+
+
+async def ask_worker(client, dataset_id, stop_at, latencies):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        r = await client.post("/api/ask", json={
+            "dataset_id": dataset_id,
+            "question": "total revenue by region",
+        })
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def probe_worker(client, path, stop_at, latencies, interval):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        r = await client.get(path)
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    create_db_and_tables()
+    llm = StubLLM(args.llm_delay, args.blocking)
+    ai_service._llm = llm
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        csv = "region,revenue\n" + "\n".join(
+            f"{r},{i}" for i, r in enumerate(["East", "West", "North", "South"] * 250)
+        )
+        r = await client.post("/api/upload", files={"file": ("load_test.csv", csv.encode())})
+        r.raise_for_status()
+        dataset_id = r.json()["dataset_id"]
+        job_url = f"/api/jobs/{r.json()['job_id']}"
+        llm.table = dataset_id
+
+        try:
+            # uploads are ingested in the background; wait for the job
+            while (job := (await client.get(job_url)).json())["status"] in ("queued", "running"):
+                await asyncio.sleep(0.05)
+            if job["status"] != "succeeded":
+                raise RuntimeError(f"Test upload failed: {job['error']}")
+
+            # baseline with no /ask traffic
+            idle = {"/health": [], "/api/datasets": []}
+            stop_at = time.perf_counter() + min(args.duration, 3)
+            await asyncio.gather(*[
+                probe_worker(client, path, stop_at, lat, args.probe_interval)
+                for path, lat in idle.items()
+            ])
+
+            loaded = {"/health": [], "/api/datasets": []}
+            ask_latencies = []
+            stop_at = time.perf_counter() + args.duration
+            await asyncio.gather(
+                *[ask_worker(client, dataset_id, stop_at, ask_latencies) for _ in range(args.ask_clients)],
+                *[probe_worker(client, path, stop_at, lat, args.probe_interval) for path, lat in loaded.items()],
+            )
+        finally:
+            await client.delete(f"/api/datasets/{dataset_id}")
+            # the saved upload lives in the shared upload directory
+            (UPLOAD_DIR / f"{dataset_id.removeprefix('dataset_')}_load_test.csv").unlink(missing_ok=True)
+
+    mode = "blocking stub" if args.blocking else "async stub"
+    print(f"\n===== {args.ask_clients} /ask clients, LLM delay {args.llm_delay}s ({mode}) =====\n")
+    for path, lat in idle.items():
+        report(f"{path} idle", lat)
+    for path, lat in loaded.items():
+        report(f"{path} loaded", lat)
+    report("/api/ask", ask_latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ask-clients", type=int, default=16)
+    parser.add_argument("--llm-delay", type=float, default=0.5)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--blocking", action="store_true",
+                        help="simulate a synchronous LLM client on the event loop")
+    try:
+        asyncio.run(run(parser.parse_args()))
+    finally:
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
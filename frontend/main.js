@@ -1,6 +1,7 @@
 // DataPilot Frontend - Main Application Logic
 
 const API_BASE = '/api';
+const PAGE_SIZE = 100;
 
 // Generate stars background (dense field like NexusData)
 function generateStars() {
@@ -38,6 +39,8 @@ let currentDataset = null;
 let datasets = [];
 let recentQueries = [];
 let chartInstance = null;
+// result id -> column order, for rendering further pages of that table
+const resultColumns = new Map();
 
 
 // DOM Elements
@@ -125,6 +128,23 @@ function handleFileUpload(e) {
   }
 }
 
+// Uploads are ingested in the background: poll the job until it is done
+async function waitForJob(job, name) {
+  while (true) {
+    const response = await fetch(`${API_BASE}/jobs/${job.job_id}`);
+    if (!response.ok) throw new Error('Lost track of the upload job');
+    const status = await response.json();
+
+    if (status.status === 'succeeded') return status.result;
+    if (status.status === 'failed') throw new Error(status.error || 'Ingestion failed');
+    if (status.status === 'cancelled') throw new Error('Upload was cancelled');
+
+    const percent = status.progress ? ` ${Math.round(status.progress * 100)}%` : '';
+    showLoading(`Ingesting ${name}...${percent}`);
+    await new Promise(resolve => setTimeout(resolve, 500));
+  }
+}
+
 async function uploadFile(file) {
   showLoading('Uploading ' + file.name + '...');
 
@@ -137,15 +157,14 @@ async function uploadFile(file) {
       method: 'POST',
       body: formData
     });
-    const endTime = performance.now();
-    updateLatency(endTime - startTime);
 
     if (!response.ok) {
       const error = await response.json();
       throw new Error(error.detail || 'Upload failed');
     }
 
-    const data = await response.json();
+    const data = await waitForJob(await response.json(), file.name);
+    updateLatency(performance.now() - startTime);
 
     // Update state
     currentDataset = {
@@ -200,7 +219,9 @@ async function handleAsk() {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
         dataset_id: currentDataset.id,
-        question: question
+        question: question,
+        limit: PAGE_SIZE,
+        chart: true
       })
     });
     const endTime = performance.now();
@@ -305,6 +326,7 @@ function hideWelcome() {
 function resetToWelcome() {
   currentDataset = null;
   currentDatasetEl.textContent = 'No dataset selected';
+  resultColumns.clear();
   // Input remains enabled to allow typing
   chatArea.innerHTML = `
     <div class="welcome-state" id="welcomeState">
@@ -314,7 +336,7 @@ function resetToWelcome() {
       <h2>Welcome to DataPilot</h2>
       <p>Upload a CSV file to start analyzing your data with natural language queries</p>
       <label class="upload-zone" id="uploadZone">
-        <input type="file" id="fileInput" accept=".csv" hidden>
+        <input type="file" id="fileInput" accept=".csv,.xlsx,.xls,.parquet,.json,.ndjson,.jsonl,.gz,.zst" hidden>
         <div class="upload-content">
           <i data-lucide="upload-cloud" size="32" class="upload-icon-lucide"></i>
           <span>Drop CSV here or click to upload</span>
@@ -374,7 +396,8 @@ function removeMessage(id) {
 }
 
 function addAssistantMessage(data) {
-  const tableHtml = renderResultsTable(data.data);
+  const resultId = 'result-' + Date.now();
+  const tableHtml = renderResultsTable(data.data, resultId);
   const sqlHtml = highlightSQL(data.sql_query);
   const botIcon = getIcon('bot', 20);
 
@@ -398,23 +421,37 @@ function addAssistantMessage(data) {
         </div>
         
         ${tableHtml}
+        <div class="table-footer-row" id="${resultId}-footer"></div>
       </div>
     </div>
   `;
   chatArea.insertAdjacentHTML('beforeend', html);
-  renderAutoChart(data.data);
+  updateResultsFooter(resultId, data, data.data.length);
+  renderAutoChart(data.chart_data || data.data, data.downsampled);
   scrollToBottom();
 }
 
-function renderResultsTable(data) {
+function renderResultsTable(data, resultId) {
   if (!data || data.length === 0) {
     return '<p class="no-results">No results found.</p>';
   }
 
   const columns = Object.keys(data[0]);
-  const headerHtml = columns.map(col => `<th>${col.toUpperCase()}</th>`).join('');
+  resultColumns.set(resultId, columns);
+  const headerHtml = columns.map(col => `<th>${escapeHtml(col.toUpperCase())}</th>`).join('');
 
-  const rowsHtml = data.slice(0, 10).map(row => {
+  return `
+    <div class="results-table-container">
+      <table class="results-table">
+        <thead><tr>${headerHtml}</tr></thead>
+        <tbody id="${resultId}-rows">${renderRows(data, columns)}</tbody>
+      </table>
+    </div>
+  `;
+}
+
+function renderRows(data, columns) {
+  return data.map(row => {
     const cells = columns.map(col => {
       let value = row[col];
       let className = '';
@@ -429,25 +466,65 @@ function renderResultsTable(data) {
         }
       }
 
-      return `<td class="${className}">${value}</td>`;
+      return `<td class="${className}">${escapeHtml(String(value))}</td>`;
     }).join('');
     return `<tr>${cells}</tr>`;
   }).join('');
+}
+
+// "Showing X of Y rows" + a button that fetches the next page on demand
+function updateResultsFooter(resultId, page, loaded) {
+  const footer = document.getElementById(`${resultId}-footer`);
+  if (!footer) return;
 
-  let footer = '';
-  if (data.length > 10) {
-    footer = `<p class="table-footer">Showing 10 of ${data.length} rows</p>`;
+  const total = page.total_rows ?? loaded;
+  if (total <= loaded && !page.next_page_token) {
+    footer.innerHTML = '';
+    return;
   }
 
-  return `
-    <div class="results-table-container">
-      <table class="results-table">
-        <thead><tr>${headerHtml}</tr></thead>
-        <tbody>${rowsHtml}</tbody>
-      </table>
-    </div>
-    ${footer}
+  footer.innerHTML = `
+    <p class="table-footer">Showing ${loaded.toLocaleString()} of ${total.toLocaleString()} rows</p>
+    ${page.next_page_token ? `<button class="copy-btn load-more-btn" id="${resultId}-more">Load more rows</button>` : ''}
   `;
+
+  const moreBtn = document.getElementById(`${resultId}-more`);
+  if (moreBtn) {
+    moreBtn.addEventListener('click', () => loadMoreRows(resultId, page.next_page_token, loaded, moreBtn));
+  }
+}
+
+async function loadMoreRows(resultId, pageToken, loaded, button) {
+  button.disabled = true;
+  button.textContent = 'Loading...';
+
+  try {
+    const response = await fetch(`${API_BASE}/ask`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        dataset_id: currentDataset.id,
+        question: '',
+        page_token: pageToken
+      })
+    });
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Query failed');
+    }
+
+    const page = await response.json();
+    const tbody = document.getElementById(`${resultId}-rows`);
+    const columns = resultColumns.get(resultId);
+    tbody.insertAdjacentHTML('beforeend', renderRows(page.data, columns));
+
+    updateResultsFooter(resultId, page, loaded + page.data.length);
+  } catch (error) {
+    button.disabled = false;
+    button.textContent = 'Load more rows';
+    showError('Loading more rows failed: ' + error.message);
+  }
 }
 
 function highlightSQL(sql) {
@@ -645,7 +722,7 @@ window.deleteQuery = function (index) {
   saveToLocalStorage();
   updateQueryList();
 };
-function renderAutoChart(data) {
+function renderAutoChart(data, downsampled = null) {
   if (!data || data.length === 0) return;
 
   // find numeric + label columns
@@ -661,9 +738,14 @@ function renderAutoChart(data) {
 
   const canvasId = "chart-" + Date.now();
 
+  const chartNote = downsampled
+    ? `<p class="table-footer">Chart downsampled on the server (${downsampled})</p>`
+    : '';
+
   const chartHtml = `
     <div style="margin-top:20px">
       <canvas id="${canvasId}" height="120"></canvas>
+      ${chartNote}
     </div>
   `;
 
@@ -0,0 +1,100 @@
+"""
+Micro-batching worker for model calls.
+
+Concurrent requests each submit a small list of inputs (one query to
+embed, or the (question, doc) pairs to rerank). A background thread
+waits up to `max_wait_ms` or until `max_batch` inputs are queued, runs
+one batched model call, and splits the outputs back into the callers'
+futures.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+
+    def __init__(self, fn, max_batch: int = 32, max_wait_ms: float = 2.0, name: str = "batcher"):
+        """
+        fn: list of inputs -> list (or array) of outputs, same length
+        """
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._stats = {"requests": 0, "batches": 0, "items": 0}
+        self._lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items: list) -> Future:
+        """Queue inputs; the future resolves to their outputs, in order."""
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        self._queue.put((list(items), future))
+        return future
+
+    def __call__(self, items: list) -> list:
+        return self.submit(items).result()
+
+    # -------------------------------------------------------
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch:
+            # past the deadline, still take whatever is already queued
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    request = self._queue.get(timeout=remaining)
+                else:
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            inputs = [x for items, _ in batch for x in items]
+
+            try:
+                outputs = self.fn(inputs)
+            except Exception as e:
+                logger.error(f"[{self.name}] batch of {len(inputs)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for items, future in batch:
+                future.set_result(list(outputs[start:start + len(items)]))
+                start += len(items)
+
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["items"] += len(inputs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queued"] = self._queue.qsize()
+        return stats
@@ -1,6 +1,67 @@
+import logging
+import math
+import os
+
 import faiss
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+# search-time knobs (recall vs latency) for the approximate index types
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", "16"))
+ANN_EF_SEARCH = int(os.environ.get("ANN_EF_SEARCH", "64"))
+ANN_HNSW_M = int(os.environ.get("ANN_HNSW_M", "32"))
+ANN_EF_CONSTRUCTION = int(os.environ.get("ANN_EF_CONSTRUCTION", "80"))
+
+INDEX_KINDS = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+
+def choose_index_kind(n: int) -> str:
+    """
+    Pick an index type by corpus size.
+
+    Examples:
+      10 schema docs    -> "flat"     (exact, nothing to train)
+      200k values       -> "hnsw"     (no training, best recall/latency)
+      2M values         -> "ivf_flat"
+      20M values        -> "ivf_pq"   (compressed codes to fit in RAM)
+    """
+    if n < 50_000:
+        return "flat"
+    if n < 1_000_000:
+        return "hnsw"
+    if n < 10_000_000:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def _nlist(n: int) -> int:
+    """IVF cell count: ~4*sqrt(n), at least 1 and no more than n / 39."""
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def _pq_m(dim: int) -> int:
+    """PQ sub-quantizers: one byte per 4 dims when it divides, else the closest divisor."""
+    target = max(1, dim // 4)
+    for m in range(target, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def index_factory_string(kind: str, dim: int, n: int, fp16: bool = False) -> str:
+    """faiss.index_factory description for an index kind."""
+    codec = "SQfp16" if fp16 else "Flat"
+    if kind == "flat":
+        return codec
+    if kind == "ivf_flat":
+        return f"IVF{_nlist(n)},{codec}"
+    if kind == "hnsw":
+        return f"HNSW{ANN_HNSW_M},{codec}"
+    if kind == "ivf_pq":
+        return f"IVF{_nlist(n)},PQ{_pq_m(dim)}"
+    raise ValueError(f"Unknown index kind: {kind}")
+
 
 class VectorIndex:
     """
@@ -10,16 +71,101 @@ class VectorIndex:
     - store embeddings
     - search nearest neighbors
     - return matching texts
+
+    kind selects exact ("flat") or approximate search ("ivf_flat",
+    "hnsw", "ivf_pq"); fp16 stores vectors as float16 (flat / ivf_flat /
+    hnsw). Index types that need training are trained on the first add().
     """
 
-    def __init__(self, dim: int):
+    def __init__(
+        self,
+        dim: int,
+        kind: str = "flat",
+        expected_size: int | None = None,
+        fp16: bool = False,
+        nprobe: int = ANN_NPROBE,
+        ef_search: int = ANN_EF_SEARCH,
+    ):
+        if kind == "auto":
+            kind = choose_index_kind(expected_size or 0)
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {kind}")
+
+        self.dim = dim
+        self.kind = kind
+        self.fp16 = fp16
+        self.expected_size = expected_size
+
         # We use Inner Product (dot product)
         # because embeddings are normalized (cosine similarity)
-        self.index = faiss.IndexFlatIP(dim)
+        if kind == "flat" and not fp16:
+            self.index = faiss.IndexFlatIP(dim)
+        elif kind in ("ivf_flat", "ivf_pq"):
+            # cell count depends on the corpus, so wait for the training data
+            self.index = None
+        else:
+            self.index = faiss.index_factory(
+                dim, index_factory_string(kind, dim, expected_size or 0, fp16),
+                faiss.METRIC_INNER_PRODUCT,
+            )
+            if kind == "hnsw":
+                self.index.hnsw.efConstruction = ANN_EF_CONSTRUCTION
+
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self._apply_search_params()
 
         # store original texts alongside vectors
         self.texts = []
 
+    @classmethod
+    def build(cls, embeddings: np.ndarray, texts: list[str], kind: str = "auto", **kwargs):
+        """Create, train and fill an index, choosing its kind from the corpus size."""
+        index = cls(embeddings.shape[1], kind=kind, expected_size=len(embeddings), **kwargs)
+        index.add(embeddings, texts)
+        return index
+
+    # -------------------------------------------------------
+
+    def _apply_search_params(self):
+        if self.index is None:
+            return
+        if self.kind in ("ivf_flat", "ivf_pq"):
+            faiss.extract_index_ivf(self.index).nprobe = self.nprobe
+        elif self.kind == "hnsw":
+            self.index.hnsw.efSearch = self.ef_search
+
+    def set_search_params(self, nprobe: int | None = None, ef_search: int | None = None):
+        """Trade recall for latency at query time (IVF: nprobe, HNSW: efSearch)."""
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        self._apply_search_params()
+
+    def _train(self, embeddings: np.ndarray):
+        n = max(len(embeddings), self.expected_size or 0)
+        if self.kind == "ivf_pq" and len(embeddings) < 10_000:
+            # PQ codebooks need thousands of training points
+            logger.warning(f"Too few vectors ({len(embeddings)}) to train PQ; using ivf_flat")
+            self.kind = "ivf_flat"
+        if self.index is None:
+            self.index = faiss.index_factory(
+                self.dim, index_factory_string(self.kind, self.dim, n, self.fp16),
+                faiss.METRIC_INNER_PRODUCT,
+            )
+            self._apply_search_params()
+
+        if not self.index.is_trained:
+            # k-means wants ~39-256 points per centroid; more only costs time
+            ivf = faiss.extract_index_ivf(self.index)
+            sample_size = min(len(embeddings), ivf.nlist * 256)
+            if sample_size < len(embeddings):
+                rng = np.random.default_rng(42)
+                embeddings = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+            logger.info(f"Training {self.kind} index on {len(embeddings)} vectors")
+            self.index.train(embeddings)
+
     def add(self, embeddings: np.ndarray, texts: list[str]):
         """
         Add embeddings + corresponding texts to index
@@ -28,9 +174,19 @@ class VectorIndex:
         texts: list[str]
         """
 
-        self.index.add(embeddings.astype("float32"))
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if self.index is None or not self.index.is_trained:
+            self._train(embeddings)
+
+        self.index.add(embeddings)
         self.texts.extend(texts)
 
+    def nbytes(self) -> int:
+        """Serialized size of the FAISS index (vectors + structure)."""
+        if self.index is None:
+            return 0
+        return int(faiss.serialize_index(self.index).nbytes)
+
     def search(self, query_embedding: np.ndarray, k: int = 3):
         """
         Search top-k similar texts
@@ -39,7 +195,21 @@ class VectorIndex:
         returns: list[str]
         """
 
+        return [text for text, _ in self.search_with_scores(query_embedding, k)]
+
+    def search_with_scores(self, query_embedding: np.ndarray, k: int = 3):
+        """
+        Like search(), but returns (text, score) pairs and skips
+        empty slots when the index holds fewer than k vectors.
+        """
+
+        if self.index is None:
+            return []
+
         scores, indices = self.index.search(query_embedding.astype("float32"), k)
 
-        results = [self.texts[i] for i in indices[0]]
-        return results
+        return [
+            (self.texts[i], float(s))
+            for s, i in zip(scores[0], indices[0])
+            if i >= 0
+        ]
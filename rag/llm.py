@@ -1,43 +1,82 @@
-import os
 import re
 import logging
-from groq import Groq
+from contextlib import aclosing
+from app.core.metrics import record_tokens, span
+from .llm_backends import LLMClient, client_from_env
 
 logger = logging.getLogger(__name__)
 
+# first SQL statement ending with ; (CTEs start with WITH)
+_STATEMENT_RE = re.compile(r"((?:WITH|SELECT)\b[\s\S]*?;)", re.IGNORECASE)
+
+
+def clean_sql(text: str) -> str:
+    """First complete SQL statement in LLM output (or the whole text, stripped)."""
+    # remove markdown fences
+    text = text.replace("```sql", "").replace("```", "")
+
+    # find first SQL statement ending with ;
+    match = _STATEMENT_RE.search(text)
+
+    if match:
+        return match.group(1).strip()
+
+    return text.strip()
+
 
 class LocalLLM:
     """
-    LLM wrapper using Groq API for fast cloud inference.
+    LLM wrapper (Groq by default) for fast cloud inference.
     Sends a prompt and returns generated SQL.
+
+    Provider, model, hedging, retries and rate limits come from the
+    environment (see rag/llm_backends.py).
     """
 
-    def __init__(self, model_name: str = "llama-3.3-70b-versatile"):
-        self.model = model_name
-        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    def __init__(self, model_name: str | None = None, client: LLMClient | None = None):
+        self.client = client or client_from_env(model_name)
+        self.model = self.client.model
 
-        logger.info(f"[LLM] Using Groq model: {self.model}")
+        logger.info(f"[LLM] Using {self.client.primary.name} model: {self.model}")
 
     def _clean_sql(self, text: str) -> str:
-        # remove markdown fences
-        text = text.replace("```sql", "").replace("```", "")
+        return clean_sql(text)
 
-        # find first SQL statement ending with ;
-        match = re.search(r"(SELECT[\s\S]*?;)", text, re.IGNORECASE)
+    def generate(self, prompt: str, max_tokens: int = 256) -> str:
+        with span("llm"):
+            generated, usage = self.client.complete(prompt, max_tokens=max_tokens)
+        record_tokens(usage)
 
-        if match:
-            return match.group(1).strip()
+        return self._clean_sql(generated.strip())
 
-        return text.strip()
+    async def agenerate(self, prompt: str, max_tokens: int = 256) -> str:
+        """
+        Async variant of generate() for use inside the event loop.
+        """
+        with span("llm"):
+            generated, usage = await self.client.acomplete(prompt, max_tokens=max_tokens)
+        record_tokens(usage)
 
-    def generate(self, prompt: str, max_tokens: int = 256) -> str:
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.0,
-            max_tokens=max_tokens,
-        )
+        return self._clean_sql(generated.strip())
+
+    async def astream(self, prompt: str, max_tokens: int = 256):
+        """
+        Stream the completion as text deltas.
+
+        Stops (and closes the connection) as soon as the first complete
+        SQL statement has arrived, so trailing explanations are never
+        generated. Run the joined deltas through clean_sql().
+        """
+        with span("llm"):
+            text = ""
+            async with aclosing(self.client.astream(prompt, max_tokens=max_tokens)) as stream:
+                async for delta in stream:
+                    text += delta
+                    yield delta
 
-        generated = response.choices[0].message.content.strip()
+                    if _STATEMENT_RE.search(text.replace("```", "")):
+                        logger.debug("[LLM] Complete statement streamed; stopping early")
+                        break
 
-        return self._clean_sql(generated)
+    def stats(self) -> dict:
+        return self.client.stats()
@@ -0,0 +1,501 @@
+"""
+Pluggable LLM backends used by LocalLLM.
+
+- GroqBackend (Groq SDK) and OpenAICompatibleBackend (any
+  /v1/chat/completions server: OpenAI, vLLM, Ollama, the local
+  stand-in in rag/llm_standin.py), both on pooled keep-alive httpx
+  clients with a request timeout
+- LLMClient adds, per backend:
+  - token-bucket rate limiting (requests/min and tokens/min)
+  - retries with jittered exponential backoff on 429 / 5xx / timeouts,
+    honouring Retry-After
+  - latency stats against an SLO
+  and optionally hedges async calls: if the primary has not answered
+  after LLM_HEDGE_AFTER_MS, the same prompt goes to a second backend and
+  the first answer wins
+
+Configuration (environment):
+    LLM_PROVIDER=groq|openai   LLM_MODEL   LLM_BASE_URL   LLM_API_KEY
+    LLM_HEDGE_PROVIDER / LLM_HEDGE_MODEL / LLM_HEDGE_BASE_URL / LLM_HEDGE_API_KEY
+    LLM_HEDGE_AFTER_MS (0 = no hedging)
+    LLM_RPM / LLM_TPM, LLM_HEDGE_RPM / LLM_HEDGE_TPM (0 = unlimited)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from types import SimpleNamespace
+
+import groq
+import httpx
+
+from app.core.metrics import LLM_REQUESTS, LLM_SECONDS, record_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.25"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "8"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+LLM_HEDGE_AFTER_MS = float(os.environ.get("LLM_HEDGE_AFTER_MS", "0"))
+LLM_SLO_MS = float(os.environ.get("LLM_SLO_MS", "2000"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """A failed completion. status is None for connection errors and timeouts."""
+
+    def __init__(self, message: str, status: int | None = None, retry_after: float | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in RETRYABLE_STATUS
+
+
+def _retry_after(headers) -> float | None:
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=60,
+    )
+
+
+# ======================================
+# Rate limiting
+# ======================================
+class TokenBucket:
+    """
+    Refills at `rate` per second up to `capacity`. Callers reserve
+    tokens (the balance may go negative) and sleep until their share has
+    refilled, so waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float = 1) -> float:
+        """Take n tokens; returns how long to wait before using them."""
+        n = min(n, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one backend."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        # bursts of up to 10 seconds' worth
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm / 6)) if rpm else None
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm / 6)) if tpm else None
+
+    def _delay(self, tokens: int) -> float:
+        delay = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def acquire(self, tokens: int) -> float:
+        delay = self._delay(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def aacquire(self, tokens: int) -> float:
+        delay = self._delay(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+# ======================================
+# Backends
+# ======================================
+class LLMBackend(ABC):
+    """
+    One model at one provider.
+
+    complete / acomplete return (text, usage); astream yields text
+    deltas. All raise LLMError.
+    """
+
+    def __init__(self, name: str, model: str, rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self.model = model
+        self.limiter = RateLimiter(rpm, tpm)
+
+    def _body(self, prompt: str, max_tokens: int, stream: bool = False) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.0,
+            "max_tokens": max_tokens,
+            "stream": stream,
+        }
+
+    @abstractmethod
+    def complete(self, prompt: str, max_tokens: int):
+        """(text, usage) for the prompt."""
+
+    @abstractmethod
+    async def acomplete(self, prompt: str, max_tokens: int):
+        """Async complete()."""
+
+    @abstractmethod
+    def astream(self, prompt: str, max_tokens: int):
+        """Async iterator of text deltas."""
+
+
+class GroqBackend(LLMBackend):
+    """Groq SDK clients on pooled httpx transports; the SDK's own retries are off."""
+
+    def __init__(self, model: str = DEFAULT_MODEL, api_key: str | None = None, name: str = "groq", **kwargs):
+        super().__init__(name, model, **kwargs)
+        api_key = api_key or os.environ.get("GROQ_API_KEY")
+        self.client = groq.Groq(
+            api_key=api_key, timeout=LLM_TIMEOUT, max_retries=0,
+            http_client=httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT),
+        )
+        self.async_client = groq.AsyncGroq(
+            api_key=api_key, timeout=LLM_TIMEOUT, max_retries=0,
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT),
+        )
+
+    @staticmethod
+    def _error(e: Exception) -> LLMError:
+        if isinstance(e, groq.APIStatusError):
+            return LLMError(str(e), e.status_code, _retry_after(e.response.headers))
+        return LLMError(str(e))
+
+    def complete(self, prompt: str, max_tokens: int):
+        try:
+            response = self.client.chat.completions.create(**self._body(prompt, max_tokens))
+        except Exception as e:
+            raise self._error(e) from e
+        return response.choices[0].message.content or "", getattr(response, "usage", None)
+
+    async def acomplete(self, prompt: str, max_tokens: int):
+        try:
+            response = await self.async_client.chat.completions.create(**self._body(prompt, max_tokens))
+        except Exception as e:
+            raise self._error(e) from e
+        return response.choices[0].message.content or "", getattr(response, "usage", None)
+
+    async def astream(self, prompt: str, max_tokens: int):
+        try:
+            stream = await self.async_client.chat.completions.create(**self._body(prompt, max_tokens, stream=True))
+        except Exception as e:
+            raise self._error(e) from e
+        try:
+            async for chunk in stream:
+                record_tokens(getattr(getattr(chunk, "x_groq", None), "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Plain httpx against an OpenAI-style /chat/completions endpoint."""
+
+    def __init__(self, base_url: str, model: str, api_key: str | None = None, name: str = "openai", **kwargs):
+        super().__init__(name, model, **kwargs)
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT, headers=headers)
+        self.async_client = httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT, headers=headers)
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code >= 400:
+            raise LLMError(
+                f"HTTP {response.status_code}: {response.text[:200]}",
+                response.status_code, _retry_after(response.headers),
+            )
+
+    @staticmethod
+    def _parse(data: dict):
+        usage = data.get("usage")
+        return data["choices"][0]["message"]["content"] or "", SimpleNamespace(**usage) if usage else None
+
+    def complete(self, prompt: str, max_tokens: int):
+        try:
+            response = self.client.post(self.url, json=self._body(prompt, max_tokens))
+        except httpx.HTTPError as e:
+            raise LLMError(str(e) or type(e).__name__) from e
+        self._check(response)
+        return self._parse(response.json())
+
+    async def acomplete(self, prompt: str, max_tokens: int):
+        try:
+            response = await self.async_client.post(self.url, json=self._body(prompt, max_tokens))
+        except httpx.HTTPError as e:
+            raise LLMError(str(e) or type(e).__name__) from e
+        self._check(response)
+        return self._parse(response.json())
+
+    async def astream(self, prompt: str, max_tokens: int):
+        try:
+            async with self.async_client.stream("POST", self.url, json=self._body(prompt, max_tokens, stream=True)) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._check(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    data = json.loads(payload)
+                    if data.get("usage"):
+                        record_tokens(SimpleNamespace(**data["usage"]))
+                    choices = data.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except httpx.HTTPError as e:
+            raise LLMError(str(e) or type(e).__name__) from e
+
+
+# ======================================
+# Client: retries, hedging, stats
+# ======================================
+class BackendStats:
+
+    def __init__(self, slo_ms: float = LLM_SLO_MS, window: int = 1000):
+        self.slo_ms = slo_ms
+        self.counts = {
+            "requests": 0, "errors": 0, "retries": 0, "rate_limited": 0,
+            "hedges": 0, "hedges_won": 0, "throttled_seconds": 0.0,
+        }
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, key: str, n: float = 1):
+        with self._lock:
+            self.counts[key] += n
+
+    def observe(self, ms: float):
+        with self._lock:
+            self._latencies.append(ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self.counts)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1) if latencies else None
+
+        stats.update({
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "slo_ms": self.slo_ms,
+            "within_slo": round(sum(1 for x in latencies if x <= self.slo_ms) / len(latencies), 4) if latencies else None,
+        })
+        return stats
+
+
+class LLMClient:
+
+    def __init__(
+        self,
+        primary: LLMBackend,
+        hedge: LLMBackend | None = None,
+        hedge_after_ms: float = LLM_HEDGE_AFTER_MS,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.primary = primary
+        self.hedge = hedge if hedge_after_ms else None
+        self.hedge_after = hedge_after_ms / 1000
+        self.max_retries = max_retries
+        self._stats = {b.name: BackendStats() for b in (primary, hedge) if b is not None}
+
+    @property
+    def model(self) -> str:
+        return self.primary.model
+
+    # -------------------------------------------------------
+
+    def _backoff(self, attempt: int, error: LLMError) -> float:
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        return max(delay, error.retry_after or 0)
+
+    def _failed(self, backend: LLMBackend, error: LLMError, attempt: int) -> bool:
+        """Count a failed attempt; True if it should be retried."""
+        stats = self._stats[backend.name]
+        stats.add("errors")
+        if error.status == 429:
+            stats.add("rate_limited")
+        retry = error.retryable and attempt < self.max_retries
+        LLM_REQUESTS.inc(backend=backend.name, outcome="retry" if retry else "error")
+        if retry:
+            stats.add("retries")
+            logger.warning(f"[LLM] {backend.name} attempt {attempt + 1} failed ({error}); retrying")
+        return retry
+
+    def _succeeded(self, backend: LLMBackend, started: float):
+        seconds = time.perf_counter() - started
+        self._stats[backend.name].observe(seconds * 1000)
+        LLM_SECONDS.observe(seconds, backend=backend.name)
+        LLM_REQUESTS.inc(backend=backend.name, outcome="ok")
+
+    @staticmethod
+    def _tokens(prompt: str, max_tokens: int) -> int:
+        return len(prompt) // 4 + max_tokens
+
+    def _call(self, backend: LLMBackend, prompt: str, max_tokens: int):
+        stats = self._stats[backend.name]
+        for attempt in range(self.max_retries + 1):
+            stats.add("throttled_seconds", backend.limiter.acquire(self._tokens(prompt, max_tokens)))
+            stats.add("requests")
+            started = time.perf_counter()
+            try:
+                result = backend.complete(prompt, max_tokens)
+            except LLMError as e:
+                if not self._failed(backend, e, attempt):
+                    raise
+                time.sleep(self._backoff(attempt, e))
+                continue
+            self._succeeded(backend, started)
+            return result
+
+    async def _acall(self, backend: LLMBackend, prompt: str, max_tokens: int):
+        stats = self._stats[backend.name]
+        for attempt in range(self.max_retries + 1):
+            stats.add("throttled_seconds", await backend.limiter.aacquire(self._tokens(prompt, max_tokens)))
+            stats.add("requests")
+            started = time.perf_counter()
+            try:
+                result = await backend.acomplete(prompt, max_tokens)
+            except LLMError as e:
+                if not self._failed(backend, e, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            self._succeeded(backend, started)
+            return result
+
+    # -------------------------------------------------------
+
+    def complete(self, prompt: str, max_tokens: int = 256):
+        """(text, usage) from the primary backend, with retries (no hedging)."""
+        return self._call(self.primary, prompt, max_tokens)
+
+    async def acomplete(self, prompt: str, max_tokens: int = 256):
+        """(text, usage); hedged to the second backend if the primary is slow."""
+        first = asyncio.ensure_future(self._acall(self.primary, prompt, max_tokens))
+        if self.hedge is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        logger.info(f"[LLM] {self.primary.name} slower than {self.hedge_after * 1000:.0f} ms; hedging to {self.hedge.name}")
+        self._stats[self.hedge.name].add("hedges")
+        second = asyncio.ensure_future(self._acall(self.hedge, prompt, max_tokens))
+
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if task is second:
+                        self._stats[self.hedge.name].add("hedges_won")
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def astream(self, prompt: str, max_tokens: int = 256):
+        """Text deltas from the primary backend; retried only until the first delta arrives."""
+        backend, stats = self.primary, self._stats[self.primary.name]
+        for attempt in range(self.max_retries + 1):
+            stats.add("throttled_seconds", await backend.limiter.aacquire(self._tokens(prompt, max_tokens)))
+            stats.add("requests")
+            started, streamed = time.perf_counter(), False
+            stream = backend.astream(prompt, max_tokens)
+            try:
+                async for delta in stream:
+                    if not streamed:
+                        # latency stats for streams are time to first token
+                        self._succeeded(backend, started)
+                        streamed = True
+                    yield delta
+                return
+            except LLMError as e:
+                if streamed or not self._failed(backend, e, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+            finally:
+                await stream.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "model": self.primary.model,
+            "hedge_after_ms": self.hedge_after * 1000 if self.hedge else None,
+            "backends": {name: s.snapshot() for name, s in self._stats.items()},
+        }
+
+
+# ======================================
+# Configuration
+# ======================================
+def make_backend(prefix: str = "LLM", name: str | None = None) -> LLMBackend | None:
+    """Backend from {prefix}_PROVIDER / _MODEL / _BASE_URL / _API_KEY / _RPM / _TPM."""
+    env = lambda key, default=None: os.environ.get(f"{prefix}_{key}", default)  # noqa: E731
+
+    provider = env("PROVIDER", "groq" if prefix == "LLM" else None)
+    if provider is None:
+        return None
+
+    limits = {"rpm": float(env("RPM", "0")), "tpm": float(env("TPM", "0"))}
+    model = env("MODEL", DEFAULT_MODEL)
+    if provider == "groq":
+        return GroqBackend(model, api_key=env("API_KEY"), name=name or "groq", **limits)
+    if provider == "openai":
+        return OpenAICompatibleBackend(
+            env("BASE_URL", "https://api.openai.com/v1"), model,
+            api_key=env("API_KEY", os.environ.get("OPENAI_API_KEY")),
+            name=name or "openai", **limits,
+        )
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def client_from_env(model: str | None = None) -> LLMClient:
+    primary = make_backend("LLM")
+    if model:
+        primary.model = model
+    hedge = make_backend("LLM_HEDGE", name="hedge")
+    return LLMClient(primary, hedge)
@@ -0,0 +1,121 @@
+"""
+OpenAI-compatible stand-in LLM server for offline tests and benchmarks.
+
+Answers POST /v1/chat/completions (plain and streamed) with a
+deterministic query against the first table named in the prompt, with
+optional latency and injected failures:
+
+    python -m rag.llm_standin --port 8002 --latency-ms 300 --fail-every 5
+
+--ms-per-1k-tokens adds latency proportional to the prompt size, like
+the prefill of a real model.
+
+then point DataPilot at it:
+
+    LLM_PROVIDER=openai LLM_BASE_URL=http://127.0.0.1:8002/v1 LLM_MODEL=standin
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_TABLE_RE = re.compile(r"Table (\w+)")
+
+
+def answer_for(prompt: str) -> str:
+    """SELECT * FROM <first table in the prompt> LIMIT 5;"""
+    match = _TABLE_RE.search(prompt)
+    table = match.group(1) if match else "data"
+    return f"SELECT * FROM {table} LIMIT 5;"
+
+
+def create_app(
+    latency_ms: float = 0, fail_every: int = 0, answer=answer_for, ms_per_1k_tokens: float = 0
+) -> FastAPI:
+    """
+    latency_ms: delay before answering (streams spread it over the chunks)
+    ms_per_1k_tokens: extra delay per 1000 prompt tokens, before the first chunk
+    fail_every: every n-th request gets 429 with Retry-After: 0 (0 = never)
+    answer: prompt -> completion text
+    """
+    app = FastAPI(title="DataPilot LLM stand-in")
+    state = {"requests": 0}
+
+    @app.get("/v1/models")
+    def models():
+        return {"object": "list", "data": [{"id": "standin", "object": "model"}]}
+
+    @app.get("/stats")
+    def stats():
+        return state
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        state["requests"] += 1
+        if fail_every and state["requests"] % fail_every == 0:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                status_code=429, headers={"Retry-After": "0"},
+            )
+
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        text = answer(prompt)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        model = body.get("model", "standin")
+        prefill = usage["prompt_tokens"] * ms_per_1k_tokens / 1_000_000
+
+        if not body.get("stream"):
+            await asyncio.sleep(prefill + latency_ms / 1000)
+            return {
+                "id": f"standin-{state['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        words = re.findall(r"\S+\s*", text)
+
+        async def events():
+            await asyncio.sleep(prefill)
+            for word in words:
+                await asyncio.sleep(latency_ms / 1000 / max(1, len(words)))
+                chunk = {"object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.fail_every, ms_per_1k_tokens=args.ms_per_1k_tokens)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
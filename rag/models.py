@@ -0,0 +1,112 @@
+"""
+Process-wide registry for retrieval models.
+
+Loading bge-base or the cross-encoder takes seconds and hundreds of MB,
+so every Retriever (one per dataset) and the semantic SQL cache share
+a single instance of each, loaded on first use.
+
+embed() and rerank() go through micro-batching workers so concurrent
+questions share one forward pass (see rag/batcher.py).
+"""
+
+import logging
+import os
+import threading
+
+import numpy as np
+
+from .batcher import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "128"))
+BATCH_WAIT_MS = float(os.environ.get("MODEL_BATCH_WAIT_MS", "2"))
+
+_embedder = None
+_reranker = None
+_embed_batcher = None
+_rerank_batcher = None
+_lock = threading.Lock()
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                from .embed import Embedder
+                logger.info("Loading shared embedder...")
+                _embedder = Embedder()
+    return _embedder
+
+
+def get_reranker():
+    global _reranker
+    if _reranker is None:
+        with _lock:
+            if _reranker is None:
+                from .reranker import Reranker
+                logger.info("Loading shared reranker...")
+                _reranker = Reranker()
+    return _reranker
+
+
+def loaded() -> dict:
+    """Which shared models are in memory."""
+    return {"embedder": _embedder is not None, "reranker": _reranker is not None}
+
+
+# ======================================
+# Batched calls
+# ======================================
+def _embed_batcher_instance() -> MicroBatcher:
+    global _embed_batcher
+    if _embed_batcher is None:
+        with _lock:
+            if _embed_batcher is None:
+                _embed_batcher = MicroBatcher(
+                    lambda texts: get_embedder().encode(texts),
+                    max_batch=EMBED_BATCH_SIZE,
+                    max_wait_ms=BATCH_WAIT_MS,
+                    name="embed-batcher",
+                )
+    return _embed_batcher
+
+
+def _rerank_batcher_instance() -> MicroBatcher:
+    global _rerank_batcher
+    if _rerank_batcher is None:
+        with _lock:
+            if _rerank_batcher is None:
+                _rerank_batcher = MicroBatcher(
+                    lambda pairs: get_reranker().score(pairs),
+                    max_batch=RERANK_BATCH_SIZE,
+                    max_wait_ms=BATCH_WAIT_MS,
+                    name="rerank-batcher",
+                )
+    return _rerank_batcher
+
+
+def embed(texts, prefix=None) -> np.ndarray:
+    """Like Embedder.encode(), batched with concurrent callers."""
+    if isinstance(texts, str):
+        texts = [texts]
+    if prefix:
+        texts = [f"{prefix}: {t}" for t in texts]
+    rows = _embed_batcher_instance().submit(texts).result()
+    return np.asarray(rows, dtype="float32")
+
+
+def rerank(question: str, docs: list[str], top_k: int = 3):
+    """Like Reranker.rerank(), batched with concurrent callers."""
+    scores = _rerank_batcher_instance().submit([(question, d) for d in docs]).result()
+    ranked = sorted(zip(docs, scores), key=lambda x: x[1], reverse=True)
+    return ranked[:top_k]
+
+
+def batch_stats() -> dict:
+    return {
+        "embed": _embed_batcher.stats() if _embed_batcher else None,
+        "rerank": _rerank_batcher.stats() if _rerank_batcher else None,
+    }
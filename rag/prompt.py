@@ -1,4 +1,10 @@
-def build_sql_prompt(question: str, schema_docs: list[str], sample_data: list[dict] | None = None) -> str:
+def build_sql_prompt(
+    question: str,
+    schema_docs: list[str],
+    sample_data: list[dict] | None = None,
+    value_hints: list[str] | None = None,
+    examples: list[tuple[str, str]] | None = None,
+) -> str:
     """
     Build a strong prompt for SQL generation.
 
@@ -6,6 +12,10 @@ def build_sql_prompt(question: str, schema_docs: list[str], sample_data: list[di
         question: natural language question
         schema_docs: retrieved relevant schema text
         sample_data: optional sample rows from the table
+        value_hints: optional per-column value summaries from the
+            dataset profile (e.g. "region: one of 'East', 'West'")
+        examples: optional (question, SQL) pairs that worked before on
+            this dataset, most similar first
 
     Returns:
         prompt string for the LLM
@@ -24,12 +34,30 @@ def build_sql_prompt(question: str, schema_docs: list[str], sample_data: list[di
         )
         sample_section = f"""
 ====================
-SAMPLE DATA (first 3 rows):
+SAMPLE DATA ({len(sample_data)} rows):
 ====================
 {header}
 {rows}
 """
 
+    # build column values section
+    values_section = ""
+    if value_hints:
+        values_section = """
+====================
+COLUMN VALUES:
+====================
+""" + "\n".join(value_hints) + "\n"
+
+    # build few-shot examples section
+    examples_section = ""
+    if examples:
+        examples_section = """
+====================
+EXAMPLES:
+====================
+""" + "\n\n".join(f"Q: {q}\nSQL: {sql.strip()}" for q, sql in examples) + "\n"
+
     prompt = f"""
 You are an expert SQL analyst.
 
@@ -44,7 +72,7 @@ Follow these rules strictly:
 - NEVER invent columns (like id)
 - NEVER assume fields
 - Use WHERE clauses to filter for specific values when the question asks about a specific item
-- Match string values exactly as shown in the sample data
+- Match string values exactly as shown in the sample data or column values
 - If unsure, use: SELECT * FROM table LIMIT 5
 - For preview queries, NEVER use ORDER BY
 - Always prefer LIMIT for first rows
@@ -53,7 +81,7 @@ Follow these rules strictly:
 DATABASE SCHEMA:
 ====================
 {schema_text}
-{sample_section}
+{sample_section}{values_section}{examples_section}
 ====================
 QUESTION:
 ====================
@@ -65,3 +93,64 @@ SQL:
 """
 
     return prompt.strip()
+
+
+def build_repair_prompt(
+    question: str,
+    schema_docs: list[str],
+    sql: str,
+    error: str,
+) -> str:
+    """
+    Prompt asking the LLM to fix SQL that failed validation.
+
+    Inputs:
+        question: the original natural language question
+        schema_docs: schema text for the table
+        sql: the SQL that failed
+        error: the parser / binder error message
+
+    Returns:
+        prompt string for the LLM
+    """
+
+    schema_text = "\n".join(schema_docs)
+
+    prompt = f"""
+You are an expert SQL analyst.
+
+The SQL below was written for the question but fails with an error.
+Fix it.
+
+Follow these rules strictly:
+- Return ONLY the corrected SQL
+- Return EXACTLY one SELECT statement
+- DO NOT explain anything
+- Only use the table and columns listed in the schema
+
+====================
+DATABASE SCHEMA:
+====================
+{schema_text}
+
+====================
+QUESTION:
+====================
+{question}
+
+====================
+FAILED SQL:
+====================
+{sql}
+
+====================
+ERROR:
+====================
+{error}
+
+====================
+SQL:
+====================
+"""
+
+    return prompt.strip()
@@ -0,0 +1,225 @@
+"""
+Token-budgeted prompt assembly for wide tables.
+
+build_schema_docs emits one line per column and the sample rows carry
+every column, so a 500-column export turns into a prompt of many
+thousands of tokens. plan_prompt builds the full prompt and, when it is
+over PROMPT_TOKEN_BUDGET, keeps only the columns most relevant to the
+question: in the table line, the column lines, the sample rows and the
+value hints.
+
+Relevance is lexical overlap between the question and the column name,
+or the Retriever's vector similarity when local RAG is on. Columns whose
+values are mentioned in the question always rank first.
+"""
+
+import logging
+import math
+import os
+import re
+from typing import Callable
+
+from app.core.metrics import PROMPT_COLUMNS_PRUNED, PROMPT_TOKENS
+from .prompt import build_sql_prompt
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "3000"))
+PROMPT_MIN_COLUMNS = int(os.environ.get("PROMPT_MIN_COLUMNS", "8"))
+
+_TABLE_DOC_RE = re.compile(r"^Table (\S+)\((.*)\)$", re.DOTALL)
+_COLUMN_DOC_RE = re.compile(r"^Column '(.+)' in table '.+' has type .+$")
+_WORD_RE = re.compile(r"[a-z]+|[0-9]+")
+_MENTIONED = "(mentioned in the question)"
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "for", "from", "how", "in",
+    "is", "it", "me", "many", "much", "of", "on", "or", "per", "show",
+    "the", "to", "what", "which", "who", "with", "all", "each", "list",
+}
+
+_encoding = None
+
+
+# ======================================
+# Token counting
+# ======================================
+def count_tokens(text: str) -> int:
+    """
+    Prompt tokens: exact with tiktoken if it is installed, otherwise
+    the usual ~4 characters per token estimate.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+# ======================================
+# Column ranking
+# ======================================
+def _terms(text: str) -> set[str]:
+    words = _WORD_RE.findall(text.lower())
+    # crude singular: "regions" matches column "region"
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words} - _STOPWORDS
+
+
+def lexical_scores(question: str, columns: list[str]) -> dict[str, float]:
+    """
+    Word overlap between the question and each column name, split on
+    underscores and digits. Prefix matches ("rev" / "revenue") count half.
+    """
+    asked = {t for t in _terms(question) if len(t) > 1}
+    scores = {}
+    for col in columns:
+        score = 0.0
+        for term in _terms(col):
+            if term in asked:
+                score += 1
+            elif len(term) >= 3 and any(
+                len(q) >= 3 and (q.startswith(term) or term.startswith(q)) for q in asked
+            ):
+                score += 0.5
+        scores[col] = score
+    return scores
+
+
+def _hint_column(hint: str) -> str:
+    return hint.split(": ", 1)[0]
+
+
+def rank_columns(
+    question: str,
+    columns: list[str],
+    value_hints: list[str] | None = None,
+    scores: dict[str, float] | None = None,
+) -> list[str]:
+    """
+    Columns most relevant first. scores (e.g. vector similarity) replace
+    the lexical scores; ties keep schema order.
+    """
+    if scores is None:
+        scores = lexical_scores(question, columns)
+    mentioned = {_hint_column(h) for h in value_hints or [] if h.endswith(_MENTIONED)}
+    order = {c: i for i, c in enumerate(columns)}
+    return sorted(columns, key=lambda c: (c not in mentioned, -scores.get(c, 0.0), order[c]))
+
+
+# ======================================
+# Pruning
+# ======================================
+def schema_columns(docs: list[str]) -> list[str]:
+    """Column names found in the schema docs, in schema order."""
+    columns, seen = [], set()
+    for doc in docs:
+        table = _TABLE_DOC_RE.match(doc)
+        if table:
+            names = [c.strip() for c in table.group(2).split(",") if c.strip()]
+        else:
+            column = _COLUMN_DOC_RE.match(doc)
+            names = [column.group(1)] if column else []
+        for c in names:
+            if c not in seen:
+                seen.add(c)
+                columns.append(c)
+    return columns
+
+
+def prune_docs(docs: list[str], keep: set[str]) -> list[str]:
+    """Schema docs restricted to the kept columns."""
+    pruned = []
+    for doc in docs:
+        table = _TABLE_DOC_RE.match(doc)
+        if table:
+            cols = [c.strip() for c in table.group(2).split(",") if c.strip() in keep]
+            pruned.append(f"Table {table.group(1)}({', '.join(cols)})")
+            continue
+        column = _COLUMN_DOC_RE.match(doc)
+        if column is None or column.group(1) in keep:
+            pruned.append(doc)
+    return pruned
+
+
+def _prune_samples(sample_data: list[dict] | None, keep: set[str]) -> list[dict] | None:
+    if not sample_data:
+        return sample_data
+    return [{k: v for k, v in row.items() if k in keep} for row in sample_data]
+
+
+def _prune_hints(value_hints: list[str] | None, keep: set[str], columns: set[str]) -> list[str] | None:
+    if not value_hints:
+        return value_hints
+    return [h for h in value_hints if _hint_column(h) in keep or _hint_column(h) not in columns]
+
+
+def plan_prompt(
+    question: str,
+    docs: list[str],
+    sample_data: list[dict] | None = None,
+    value_hints: list[str] | None = None,
+    examples: list[tuple[str, str]] | None = None,
+    budget: int = PROMPT_TOKEN_BUDGET,
+    scorer: Callable[[], dict[str, float] | None] | None = None,
+) -> tuple[str, dict]:
+    """
+    The SQL prompt, trimmed to the token budget by dropping the least
+    relevant columns, and stats:
+
+        {"tokens_before", "tokens_after", "columns", "columns_kept"}
+
+    scorer is only called when pruning is needed. At least
+    PROMPT_MIN_COLUMNS columns are kept even if that is over budget.
+    """
+
+    def build(d, s, h):
+        return build_sql_prompt(question, d, sample_data=s, value_hints=h, examples=examples)
+
+    prompt = build(docs, sample_data, value_hints)
+    before = count_tokens(prompt)
+    columns = schema_columns(docs)
+    stats = {"tokens_before": before, "tokens_after": before,
+             "columns": len(columns), "columns_kept": len(columns)}
+    PROMPT_TOKENS.observe(before, stage="before")
+
+    if budget <= 0 or before <= budget or len(columns) <= PROMPT_MIN_COLUMNS:
+        PROMPT_TOKENS.observe(before, stage="after")
+        return prompt, stats
+
+    ranked = rank_columns(question, columns, value_hints, scorer() if scorer else None)
+    names = set(columns)
+
+    def pruned(n: int) -> tuple[str, int]:
+        keep = set(ranked[:n])
+        text = build(
+            prune_docs(docs, keep),
+            _prune_samples(sample_data, keep),
+            _prune_hints(value_hints, keep, names),
+        )
+        return text, count_tokens(text)
+
+    # largest column count that fits
+    lo, hi = PROMPT_MIN_COLUMNS, len(columns) - 1
+    best = pruned(lo)
+    kept = lo
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        candidate = pruned(mid)
+        if candidate[1] <= budget:
+            best, kept, lo = candidate, mid, mid
+        else:
+            hi = mid - 1
+
+    prompt, after = best
+    stats.update(tokens_after=after, columns_kept=kept)
+    PROMPT_TOKENS.observe(after, stage="after")
+    PROMPT_COLUMNS_PRUNED.observe(len(columns) - kept)
+    logger.info(
+        f"Prompt pruned to {kept}/{len(columns)} columns: {before} -> {after} tokens (budget {budget})"
+    )
+    return prompt, stats
@@ -13,6 +13,10 @@ class Reranker:
         # small + fast + strong ranking model
         self.model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
 
+    def score(self, pairs: list[tuple[str, str]]):
+        """Relevance scores for (question, doc) pairs in one forward pass."""
+        return self.model.predict(pairs, show_progress_bar=False)
+
     def rerank(self, question: str, docs: list[str], top_k: int = 3):
         """
         Rerank FAISS candidates by relevance to the question.
@@ -21,7 +25,7 @@ class Reranker:
 
         pairs = [(question, d) for d in docs]
 
-        scores = self.model.predict(pairs)
+        scores = self.score(pairs)
 
         ranked = sorted(zip(docs, scores),
                         key=lambda x: x[1],
@@ -11,32 +11,77 @@ class Retriever:
     Local mode: uses FAISS + cross-encoder for semantic retrieval.
     """
 
-    def __init__(self, schema_docs: list[str]):
+    def __init__(self, schema_docs: list[str], dataset_id: str | None = None):
         self.schema_docs = schema_docs
+        self.dataset_id = dataset_id
         self._use_local = os.environ.get("USE_LOCAL_RAG", "").lower() == "true"
 
         if self._use_local:
-            from .embed import Embedder
-            from .index import VectorIndex
-            from .reranker import Reranker
+            from .models import get_embedder, get_reranker
 
             print("[Retriever] Initializing local RAG...")
-            self.embedder = Embedder()
-            embeddings = self.embedder.encode(schema_docs, prefix="passage")
-            self.index = VectorIndex(embeddings.shape[1])
-            self.index.add(embeddings, schema_docs)
-            self.reranker = Reranker()
+            # shared across all retrievers
+            self.embedder = get_embedder()
+            self.reranker = get_reranker()
+
+            if dataset_id is not None:
+                # persistent index shared by all datasets; unchanged docs
+                # are neither re-embedded nor re-added
+                from .schema_index import get_schema_index
+                self.index = None
+                get_schema_index().ensure(dataset_id, schema_docs)
+            else:
+                from .index import VectorIndex
+                embeddings = self.embedder.encode(schema_docs, prefix="passage")
+                self.index = VectorIndex(embeddings.shape[1])
+                self.index.add(embeddings, schema_docs)
             print("[Retriever] Ready.")
         else:
             print("[Retriever] Using lightweight mode (all schema docs passed to LLM).")
 
+    def nbytes(self) -> int:
+        """Approximate memory held by this retriever (models excluded)."""
+        size = sum(len(d) for d in self.schema_docs)
+        if self._use_local and self.index is not None:
+            size += self.index.index.ntotal * self.index.index.d * 4
+        return size
+
+    def doc_scores(self, question: str) -> dict[str, float] | None:
+        """
+        Vector similarity of every schema doc to the question, in [0, 1]
+        (None in lightweight mode). Used to rank columns when a prompt
+        is over its token budget.
+        """
+        if not self._use_local:
+            return None
+
+        from .models import embed
+
+        query_vec = embed(question, prefix="query")
+        n = len(self.schema_docs)
+        if self.index is None:
+            from .schema_index import get_schema_index
+            # ids come back best first; rank stands in for the score
+            ranked = get_schema_index().search(query_vec, self.dataset_id, n)
+            return {doc: 1 - i / max(1, len(ranked)) for i, doc in enumerate(ranked)}
+        return dict(self.index.search_with_scores(query_vec, n))
+
     def retrieve(self, question: str, k: int = 10, final_k: int = 3):
         if not self._use_local:
             return self.schema_docs
 
-        query_vec = self.embedder.encode(question, prefix="query")
-        candidates = self.index.search(query_vec, k)
-        ranked = self.reranker.rerank(question, candidates, final_k)
+        from .models import embed, rerank
+
+        # batched with other in-flight questions
+        query_vec = embed(question, prefix="query")
+        if self.index is None:
+            from .schema_index import get_schema_index
+            candidates = get_schema_index().search(query_vec, self.dataset_id, k)
+        else:
+            candidates = self.index.search(query_vec, k)
+        if not candidates:
+            return self.schema_docs
+        ranked = rerank(question, candidates, final_k)
 
         MIN_SCORE = 0.2
         filtered = [doc for doc, score in ranked if score >= MIN_SCORE]
@@ -0,0 +1,236 @@
+"""
+Persistent schema-doc index shared by all datasets (local RAG mode).
+
+- one FAISS IndexIDMap(IndexFlatIP) for every dataset's schema docs,
+  written with faiss.write_index and memory-mapped on load, so startup
+  does not depend on how many datasets exist
+- doc text and owning dataset per vector id live in a small SQLite
+  sidecar; searches are filtered to one dataset with an IDSelector
+- add/remove per dataset, incrementally
+- embedding cache keyed by hash of the doc text: re-registering an
+  unchanged doc (restart, re-upload of the same file) skips encoding
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_INDEX_DIR = Path(os.environ.get(
+    "SCHEMA_INDEX_DIR",
+    Path(__file__).parent.parent / "data" / "schema_index",
+))
+
+
+def doc_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class SchemaIndex:
+
+    def __init__(self, directory: Path = SCHEMA_INDEX_DIR, embed=None):
+        """
+        embed: texts -> (N, dim) float32 array of normalized "passage"
+        embeddings; defaults to the shared embedder.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "schema.faiss"
+        self._embed = embed
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.directory / "schema.db", check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                dataset_id TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS docs_dataset ON docs(dataset_id);
+            CREATE TABLE IF NOT EXISTS embeddings (
+                hash TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            );
+        """)
+
+        self.index = None
+        if self.index_path.exists():
+            self.index = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP)
+            logger.info(f"Loaded schema index ({self.index.ntotal} vectors) from {self.index_path}")
+
+        docs = self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        if docs != (self.index.ntotal if self.index is not None else 0):
+            self._rebuild()
+
+    def _rebuild(self):
+        """Recreate the FAISS file from the sidecar (after a crash between writes)."""
+        rows = self._db.execute(
+            "SELECT d.id, e.vector FROM docs d JOIN embeddings e ON e.hash = d.hash ORDER BY d.id"
+        ).fetchall()
+        logger.warning(f"Schema index out of sync; rebuilding {len(rows)} vectors from cache")
+
+        self._db.execute("DELETE FROM docs WHERE hash NOT IN (SELECT hash FROM embeddings)")
+        self._db.commit()
+        if not rows:
+            self.index = None
+            if self.index_path.exists():
+                self.index_path.unlink()
+            return
+
+        vectors = np.vstack([np.frombuffer(v, dtype="float32") for _, v in rows])
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vectors.shape[1]))
+        self.index.add_with_ids(vectors, np.array([i for i, _ in rows], dtype="int64"))
+        self._save()
+
+    # -------------------------------------------------------
+    # embeddings
+    # -------------------------------------------------------
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        if self._embed is not None:
+            return self._embed(texts)
+        from .models import get_embedder
+        return get_embedder().encode(texts, prefix="passage")
+
+    def _embeddings(self, texts: list[str]) -> np.ndarray:
+        """Vectors for texts, encoding only those not cached yet."""
+        hashes = [doc_hash(t) for t in texts]
+
+        cached = {}
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = self._db.execute(
+                f"SELECT hash, vector FROM embeddings WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            cached.update((h, np.frombuffer(v, dtype="float32")) for h, v in rows)
+
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        if missing:
+            vectors = self._encode([texts[i] for i in missing])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                [(hashes[i], v.astype("float32").tobytes()) for i, v in zip(missing, vectors)],
+            )
+            for i, v in zip(missing, vectors):
+                cached[hashes[i]] = v.astype("float32")
+
+        logger.info(f"Schema embeddings: {len(texts) - len(missing)} cached, {len(missing)} encoded")
+        return np.vstack([cached[h] for h in hashes])
+
+    # -------------------------------------------------------
+    # add / remove
+    # -------------------------------------------------------
+
+    def _ids(self, dataset_id: str) -> np.ndarray:
+        rows = self._db.execute(
+            "SELECT id FROM docs WHERE dataset_id = ? ORDER BY id", [dataset_id]
+        ).fetchall()
+        return np.array([r[0] for r in rows], dtype="int64")
+
+    def _save(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        faiss.write_index(self.index, str(tmp))
+        os.replace(tmp, self.index_path)
+
+    def has_docs(self, dataset_id: str, docs: list[str]) -> bool:
+        """True if the dataset is indexed with exactly these docs."""
+        rows = self._db.execute(
+            "SELECT hash FROM docs WHERE dataset_id = ? ORDER BY id", [dataset_id]
+        ).fetchall()
+        return [r[0] for r in rows] == [doc_hash(d) for d in docs]
+
+    def ensure(self, dataset_id: str, docs: list[str]):
+        """Index a dataset's docs, replacing any previous set; no-op if unchanged."""
+        with self._lock:
+            if self.has_docs(dataset_id, docs):
+                return
+            self._remove(dataset_id)
+            if not docs:
+                self._db.commit()
+                return
+
+            vectors = self._embeddings(docs)
+            if self.index is None:
+                self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vectors.shape[1]))
+
+            self._db.executemany(
+                "INSERT INTO docs (dataset_id, hash, text) VALUES (?, ?, ?)",
+                [(dataset_id, doc_hash(d), d) for d in docs],
+            )
+            ids = self._ids(dataset_id)
+            self.index.add_with_ids(vectors, ids)
+            self._db.commit()
+            self._save()
+            logger.info(f"Indexed {len(docs)} schema docs for {dataset_id}")
+
+    def _remove(self, dataset_id: str) -> int:
+        ids = self._ids(dataset_id)
+        if not len(ids):
+            return 0
+        if self.index is not None:
+            self.index.remove_ids(faiss.IDSelectorBatch(ids))
+        self._db.execute("DELETE FROM docs WHERE dataset_id = ?", [dataset_id])
+        return len(ids)
+
+    def remove(self, dataset_id: str):
+        with self._lock:
+            if self._remove(dataset_id):
+                self._db.commit()
+                self._save()
+                logger.info(f"Removed schema docs for {dataset_id}")
+
+    # -------------------------------------------------------
+    # search
+    # -------------------------------------------------------
+
+    def search(self, query_embedding: np.ndarray, dataset_id: str, k: int = 10) -> list[str]:
+        """Top-k docs of one dataset."""
+        with self._lock:
+            ids = self._ids(dataset_id)
+            if self.index is None or not len(ids):
+                return []
+
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+            _, found = self.index.search(
+                query_embedding.astype("float32"), min(k, len(ids)), params=params
+            )
+
+            hits = [int(i) for i in found[0] if i >= 0]
+            if not hits:
+                return []
+            texts = dict(self._db.execute(
+                f"SELECT id, text FROM docs WHERE id IN ({','.join('?' * len(hits))})", hits
+            ).fetchall())
+        return [texts[i] for i in hits]
+
+    def stats(self) -> dict:
+        with self._lock:
+            datasets = self._db.execute("SELECT COUNT(DISTINCT dataset_id) FROM docs").fetchone()[0]
+            cached = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "vectors": self.index.ntotal if self.index is not None else 0,
+                "datasets": datasets,
+                "cached_embeddings": cached,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_schema_index() -> SchemaIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SchemaIndex()
+    return _index
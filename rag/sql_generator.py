@@ -1,7 +1,9 @@
+import asyncio
 import logging
 from .retriever import Retriever
-from .llm import LocalLLM
-from .prompt import build_sql_prompt
+from .llm import LocalLLM, clean_sql
+from .prompt_planner import plan_prompt, schema_columns
+from app.core.metrics import span
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +27,13 @@ class SQLGenerator:
     def __init__(
         self,
         schema_docs: list[str],
-        llm_instance: LocalLLM | None = None
+        llm_instance: LocalLLM | None = None,
+        dataset_id: str | None = None,
     ):
         logger.info("[SQLGenerator] Initializing...")
 
         # build FAISS + reranker once
-        self.retriever = Retriever(schema_docs)
+        self.retriever = Retriever(schema_docs, dataset_id=dataset_id)
 
         # load model once (reuse if provided)
         if llm_instance:
@@ -42,22 +45,106 @@ class SQLGenerator:
 
     # -------------------------------------------------------
 
-    def generate(self, question: str, sample_data: list[dict] | None = None) -> str:
-        """
-        Natural language question → SQL query string.
-        """
-
+    def _prepare(
+        self,
+        question: str,
+        sample_data: list[dict] | None,
+        value_hints: list[str] | None = None,
+        examples: list[tuple[str, str]] | None = None,
+    ) -> tuple[list[str], str | None]:
+        """Retrieved schema docs and the prompt (None if nothing was retrieved)."""
         # 1️⃣ retrieve relevant schema
-        docs = self.retriever.retrieve(question, k=10, final_k=3)
+        with span("retrieve"):
+            docs = self.retriever.retrieve(question, k=10, final_k=3)
 
         if not docs:
             logger.warning("No schema retrieved for question: %s", question)
-            return "-- Unable to generate SQL (no schema context)"
+            return [], None
 
-        # 2️⃣ build prompt
-        prompt = build_sql_prompt(question, docs, sample_data=sample_data)
+        # 2️⃣ build prompt, pruning columns to the token budget
+        with span("prompt"):
+            prompt, _ = plan_prompt(
+                question, docs,
+                sample_data=sample_data, value_hints=value_hints, examples=examples,
+                scorer=lambda: self._column_scores(question),
+            )
+            return docs, prompt
+
+    def _column_scores(self, question: str) -> dict[str, float] | None:
+        """Retriever similarity per column (None in lightweight mode)."""
+        scores = self.retriever.doc_scores(question)
+        if scores is None:
+            return None
+        return {
+            col: score
+            for doc, score in scores.items()
+            for col in schema_columns([doc])
+            if not doc.startswith("Table ")
+        }
+
+    def generate(
+        self,
+        question: str,
+        sample_data: list[dict] | None = None,
+        value_hints: list[str] | None = None,
+        examples: list[tuple[str, str]] | None = None,
+    ) -> str:
+        """
+        Natural language question → SQL query string.
+        """
+
+        _, prompt = self._prepare(question, sample_data, value_hints, examples)
+        if prompt is None:
+            return "-- Unable to generate SQL (no schema context)"
 
         # 3️⃣ generate SQL
         sql = self.llm.generate(prompt, max_tokens=256)
 
         return sql
+
+    async def agenerate(
+        self,
+        question: str,
+        sample_data: list[dict] | None = None,
+        value_hints: list[str] | None = None,
+        examples: list[tuple[str, str]] | None = None,
+    ) -> str:
+        """
+        Async variant of generate(). Retrieval (embedding + reranking in
+        local mode) is CPU-bound and runs in a worker thread; the LLM call
+        awaits the async client.
+        """
+
+        _, prompt = await asyncio.to_thread(self._prepare, question, sample_data, value_hints, examples)
+        if prompt is None:
+            return "-- Unable to generate SQL (no schema context)"
+
+        return await self.llm.agenerate(prompt, max_tokens=256)
+
+    async def astream(
+        self,
+        question: str,
+        sample_data: list[dict] | None = None,
+        value_hints: list[str] | None = None,
+        examples: list[tuple[str, str]] | None = None,
+    ):
+        """
+        Streaming variant of agenerate(). Yields (kind, value) events:
+
+            ("schema", docs)   retrieved schema docs
+            ("token", text)    LLM output as it arrives
+            ("sql", sql)       the cleaned SQL, last
+        """
+
+        docs, prompt = await asyncio.to_thread(self._prepare, question, sample_data, value_hints, examples)
+        yield "schema", docs
+        if prompt is None:
+            yield "sql", "-- Unable to generate SQL (no schema context)"
+            return
+
+        text = ""
+        async for delta in self.llm.astream(prompt, max_tokens=256):
+            text += delta
+            yield "token", delta
+
+        yield "sql", clean_sql(text)
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# throwaway databases and a stand-in LLM, set before the app reads them
+_workdir = tempfile.mkdtemp(prefix="test_ask_stream_")
+os.environ["DUCKDB_PATH"] = os.path.join(_workdir, "test.duckdb")
+os.environ["DATAPILOT_DB_PATH"] = os.path.join(_workdir, "test.db")
+os.environ["QUERY_TIMEOUT_SECONDS"] = "2"
+os.environ["MAX_RESULT_ROWS"] = "100000000"  # let the stream run into the timeout
+os.environ["LLM_PROVIDER"] = "openai"
+os.environ["LLM_BASE_URL"] = "http://127.0.0.1:8721/v1"
+os.environ["LLM_MODEL"] = "standin"
+
+import httpx
+import uvicorn
+
+from app.api.endpoints import UPLOAD_DIR
+from app.core.database import get_pool
+from app.main import app
+from rag.llm_standin import _TABLE_RE, create_app
+
+BASE = "http://127.0.0.1:8722/api"
+# under the row cap, so no overflow check runs before the stream opens
+LIMIT = 50_000_000
+
+
+def slow_join(prompt: str) -> str:
+    """A self-join that opens at once, then yields rows for many seconds."""
+    table = _TABLE_RE.search(prompt).group(1)
+    return f"SELECT x.a, y.a AS b FROM {table} x, {table} y WHERE (x.a + y.a) % 85 = 0;"
+
+
+def serve(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def upload(rows: int) -> str:
+    csv = "a\n" + "\n".join(str(i) for i in range(rows))
+    job = httpx.post(f"{BASE}/upload", files={"file": ("numbers.csv", csv)}, timeout=30).json()
+    while job["status"] in ("queued", "running"):
+        time.sleep(0.1)
+        job = httpx.get(f"{BASE}/jobs/{job['job_id']}").json()
+    assert job["status"] == "succeeded", job
+    return job["dataset_id"]
+
+
+def events(dataset_id: str, question: str, stop_after_rows: int | None = None):
+    """(event, data) pairs of /ask/stream; disconnects after stop_after_rows rows events."""
+    seen, rows = [], 0
+    with httpx.stream("POST", f"{BASE}/ask/stream", timeout=60,
+                      json={"dataset_id": dataset_id, "question": question, "limit": LIMIT}) as r:
+        event = None
+        for line in r.iter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                seen.append((event, json.loads(line[6:])))
+                rows += event == "rows"
+                if stop_after_rows is not None and rows >= stop_after_rows:
+                    break
+    return seen
+
+
+def cursors_back(within: float) -> bool:
+    deadline = time.perf_counter() + within
+    while get_pool().stats()["in_use"]:
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+serve(create_app(answer=slow_join), 8721)
+serve(app, 8722)
+dataset_id = upload(20000)
+
+print("Timeout (2s) while rows are streaming:")
+start = time.perf_counter()
+seen = events(dataset_id, "pairs that hit the modulus")
+elapsed = time.perf_counter() - start
+kinds = [e for e, _ in seen]
+assert "rows" in kinds and kinds[-1] == "error", kinds
+assert seen[-1][1]["status"] == 504, seen[-1]
+assert elapsed < 5, elapsed
+assert cursors_back(1)
+print(f"  {kinds.count('rows')} rows events, then {seen[-1][1]} after {elapsed:.1f}s")
+
+print("Client disconnects mid-stream:")
+start = time.perf_counter()
+seen = events(dataset_id, "pairs that hit the modulus, again", stop_after_rows=1)
+assert cursors_back(1), get_pool().stats()
+print(f"  cursor back in the pool {time.perf_counter() - start:.2f}s after opening")
+
+print("NDJSON client disconnects mid-body:")
+start = time.perf_counter()
+with httpx.stream("POST", f"{BASE}/ask", timeout=60, json={
+    "dataset_id": dataset_id, "question": "pairs as ndjson", "format": "ndjson", "limit": LIMIT,
+}) as r:
+    chunks = r.iter_bytes()
+    next(chunks)
+assert cursors_back(1), get_pool().stats()
+print(f"  cursor back in the pool {time.perf_counter() - start:.2f}s after opening")
+
+httpx.delete(f"{BASE}/datasets/{dataset_id}")
+(UPLOAD_DIR / f"{dataset_id.removeprefix('dataset_')}_numbers.csv").unlink(missing_ok=True)
+shutil.rmtree(_workdir, ignore_errors=True)
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+import time
+
+import uvicorn
+
+from rag.llm import LocalLLM
+from rag.llm_backends import LLMClient, OpenAICompatibleBackend
+from rag.llm_standin import create_app
+
+
+def serve(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+print("Starting stand-in servers (slow primary that rate-limits every 3rd call, fast hedge)...")
+serve(create_app(latency_ms=400, fail_every=3), 8711)
+serve(create_app(latency_ms=20), 8712)
+
+primary = OpenAICompatibleBackend("http://127.0.0.1:8711/v1", "standin", name="slow", rpm=600)
+hedge = OpenAICompatibleBackend("http://127.0.0.1:8712/v1", "standin", name="fast")
+
+prompt = "Table calls(agent_name, talk_time_sec)\nQuestion: average talk time per agent"
+
+print("\nRetries (sync, no hedging):")
+llm = LocalLLM(client=LLMClient(primary, max_retries=2))
+for _ in range(3):
+    print(llm.generate(prompt))
+print(llm.stats())
+
+
+async def hedged():
+    llm = LocalLLM(client=LLMClient(primary, hedge, hedge_after_ms=100))
+    start = time.perf_counter()
+    sqls = await asyncio.gather(*(llm.agenerate(prompt) for _ in range(5)))
+    print(sqls[0], f"x{len(sqls)} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print("\nStreaming:")
+    print([delta async for delta in llm.astream(prompt)])
+    print(llm.stats())
+
+
+print("\nHedging after 100 ms:")
+asyncio.run(hedged())
@@ -8,3 +8,10 @@ docs = [
 q = "average talk time per agent"
 
 print(build_sql_prompt(q, docs))
+
+hints = [
+    "team: one of 'Sales', 'Support', 'Billing'",
+    "talk_time_sec: 12 to 3540",
+]
+
+print(build_sql_prompt(q, docs, value_hints=hints))
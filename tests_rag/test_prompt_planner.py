@@ -0,0 +1,17 @@
+from rag.prompt_planner import count_tokens, plan_prompt, rank_columns
+
+columns = ["call_id", "agent_name", "talk_time_sec", "team"] + [f"extra_{i}_flag" for i in range(300)]
+docs = [f"Table calls({', '.join(columns)})"] + [
+    f"Column '{c}' in table 'calls' has type VARCHAR" for c in columns
+]
+rows = [{c: i for c in columns} for i in range(3)]
+hints = ["team: 'Support' (mentioned in the question)", "talk_time_sec: 12 to 3540"]
+
+q = "average talk time per agent in support"
+
+print(rank_columns(q, columns, hints)[:4])
+
+prompt, stats = plan_prompt(q, docs, rows, hints, budget=1000)
+print(stats)
+print(count_tokens(prompt) <= 1000, "talk_time_sec" in prompt, "extra_299_flag" in prompt)
+print(prompt)
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# a throwaway database, set before the app reads DUCKDB_PATH
+_workdir = tempfile.mkdtemp(prefix="test_result_stream_")
+os.environ["DUCKDB_PATH"] = os.path.join(_workdir, "test.duckdb")
+os.environ["DATAPILOT_DB_PATH"] = os.path.join(_workdir, "test.db")
+
+from app.core.database import get_pool
+from app.core.query_guard import QueryCancelled, QueryGuard, use_guard
+from app.services.result_stream import ResultStream
+
+# opens quickly, then produces rows for many seconds as they are fetched
+SLOW = (
+    "SELECT a.i AS a, b.i AS b FROM range(20000) a(i), range(20000) b(i) "
+    "WHERE (a.i + b.i) % 85 = 0"
+)
+
+
+def drain(stream) -> int:
+    rows = 0
+    while (df := stream.next_chunk()) is not None:
+        rows += len(df)
+    return rows
+
+
+def stopped(guard, consume, expected):
+    start = time.perf_counter()
+    with use_guard(guard):
+        stream = ResultStream(SLOW)
+    try:
+        rows = consume(stream)
+        raise AssertionError(f"stream was not stopped ({rows} rows)")
+    except QueryCancelled as e:
+        assert e.reason == expected, e.reason
+    elapsed = time.perf_counter() - start
+    assert elapsed < 3, elapsed
+    assert get_pool().stats()["in_use"] == 0, get_pool().stats()
+    print(f"  stopped by {expected} after {elapsed:.2f}s, cursor back in the pool")
+
+
+print("Timeout while draining a slow stream (0.5s):")
+stopped(QueryGuard(timeout=0.5), drain, "timeout")
+
+print("Cancel mid-stream:")
+guard = QueryGuard(timeout=0)
+threading.Timer(0.5, guard.cancel, args=("disconnect",)).start()
+stopped(guard, drain, "disconnect")
+
+print("Timeout while writing Arrow batches (0.5s):")
+stopped(QueryGuard(timeout=0.5), lambda s: sum(len(b) for b in s.arrow()), "timeout")
+
+print("A stream drained in time leaves its cursor clean:")
+with use_guard(QueryGuard(timeout=0.5)):
+    stream = ResultStream("SELECT * FROM range(100000)")
+assert drain(stream) == 100000
+time.sleep(0.6)
+with get_pool().cursor() as cur:
+    assert cur.execute("SELECT count(*) FROM range(1000000)").fetchone()[0] == 1000000
+print("  100000 rows, next query on the cursor runs")
+
+shutil.rmtree(_workdir, ignore_errors=True)
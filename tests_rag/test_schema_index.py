@@ -0,0 +1,34 @@
+import tempfile
+
+from rag.embed import Embedder
+from rag.schema_index import SchemaIndex
+
+embedder = Embedder()
+directory = tempfile.mkdtemp()
+
+print("Building persistent index...")
+index = SchemaIndex(directory, embed=lambda texts: embedder.encode(texts, prefix="passage"))
+index.ensure("calls", [
+    "Table calls has columns agent_name and talk_time",
+    "Column 'talk_time' in table 'calls' has type DOUBLE",
+])
+index.ensure("sales", [
+    "Table sales has revenue and date",
+    "Column 'revenue' in table 'sales' has type DOUBLE",
+])
+print(index.stats())
+
+query_vec = embedder.encode("average talk time per agent", prefix="query")
+
+print("\nSearch restricted to 'sales':")
+for r in index.search(query_vec, "sales", k=2):
+    print("-", r)
+
+print("\nReopening (memory-mapped, no re-embedding)...")
+index = SchemaIndex(directory, embed=lambda texts: embedder.encode(texts, prefix="passage"))
+index.remove("sales")
+print(index.stats())
+
+print("\nSearch in 'calls':")
+for r in index.search(query_vec, "calls", k=2):
+    print("-", r)